@@ -1,7 +1,174 @@
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
 import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+# The most pages that will be requested from Canvas at the same time when the page count is known up front
+MAX_PAGE_WORKERS: int = 8
+# The number of keep-alive connections to Canvas that are kept open. Should be at least MAX_PAGE_WORKERS
+DEFAULT_POOL_SIZE: int = 10
+# (connect, read) timeouts in seconds for every request sent to Canvas
+DEFAULT_TIMEOUT: (float, float) = (10, 60)
+# The most batches of grades that will be posted to Canvas at the same time
+MAX_POST_WORKERS: int = 4
+# How often, in seconds, the progress of posted batches is checked
+PROGRESS_POLL_INTERVAL: float = 1
+# How long, in seconds, to wait for Canvas to finish processing posted batches before giving up
+PROGRESS_TIMEOUT: float = 5 * 60
+# The states that a Canvas progress job will not leave once it reaches them
+PROGRESS_FINAL_STATES: tuple[str, str] = ("completed", "failed")
+# Canvas lets each user 'spend' up to 700 units at a time, the cost of each request is refilled over time.
+# While the bucket has less than the low water mark left, fewer requests are sent at once.
+# While it has more than the high water mark left, more requests are sent at once.
+RATE_LIMIT_LOW_WATER_MARK: float = 150
+RATE_LIMIT_HIGH_WATER_MARK: float = 400
+# How many times a throttled request is retried before giving up
+MAX_THROTTLE_RETRIES: int = 5
+# The base delay, in seconds, before retrying a throttled request. Doubles on each retry
+THROTTLE_BACKOFF: float = 1
+# How many times a page that failed to download is retried
+MAX_PAGE_RETRIES: int = 3
+# The base delay, in seconds, before retrying a page. Doubles on each retry
+PAGE_RETRY_BACKOFF: float = 1
+# How long, in seconds, a checkpoint from a failed pull can be resumed from
+CHECKPOINT_MAX_AGE: int = 60 * 60
+# Where the downloaded rosters and checkpoints are cached between runs
+DEFAULT_CACHE_DIRECTORY: str = "./canvas/cache/"
+# How long, in seconds, a cached roster can be used for before it has to be downloaded again.
+# This is kept short, as the student count can't tell when one student drops and another adds.
+ROSTER_CACHE_MAX_AGE: int = 30 * 60
+# The columns that the status assignment scores always have, even if none could be downloaded
+STATUS_ASSIGNMENT_SCORES_COLUMNS: list[str] = ['multipass', 'student_score', 'status_assignment_id']
+# The patterns used to derive the common name for an assignment. ``{digits}`` and ``{uppercase}`` are filled in with
+# every character in the names that ``str.isdigit`` and ``str.isupper`` accept. See ``Canvas.__getCommonNames__``
+COMMON_NAME_NON_DIGITS: str = r"[^{digits}]"
+COMMON_NAME_LAB_LETTER: str = r"[{digits}]([{uppercase}])"
+COMMON_NAME_PREFIX: str = r"^([^{digits}]*)"
+COMMON_NAME_NON_UPPERCASE: str = r"[^{uppercase}]"
+
+
+class PaginationError(Exception):
+    """
+    :Description:
+
+    Raised when a paginated response from Canvas could only partly be downloaded.
+    ``results`` has every object from the pages that were downloaded before the page that failed, in order.
+    """
+
+    def __init__(self, _url: str, _reason: str, results: list[dict[any, any]] = None):
+        super().__init__(f"Failed to download '{_url}': {_reason}")
+        self.url: str = _url
+        self.reason: str = _reason
+        self.results: list[dict[any, any]] = results if results is not None else []
+
+
+class RequestScheduler:
+    """
+    :Description:
+
+    This class decides how many requests can be sent to Canvas at the same time.
+    Canvas rate limits each user with a 'leaky bucket'. Every response tells us how much is left in the bucket
+    (``X-Rate-Limit-Remaining``) and how much that request cost (``X-Request-Cost``). Once the bucket is empty,
+    Canvas starts rejecting requests with a 403.
+
+    While there is plenty left in the bucket, the number of requests allowed in flight grows (up to ``maxConcurrency``),
+    and as the bucket drains, it shrinks. If Canvas does throttle us, the number of requests in flight is halved and
+    every request waits for an exponential backoff (with jitter so that the retries don't all land at once).
+
+    This is thread safe - it is shared by all the threads sending requests for a ``Canvas`` object.
+    """
+
+    def __init__(self, maxConcurrency: int = DEFAULT_POOL_SIZE, minConcurrency: int = 1):
+        self.m_maxConcurrency: int = maxConcurrency
+        self.m_minConcurrency: int = minConcurrency
+        self.m_concurrency: int = maxConcurrency
+        self.m_inFlight: int = 0
+        self.m_remaining: (float, None) = None
+        self.m_lastCost: (float, None) = None
+        self.m_pausedUntil: float = 0
+        self.m_condition: threading.Condition = threading.Condition()
+
+    @staticmethod
+    def isThrottled(_response: (requests.Response, None)) -> bool:
+        """
+        :Description:
+
+        Checks if the response is Canvas telling us that the rate limit has been exceeded.
+
+        :param _response: The response from Canvas
+
+        :return: True if the request was throttled, False if not
+        """
+        if _response is None:
+            return False
+
+        return _response.status_code == 429 or \
+            (_response.status_code == 403 and "Rate Limit Exceeded" in _response.text)
+
+    def acquire(self):
+        """
+        :Description:
+
+        Blocks until a new request can be sent to Canvas.
+        Must be paired with ``RequestScheduler.release`` once the response is received.
+        """
+        with self.m_condition:
+            while True:
+                waitFor: float = self.m_pausedUntil - time.time()
+                if waitFor <= 0 and self.m_inFlight < self.m_concurrency:
+                    break
+                self.m_condition.wait(timeout=waitFor if waitFor > 0 else None)
+
+            self.m_inFlight += 1
+
+    def release(self, _response: (requests.Response, None)):
+        """
+        :Description:
+
+        Frees up the slot taken by ``RequestScheduler.acquire``, and updates the number of requests allowed in flight
+        from the rate limit headers on the response.
+
+        :param _response: The response from Canvas, or None if the request failed before a response came back
+        """
+        with self.m_condition:
+            self.m_inFlight -= 1
+
+            if _response is not None and 'X-Rate-Limit-Remaining' in _response.headers:
+                self.m_remaining = float(_response.headers['X-Rate-Limit-Remaining'])
+                self.m_lastCost = float(_response.headers.get('X-Request-Cost', 0))
+
+                if self.m_remaining < RATE_LIMIT_LOW_WATER_MARK:
+                    self.m_concurrency = max(self.m_minConcurrency, self.m_concurrency - 1)
+                elif self.m_remaining > RATE_LIMIT_HIGH_WATER_MARK:
+                    self.m_concurrency = min(self.m_maxConcurrency, self.m_concurrency + 1)
+
+            self.m_condition.notify_all()
+
+    def throttle(self, _attempt: int):
+        """
+        :Description:
+
+        Called when Canvas throttled a request. Halves the number of requests allowed in flight and pauses *all*
+        requests for ``THROTTLE_BACKOFF * 2 ^ _attempt`` seconds, plus up to a second of random jitter.
+
+        :param _attempt: How many times the request has already been retried
+        """
+        with self.m_condition:
+            self.m_concurrency = max(self.m_minConcurrency, self.m_concurrency // 2)
+            delay: float = THROTTLE_BACKOFF * (2 ** _attempt) + random.uniform(0, 1)
+            self.m_pausedUntil = max(self.m_pausedUntil, time.time() + delay)
+            self.m_condition.notify_all()
 
 
 class Canvas:
@@ -12,9 +179,10 @@ class Canvas:
     Importantly - this class supports paginated responses and handles them elegantly -
     regardless of the size of the response
     """
-    s_unknownAssignments: int = 0
+    s_commonNames: dict[str, str] = {}
 
-    def __init__(self, _API_KEY="", _USER_ID="", _COURSE_ID="", _ENDPOINT=""):
+    def __init__(self, _API_KEY="", _USER_ID="", _COURSE_ID="", _ENDPOINT="",
+                 poolSize: int = DEFAULT_POOL_SIZE, timeout: (float, tuple[float, float]) = DEFAULT_TIMEOUT):
         self.API_KEY: str = _API_KEY
         self.USER_ID: str = _USER_ID
         self.COURSE_ID: str = _COURSE_ID
@@ -22,8 +190,51 @@ class Canvas:
         self.m_students: pd.DataFrame = pd.DataFrame()
         self.m_assignments: pd.DataFrame = pd.DataFrame()
         self.m_statusAssignments: pd.DataFrame = pd.DataFrame()
-        self.m_statusAssignmentsScores: pd.DataFrame = pd.DataFrame()
+        self.m_statusAssignmentsScores: pd.DataFrame = pd.DataFrame(columns=STATUS_ASSIGNMENT_SCORES_COLUMNS)
         self.m_assignmentsToGrade: (pd.DataFrame, None) = None
+        # The assignment catalog - maps from the common name / id to the row position(s) in m_assignments
+        self.m_assignmentsByCommonName: dict[str, list[int]] = {}
+        self.m_assignmentsByID: dict[int, int] = {}
+        # The row positions in m_assignments of the assignments that have been selected to grade, in selection order
+        self.m_assignmentsToGradePositions: list[int] = []
+        self.m_timeout: (float, tuple[float, float]) = timeout
+        self.m_session: requests.Session = self.__createSession__(poolSize)
+        self.m_scheduler: RequestScheduler = RequestScheduler(maxConcurrency=poolSize)
+        self.m_checkpointLock: threading.Lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def __createSession__(_poolSize: int) -> requests.Session:
+        """
+        :Description:
+
+        This function creates the session that every request to Canvas is sent through. The session keeps the
+        connections to Canvas alive between requests, so we only pay for the TCP and TLS handshakes once per connection
+        rather than once for every page and every batch of grades.
+
+        :param _poolSize: the max number of connections to keep open to Canvas at a time.
+
+        :return: the new session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_poolSize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        return session
+
+    def close(self):
+        """
+        :Description:
+
+        Closes all the open connections to Canvas. Should be called when we are done with Canvas for this run.
+        """
+        self.m_session.close()
 
     def __validate__(self):
         """
@@ -47,8 +258,223 @@ class Canvas:
             return False
         return True
 
+    def __sendRequest__(self, _method: str, _url: str, **kwargs) -> requests.Response:
+        """
+        :Description:
+
+        This function sends a request to Canvas through the shared session. Every request to Canvas should go through
+        here so that it is scheduled against the rate limit (see ``RequestScheduler``). Requests that Canvas throttles
+        are retried up to ``MAX_THROTTLE_RETRIES`` times.
+
+        :param _method: the HTTP method to use (``GET`` or ``POST``)
+        :param _url: the url to send the request to
+        :param kwargs: passed on to ``requests.Session.request``. EG: ``headers`` or ``data``
+
+        :return: the response from Canvas. If the request was still throttled after all the retries, the throttled
+                 response is returned.
+        """
+        response: (requests.Response, None) = None
+
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            self.m_scheduler.acquire()
+            response = None
+            try:
+                response = self.m_session.request(_method, _url, timeout=self.m_timeout, **kwargs)
+            finally:
+                self.m_scheduler.release(response)
+
+            if not RequestScheduler.isThrottled(response):
+                return response
+
+            if attempt < MAX_THROTTLE_RETRIES:
+                print(f"Canvas rate limit exceeded. Retrying ({attempt + 1} / {MAX_THROTTLE_RETRIES})...")
+                self.m_scheduler.throttle(attempt)
+
+        return response
+
     @staticmethod
-    def __getPaginatedResponse__(_url: str, _headers: str, flags: str = "") -> list[dict[any, any]]:
+    def __getRemainingPageURLs__(_links: dict[str, dict[str, str]]) -> (list[str], None):
+        """
+        :Description:
+
+        This function works out the URLs of every page after the first one from the ``Link`` header of the first page.
+        Canvas only tells us the page count when it uses numbered pages, some endpoints (like submissions) use
+        bookmarks instead, and leave out the ``last`` link entirely. In that case we can't know the pages ahead of time.
+
+        :param _links: the parsed ``Link`` header of the first page (``requests.Response.links``)
+
+        :return: the list of the remaining page URLs in order, or None if they can't be known ahead of time
+        """
+        if 'next' not in _links:
+            return []
+
+        if 'last' not in _links:
+            return None
+
+        nextPage = re.search(r"[?&]page=(\d+)", _links['next']['url'])
+        lastPage = re.search(r"[?&]page=(\d+)", _links['last']['url'])
+
+        if nextPage is None or lastPage is None:
+            return None
+
+        lastURL: str = _links['last']['url']
+
+        return [lastURL[:lastPage.start(1)] + str(page) + lastURL[lastPage.end(1):]
+                for page in range(int(nextPage.group(1)), int(lastPage.group(1)) + 1)]
+
+    def __getPage__(self, _url: str, _headers: dict[str, str],
+                    checkpoint: (dict[str, tuple[list, dict]], None) = None,
+                    checkpointPath: (str, None) = None) -> (list[dict[any, any]], dict[str, dict[str, str]]):
+        """
+        :Description:
+
+        This function gets a single page of a paginated response. If Canvas fails with a server error (5xx) or the
+        connection fails, the page is retried up to ``MAX_PAGE_RETRIES`` times with an exponential backoff.
+
+        If a checkpoint is passed and the page is already in it, the page is taken out of the checkpoint rather than
+        requested again. Otherwise, the page is written to the checkpoint file once it is downloaded.
+        See ``Canvas.__loadCheckpoint__``.
+
+        :param _url: the url of the page
+        :param _headers: the headers to send with the request
+        :param checkpoint: the pages that have already been downloaded
+        :param checkpointPath: where to write the page once it's downloaded
+
+        :return: the page and its parsed ``Link`` header
+        :raises PaginationError: if the page couldn't be downloaded
+        """
+        if checkpoint is not None and _url in checkpoint:
+            return checkpoint.pop(_url)
+
+        error: str = ""
+        for attempt in range(MAX_PAGE_RETRIES + 1):
+            if attempt != 0:
+                print(f"An error occurred ({error}). Retrying ({attempt} / {MAX_PAGE_RETRIES})...")
+                time.sleep(PAGE_RETRY_BACKOFF * (2 ** (attempt - 1)) + random.uniform(0, 1))
+
+            try:
+                result = self.__sendRequest__("GET", _url, headers=_headers)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}"
+                continue
+
+            if result.status_code == 200:
+                page = (result.json(), result.links)
+                if checkpoint is not None:
+                    self.__writeCheckpointPage__(checkpointPath, _url, page)
+                return page
+
+            error = f"HTML code {result.status_code}"
+            # client errors aren't going to fix themselves
+            if result.status_code < 500:
+                break
+
+        print(f"An error occurred. {error}")
+        raise PaginationError(_url, error)
+
+    def __loadCheckpoint__(self, _checkpointPath: (str, None)) -> (dict[str, tuple[list, dict]], None):
+        """
+        :Description:
+
+        This function loads the pages saved in a checkpoint by an earlier pull that didn't finish.
+        Checkpoints are a JSON lines file, with one page on each line. Checkpoints older than ``CHECKPOINT_MAX_AGE``
+        seconds are thrown away, so we don't resume from out of date data.
+
+        :param _checkpointPath: the checkpoint to load, or None to not use a checkpoint
+
+        :return: the pages mapped from their url to the page and its ``Link`` header, or None if not checkpointing
+        """
+        if _checkpointPath is None:
+            return None
+
+        checkpoint: dict[str, tuple[list, dict]] = {}
+
+        if not os.path.isfile(_checkpointPath):
+            return checkpoint
+
+        if time.time() - os.path.getmtime(_checkpointPath) > CHECKPOINT_MAX_AGE:
+            os.remove(_checkpointPath)
+            return checkpoint
+
+        with open(_checkpointPath, "r") as checkpointFile:
+            for line in checkpointFile:
+                try:
+                    page = json.loads(line)
+                except ValueError:
+                    # the last line might have only been partly written when we stopped
+                    continue
+                checkpoint[page['url']] = (page['data'], page['links'])
+
+        if checkpoint:
+            print(f"Resuming from {len(checkpoint)} pages saved in '{_checkpointPath}'")
+
+        return checkpoint
+
+    def __writeCheckpointPage__(self, _checkpointPath: str, _url: str, _page: (list, dict)):
+        with self.m_checkpointLock:
+            os.makedirs(os.path.dirname(_checkpointPath), exist_ok=True)
+            with open(_checkpointPath, "a") as checkpointFile:
+                checkpointFile.write(json.dumps({'url': _url, 'data': _page[0], 'links': _page[1]}) + "\n")
+
+    def __iterPaginatedResponse__(self, _url: str, _headers: dict[str, str], flags: str = "",
+                                  checkpoint: (str, None) = None) -> Iterator[list[dict[any, any]]]:
+        """
+        :Description:
+
+        This function retrieves data from canvas one page at a time, yielding each page as soon as it (and every
+        page before it) has arrived. This lets the caller process a page while the next pages are still downloading,
+        and means only a few pages are ever held in memory at once, rather than the entire response.
+
+        If Canvas tells us how many pages there are (with the ``last`` link) then the next ``MAX_PAGE_WORKERS`` pages
+        are always being downloaded at the same time. Otherwise, the pages are walked one at a time by following the
+        ``next`` link. Either way, the pages are yielded in the same order as Canvas returned them.
+
+        Each page is retried on its own if it fails (see ``Canvas.__getPage__``). If a checkpoint file is passed,
+        every downloaded page is saved to it, so if the pull fails partway through, the next pull with the same checkpoint
+        only downloads the pages that are missing. The checkpoint is removed once the pull finishes.
+
+        :param _url: the endpoint to query
+        :param _headers: the headers to send with each request - typically only has the api key
+        :param flags: Any extra flags to pass to Canvas. Completely optional.
+        :param checkpoint: the file to checkpoint downloaded pages to. Completely optional.
+
+        :return: each page of the response as a list of dicts
+        :raises PaginationError: if any page couldn't be downloaded
+        """
+        _url += f"?{flags}"
+        pages: (dict[str, tuple[list, dict]], None) = self.__loadCheckpoint__(checkpoint)
+
+        pageResponse, links = self.__getPage__(_url, _headers, pages, checkpoint)
+        yield pageResponse
+
+        remainingPages: (list[str], None) = Canvas.__getRemainingPageURLs__(links)
+
+        # Canvas didn't tell us how many pages there are, so we have to follow the next links one by one
+        if remainingPages is None:
+            while 'next' in links:
+                pageResponse, links = self.__getPage__(links['next']['url'], _headers, pages, checkpoint)
+                yield pageResponse
+
+        elif remainingPages:
+            remainingPages: Iterator[str] = iter(remainingPages)
+            with ThreadPoolExecutor(max_workers=MAX_PAGE_WORKERS) as executor:
+                # keep the next few pages downloading while the caller works on the current one
+                inFlight: deque = deque(executor.submit(self.__getPage__, pageURL, _headers, pages, checkpoint)
+                                        for pageURL in itertools.islice(remainingPages, MAX_PAGE_WORKERS))
+                while inFlight:
+                    pageResponse, _ = inFlight.popleft().result()
+
+                    nextPage: (str, None) = next(remainingPages, None)
+                    if nextPage is not None:
+                        inFlight.append(executor.submit(self.__getPage__, nextPage, _headers, pages, checkpoint))
+
+                    yield pageResponse
+
+        if checkpoint is not None and os.path.isfile(checkpoint):
+            os.remove(checkpoint)
+
+    def __getPaginatedResponse__(self, _url: str, _headers: dict[str, str], flags: str = "",
+                                 checkpoint: (str, None) = None) -> list[dict[any, any]]:
         """
         :Description:
 
@@ -56,41 +482,53 @@ class Canvas:
         objects to minimise the cost of each request. (So our 100mb pull of assignments is split into smaller chunks)
         Returns a list of dictionaries. This also is only used for *GET* requests
 
+        This collects every page from ``Canvas.__iterPaginatedResponse__``. Prefer iterating over the pages directly
+        when the response is large and each object can be processed by itself.
+
         :param _url: the endpoint to query
         :param _headers: the headers to send with each request - typically only has the api key
         :param flags: Any extra flags to pass to Canvas. Completely optional.
+        :param checkpoint: the file to checkpoint downloaded pages to. Completely optional.
 
         :return: the full response - merged in to a list of dicts
+        :raises PaginationError: if any page couldn't be downloaded. The pages before it are in ``results``
         """
-        _url += f"?{flags}"
-        result = requests.get(_url, headers=_headers)
+        results = []
+        try:
+            for pageResponse in self.__iterPaginatedResponse__(_url, _headers, flags=flags, checkpoint=checkpoint):
+                for pResponse in pageResponse:
+                    results.append(pResponse)
 
-        if result.status_code != 200:
-            print(f"An error occurred. HTML code {result.status_code}")
-            return []
+        except PaginationError as e:
+            e.results = results
+            raise
 
-        results = []
-        pageResponse = result.json()
+        return results
 
-        for pResponse in pageResponse:
-            results.append(pResponse)
+    def __getRequest__(self, _url: str, _headers: dict[str, str], flags: str = "") -> dict[any, any]:
+        """
+        :Description:
 
-        while 'last' not in result.links or result.links['current']['url'] != result.links['last']['url']:
-            result = requests.get(result.links['next']['url'], headers=_headers)
+        This function makes a single *GET* request to the server for endpoints that return one object rather than a
+        paginated list. See ``Canvas.__getPaginatedResponse__`` for lists.
 
-            if result.status_code != 200:
-                print(f"An error occurred. HTML code {result.status_code}")
-                return []
+        :param _url: the endpoint to query
+        :param _headers: the headers to send (like the authorization token)
+        :param flags: Any extra flags to pass to Canvas. Completely optional.
 
-            pageResponse = result.json()
+        :return: the response from the server or an empty dict if the request failed
+        """
+        if flags:
+            _url += f"?{flags}"
 
-            for pResponse in pageResponse:
-                results.append(pResponse)
+        result = self.__sendRequest__("GET", _url, headers=_headers)
+        if result.status_code != 200:
+            print(f"An error occurred while making request. HTTP code is {result.status_code}")
+            return {}
 
-        return results
+        return result.json()
 
-    @staticmethod
-    def __postRequest__(_url, _headers, _data) -> dict[any, any]:
+    def __postRequest__(self, _url, _headers, _data) -> dict[any, any]:
         """
         :Description:
 
@@ -108,7 +546,7 @@ class Canvas:
 
         :return: The URL of the status OR the response from the server.
         """
-        result = requests.post(_url, headers=_headers, data=_data)
+        result = self.__sendRequest__("POST", _url, headers=_headers, data=_data)
         if result.status_code != 200:
             print(f"An error occurred while making request. HTTP code is {result.status_code}")
             return {}
@@ -116,45 +554,67 @@ class Canvas:
         return result.json()
 
     @staticmethod
-    def __getCommonName__(_assignmentName: str) -> str:
+    def __getCommonNames__(_assignmentNames: list[str]) -> list[str]:
         """
         :Description:
 
-        This function gets the common name from the assignment in canvas.
+        This function gets the common names for a list of assignments from canvas.
         I am defining the common name as the shorthand abbreviation for the assignment,
         so HW 1 would read as HW1, Lab 14 would read as L14.
         Also supports the 102 OL way of doing lab names IE Python Assessment 1B = PA1B
-        If this function can't derive a common name it returns UKN + the current unknown counter.
-        UKN stands for UnKowN.
 
-        :param _assignmentName: the canvas assignment name
+        The common name is made up of the capital letters before the first number (up to four of them), then every number
+        in the name, then the capital letter directly after a number if there is one. If only capital letters are found,
+        only the first four are kept.
+
+        Derived names are remembered, so syncing the same catalog again doesn't redo any work.
+        If this function can't derive a common name it returns UKN + the position of the name among the unknown names in
+        ``_assignmentNames``. UKN stands for UnKowN. The same list of names will always get the same common names.
 
-        :return: the common format name
+        :param _assignmentNames: the canvas assignment names
+
+        :return: the common format names, in the same order as ``_assignmentNames``
         """
-        commonNameNumbers: str = "".join([ch for ch in _assignmentName if str(ch).isdigit()])
-        commonNameLabLetter: str = ""
-        # Find the lab letter for cases like L1B or Python Assessment 1B - there might be a better way to do this
-        for i in range(1, len(_assignmentName)):
-            if str.isdigit(_assignmentName[i - 1]) and _assignmentName[i] != " " and str.isupper(_assignmentName[i]):
-                commonNameLabLetter = _assignmentName[i]
-                break
+        newNames: list[str] = [name for name in dict.fromkeys(_assignmentNames)
+                               if name not in Canvas.s_commonNames]
+
+        if newNames:
+            names: pd.Series = pd.Series(newNames, dtype=object)
+
+            # The patterns match exactly the characters that str.isdigit and str.isupper do, including non ascii ones.
+            #  A character that isn't in any name is always included, so that the character classes are never empty
+            characters: set[str] = set("".join(newNames))
+            placeholder: str = next(chr(i) for i in itertools.count() if chr(i) not in characters)
+            characterClasses: dict[str, str] = {
+                'digits': "".join(re.escape(ch) for ch in sorted(characters) if ch.isdigit()) + re.escape(placeholder),
+                'uppercase': "".join(re.escape(ch) for ch in sorted(characters) if ch.isupper())
+                + re.escape(placeholder),
+            }
 
-        commonName = ""
-        for ch in _assignmentName:
-            if str.isupper(ch):
-                commonName += ch
-            if str.isdigit(ch):
-                commonName += commonNameNumbers
-                commonName += commonNameLabLetter
-                break
-            if len(commonName) >= 4:
-                break
+            numbers: pd.Series = \
+                names.str.replace(COMMON_NAME_NON_DIGITS.format(**characterClasses), "", regex=True)
+            labLetters: pd.Series = \
+                names.str.extract(COMMON_NAME_LAB_LETTER.format(**characterClasses), expand=False).fillna("")
+            # the capital letters before the first number
+            prefixes: pd.Series = names.str.extract(COMMON_NAME_PREFIX.format(**characterClasses), expand=False) \
+                .str.replace(COMMON_NAME_NON_UPPERCASE.format(**characterClasses), "", regex=True)
 
-        if not commonName:
-            Canvas.s_unknownAssignments += 1
-            commonName = "UKN" + str(Canvas.s_unknownAssignments)
+            commonNames: pd.Series = (prefixes + numbers + labLetters) \
+                .where(prefixes.str.len() < 4, prefixes.str[:4])
 
-        return commonName
+            Canvas.s_commonNames.update(zip(newNames, commonNames))
+
+        commonNames: list[str] = [Canvas.s_commonNames[name] for name in _assignmentNames]
+
+        unknownNames: dict[str, str] = {}
+        for i, name in enumerate(_assignmentNames):
+            if commonNames[i]:
+                continue
+            if name not in unknownNames:
+                unknownNames[name] = "UKN" + str(len(unknownNames) + 1)
+            commonNames[i] = unknownNames[name]
+
+        return commonNames
 
     def loadSettings(self, _configFile):
         """
@@ -208,8 +668,26 @@ class Canvas:
             print(f"Loaded {len(self.m_statusAssignments)} status assignments")
 
         self.m_assignments = pd.DataFrame(_configFile["assignments"])
+        self.__indexAssignments__()
         print(f"Loaded {len(self.m_assignments)} assignments")
 
+    def __indexAssignments__(self):
+        """
+        :Description:
+
+        This function builds the assignment catalog from ``m_assignments``, so that assignments can be looked up by
+        their common name or id without scanning every assignment. Common names are not unique, so each one maps to
+        every row with that name. Must be called whenever ``m_assignments`` is replaced.
+        """
+        self.m_assignmentsByCommonName = {}
+        self.m_assignmentsByID = {}
+        self.m_assignmentsToGradePositions = []
+
+        for position, (commonName, assignmentID) in \
+                enumerate(zip(self.m_assignments['common_name'].values, self.m_assignments['id'].values)):
+            self.m_assignmentsByCommonName.setdefault(commonName, []).append(position)
+            self.m_assignmentsByID[int(assignmentID)] = position
+
     def getAssignmentGroupsFromCanvas(self):
         """
         :Description:
@@ -241,7 +719,11 @@ class Canvas:
 
         url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/assignment_groups"
         header = {"Authorization": f"Bearer {self.API_KEY}"}
-        result = self.__getPaginatedResponse__(url, header)
+        try:
+            result = self.__getPaginatedResponse__(url, header)
+        except PaginationError as e:
+            print(f"Unable to retrieve assignment groups. {e}")
+            return None
 
         print(f"Retrieved {len(result)} assignment groups")
 
@@ -252,7 +734,66 @@ class Canvas:
 
         return assignmentGroups
 
-    def getAssignmentsFromCanvas(self, _assignmentGroups) -> list:
+    def getAssignmentCatalogFromCanvas(self) -> (dict[str, dict[str, any]], None):
+        """
+        :Description:
+
+        This function gets the assignment groups *and* the assignments in them from canvas in a single paginated
+        request, rather than one request for the groups and another for each group's assignments.
+        Only the fields that we keep are held onto as each page arrives - the rest (descriptions, rubrics, etc.)
+        are thrown away.
+
+        :Example:
+
+        .. code-block:: json
+
+            {
+            'Quizzes (6%)': {
+                id: 56566,
+                assignments: [{name: "Quiz 1", id: 283462, points_possible: 6.0}, ...]
+                },
+            ...
+            }
+
+        The catalog can be passed to ``Canvas.getAssignmentsFromCanvas`` so that the assignments aren't downloaded
+        again.
+
+        :return: the assignment groups mapped to their id and assignments, or None if they couldn't be retrieved
+        """
+        # /api/v1/courses/:course_id/assignment_groups?include[]=assignments
+        #  - gets all assignment groups with the assignments in them
+        if not self.__validate__():
+            return None
+
+        url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/assignment_groups"
+        header = {"Authorization": f"Bearer {self.API_KEY}"}
+        flags = "include[]=assignments&exclude_response_fields[]=description&exclude_response_fields[]=rubric" \
+                "&per_page=100"
+
+        catalog: dict[str, dict[str, any]] = dict()
+        assignmentCount: int = 0
+        try:
+            for page in self.__iterPaginatedResponse__(url, header, flags=flags):
+                for assignmentGroup in page:
+                    assignments: list[dict[str, any]] = [
+                        {
+                            'name': assignment['name'],
+                            'id': assignment['id'],
+                            'points_possible': assignment['points_possible']
+                        }
+                        for assignment in assignmentGroup.get('assignments', [])
+                    ]
+                    assignmentCount += len(assignments)
+                    catalog[assignmentGroup['name']] = {'id': assignmentGroup['id'], 'assignments': assignments}
+        except PaginationError as e:
+            print(f"Unable to retrieve assignment catalog. {e}")
+            return None
+
+        print(f"Retrieved {len(catalog)} assignment groups with {assignmentCount} assignments")
+
+        return catalog
+
+    def getAssignmentsFromCanvas(self, _assignmentGroups, catalog: (dict[str, dict[str, any]], None) = None) -> list:
         """
         :Description:
 
@@ -270,6 +811,8 @@ class Canvas:
             },
 
         :param _assignmentGroups: The list of ids of the desired groups to pull from.
+        :param catalog: The catalog from ``Canvas.getAssignmentCatalogFromCanvas``. If passed, the assignments are
+            taken from it rather than downloaded again.
 
         :return: formatted assignments
         """
@@ -286,15 +829,27 @@ class Canvas:
         header = {"Authorization": f"Bearer {self.API_KEY}"}
 
         canvasAssignments: list = []
+        if catalog is not None:
+            assignmentsByGroup: dict[any, list] = {group['id']: group['assignments'] for group in catalog.values()}
+            for assignmentGroup in _assignmentGroups:
+                canvasAssignments.extend(assignmentsByGroup.get(assignmentGroup, []))
+            _assignmentGroups = []
+
         for assignmentGroup in _assignmentGroups:
             url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/assignment_groups/{assignmentGroup}/assignments"
-            canvasAssignments.extend(self.__getPaginatedResponse__(url, header))
+            try:
+                canvasAssignments.extend(self.__getPaginatedResponse__(url, header))
+            except PaginationError as e:
+                print(f"Unable to retrieve all the assignments in group {assignmentGroup}. {e}")
+                return []
 
         print(f"Returned {len(canvasAssignments)} assignments")
+        commonNames: list[str] = self.__getCommonNames__([assignment['name'] for assignment in canvasAssignments])
+
         parsedAssignments: list = []
-        for assignment in canvasAssignments:
+        for assignment, commonName in zip(canvasAssignments, commonNames):
             newAssignment = dict()
-            newAssignment['common_name'] = self.__getCommonName__(assignment['name'])
+            newAssignment['common_name'] = commonName
             newAssignment['name'] = assignment['name']
             newAssignment['id'] = assignment['id']
             newAssignment['points'] = assignment['points_possible']
@@ -302,15 +857,24 @@ class Canvas:
 
         return parsedAssignments
 
-    def getStudentsFromCanvas(self):
+    def getStudentsFromCanvas(self, refresh: bool = False):
         """
         :Description:
 
         This function gets a list of users from canvas, filtering out the non-students. This will allow us to post
-        grades for students without needed to download the entire gradebook. Because the list of students changes
-        frequently as they add and drop classes, this is pulled before grades are posted every run. This will update
-        the student list internally.
+        grades for students without needed to download the entire gradebook. This will update the student list
+        internally.
+
+        The roster is cached on disk per course. Because the list of students changes frequently as they add and drop
+        classes, the cached roster is only used for a short time (``ROSTER_CACHE_MAX_AGE``) and only if Canvas
+        still reports the same number of students. Otherwise, the roster is downloaded again.
+        See ``Canvas.__loadCachedRoster__``. Use ``refresh`` (``--refresh-roster``) to always download it.
+
+        :param refresh: If the roster should be downloaded regardless of the cache
         """
+        if not refresh and self.__loadCachedRoster__():
+            return
+
         # /api/v1/courses/:course_id/users - get users for a course
         url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/users"
         header = {"Authorization": f"Bearer {self.API_KEY}"}
@@ -320,26 +884,32 @@ class Canvas:
         print("Downloading updated Canvas roster....")
         print("\t(This may take a few minutes depending on the enrollment size of the course)")
 
-        result = self.__getPaginatedResponse__(url, header, flags=flags)
+        # Only the fields that we use are kept from each page, the rest of the page is dropped once it's processed
+        studentList: dict[str, list] = {'name': [], 'id': [], 'sis_id': []}
+        downloadedStudents: int = 0
+        invalidStudents: int = 0
+        try:
+            for page in self.__iterPaginatedResponse__(url, header, flags=flags,
+                                                       checkpoint=self.__getCheckpointPath__("roster")):
+                downloadedStudents += len(page)
+                for student in page:
+                    if 'email' not in student or 'name' not in student or 'id' not in student:
+                        invalidStudents += 1
+                        continue
+                    studentList['name'].append(student['name'])
+                    studentList['id'].append(student['id'])
+                    # Despite this sis_id - it actually is the CWID.
+                    # Thanks mines for phasing out multipass
+                    studentList['sis_id'].append(student['sis_user_id'])
+                    # studentList['sis_id'].append(student['email'].split('@')[0])
+        except PaginationError as e:
+            print(f"\tOnly downloaded {downloadedStudents} students before failing. {e}")
+            print("\tThe roster has NOT been updated. Downloaded pages have been saved, run again to resume.")
+            return
 
-        print(f"\tDownloaded {len(result)} students")
+        print(f"\tDownloaded {downloadedStudents} students")
 
-        studentList: list[dict] = []
         print("\tProcessing students...", end='')
-        invalidStudents: int = 0
-        for student in result:
-            if 'email' not in student or 'name' not in student or 'id' not in student:
-                invalidStudents += 1
-                continue
-            parsedStudent = dict()
-            parsedStudent['name'] = student['name']
-            parsedStudent['id'] = student['id']
-            # Despite this sis_id - it actually is the CWID.
-            # Thanks mines for phasing out multipass
-            parsedStudent['sis_id'] = student['sis_user_id']
-            # parsedStudent['sis_id'] = student['email'].split('@')[0]
-            studentList.append(parsedStudent)
-
         if invalidStudents != 0:
             print("Warning")
             print(f"\t\t{invalidStudents} students were invalid")
@@ -347,67 +917,184 @@ class Canvas:
             print("Done")
         # dataframes are a lot easier to work with
         self.m_students = pd.DataFrame(studentList)
+        self.__writeCachedRoster__()
         print("...Done")
 
-    def updateStatusAssignmentScores(self):
+    def __getCheckpointPath__(self, _name: str) -> str:
+        return f"{DEFAULT_CACHE_DIRECTORY}checkpoint_{self.COURSE_ID}_{_name}.jsonl"
+
+    def __getRosterCachePath__(self) -> str:
+        return f"{DEFAULT_CACHE_DIRECTORY}roster_{self.COURSE_ID}.json"
+
+    def __getTotalStudents__(self) -> (int, None):
+        """
+        :Description:
+
+        This function gets the number of students that Canvas has enrolled in the course.
+        This is much cheaper than pulling the roster, so it is used to check if the cached roster is out of date.
+
+        :return: the number of students in the course or None if it couldn't be retrieved
+        """
+        # /api/v1/courses/:course_id - get a single course
+        url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}"
+        header = {"Authorization": f"Bearer {self.API_KEY}"}
+
+        course = self.__getRequest__(url, header, flags="include[]=total_students")
+
+        return course.get('total_students')
+
+    def __loadCachedRoster__(self) -> bool:
+        """
+        :Description:
+
+        This function loads the roster cached for this course into ``m_students`` if the cache is still valid.
+        The cache is valid if it is less than ``ROSTER_CACHE_MAX_AGE`` seconds old and Canvas still reports the same
+        number of students in the course as when it was cached.
+
+        The student count can't detect a student dropping while another adds, so the max age is what bounds how out of
+        date the cached roster can be. A student missing from the roster does not have their grade posted.
+
+        :return: True if the cached roster was loaded, False if the roster needs to be downloaded
+        """
+        cachePath = self.__getRosterCachePath__()
+        if not os.path.isfile(cachePath):
+            return False
+
+        try:
+            with open(cachePath, "r") as cacheFile:
+                cachedRoster = json.load(cacheFile)
+        except (IOError, ValueError) as e:
+            print(f"Unable to read cached roster '{cachePath}' due to {e}")
+            return False
+
+        if cachedRoster.get('course_id') != self.COURSE_ID \
+                or time.time() - cachedRoster.get('fetched_at', 0) > ROSTER_CACHE_MAX_AGE:
+            return False
+
+        print("Validating cached Canvas roster...", end='')
+        totalStudents = self.__getTotalStudents__()
+        if totalStudents is None or totalStudents != cachedRoster.get('total_students'):
+            print("Out of date")
+            return False
+
+        self.m_students = pd.DataFrame(cachedRoster['students'])
+        print("Done")
+        print(f"\tLoaded {len(self.m_students)} students from cache, downloaded "
+              f"{(time.time() - cachedRoster['fetched_at']) / 60:.0f} minutes ago. "
+              f"Use --refresh-roster to download it again.")
+
+        return True
+
+    def __writeCachedRoster__(self):
+        """
+        :Description:
+
+        This function writes ``m_students`` to the roster cache for this course, along with the number of students
+        that Canvas currently reports, so it can be validated the next time it is loaded.
+        """
+        cachePath = self.__getRosterCachePath__()
+
+        try:
+            os.makedirs(DEFAULT_CACHE_DIRECTORY, exist_ok=True)
+            with open(cachePath, "w") as cacheFile:
+                json.dump({
+                    'course_id': self.COURSE_ID,
+                    'fetched_at': time.time(),
+                    'total_students': self.__getTotalStudents__(),
+                    'students': self.m_students.to_dict('records'),
+                }, cacheFile)
+        except IOError as e:
+            print(f"Unable to write roster cache '{cachePath}' due to {e}")
+
+    def updateStatusAssignmentScores(self, bulkFetch: bool = True) -> bool:
         """
         :Description:
 
         This function pulls the scores for all the status assignments found in the config file. Stores the current
         scores in a dataframe internally
+
+        By default, the scores for every status assignment are pulled together as one paginated stream from the course
+        level submissions endpoint. See ``Canvas.__iterBulkSubmissions__``.
+
+        If the scores couldn't be downloaded, the stored scores are left empty (with all of their columns), and this
+        function returns false.
+
+        :param bulkFetch: If all the status assignments should be pulled at once, or one assignment at a time.
+
+        :return: True if the scores are up-to-date (or there are no status assignments), False if they aren't
         """
         if not self.__validate__():
-            return
+            return False
 
         if self.m_statusAssignments.empty:
             print("Unable to fetch status assignments: No status assignments found")
-            return
+            return True
 
         if self.m_students.empty:
             print("Unable to fetch status assignments: No students found")
-            return
-        # /api/v1/courses/:course/assignments/:assignmentid/submissions
+            return False
+        print(f"Updating {len(self.m_statusAssignments)} status assignments...")
+
+        try:
+            downloadedScores: list[pd.DataFrame] = self.__downloadStatusAssignmentScores__(bulkFetch)
+        except PaginationError as e:
+            print("Failed")
+            print(f"\t\t{e}")
+            print("\t\tStatus assignments have NOT been updated. "
+                  "Downloaded pages have been saved, run again to resume.")
+            self.m_statusAssignmentsScores = pd.DataFrame(columns=STATUS_ASSIGNMENT_SCORES_COLUMNS)
+            return False
 
+        self.m_statusAssignmentsScores = self.__createStatusAssignmentScores__(downloadedScores)
+        return True
+
+    def __downloadStatusAssignmentScores__(self, _bulkFetch: bool) -> list[pd.DataFrame]:
+        """
+        :Description:
+
+        This function downloads and filters the scores for every status assignment. See
+        ``Canvas.updateStatusAssignmentScores``.
+
+        :param _bulkFetch: If all the status assignments should be pulled at once, or one assignment at a time.
+
+        :return: the filtered scores. See ``Canvas.__filterSubmissions__``
+        :raises PaginationError: if the scores couldn't all be downloaded
+        """
+        # /api/v1/courses/:course/assignments/:assignmentid/submissions
         header = {"Authorization": f"Bearer {self.API_KEY}"}
         flags = "per_page=100"
-        print(f"Updating {len(self.m_statusAssignments)} status assignments...")
 
-        self.m_statusAssignmentsScores['multipass'] = ""
-        self.m_statusAssignmentsScores['student_score'] = 0.0
-        self.m_statusAssignmentsScores['status_assignment_id'] = 0
+        if _bulkFetch:
+            print(f"\tUpdating {', '.join(self.m_statusAssignments['name'].values)} "
+                  f"for {len(self.m_students)} students...", end='')
 
-        for assignment in self.m_statusAssignments['id'].values:
-            assignmentName = self.m_statusAssignments.loc[self.m_statusAssignments['id'] == assignment, 'name'].values
-            print(f"\tUpdating {assignmentName[0]} for {len(self.m_students)} students...", end='')
+            pages = self.__iterBulkSubmissions__(self.m_statusAssignments['id'].values.tolist(),
+                                                 checkpoint=self.__getCheckpointPath__("status_assignments"))
 
-            url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/assignments/{assignment}/submissions"
+            validScores, invalidScoreCounter = \
+                self.__filterSubmissionPages__(pages, self.m_statusAssignments['id'].values)
+
+            if invalidScoreCounter != 0:
+                print("Warning")
+                print(f"\t\t{invalidScoreCounter} invalid scores were downloaded")
+            else:
+                print("Done")
 
-            res = self.__getPaginatedResponse__(url, header, flags=flags)
-            invalidScoreCounter = 0
+            return [validScores]
 
-            for score in res:
-                if 'user_id' not in score.keys() or 'score' not in score.keys() or 'assignment_id' not in score.keys():
-                    invalidScoreCounter += 1
-                    continue
+        downloadedScores: list[pd.DataFrame] = []
 
-                if score['assignment_id'] != assignment:
-                    invalidScoreCounter += 1
-                    continue
-                studentMultipass = self.m_students.loc[self.m_students['id'] == score['user_id'], 'sis_id']
+        for assignment, assignmentName in \
+                zip(self.m_statusAssignments['id'].values, self.m_statusAssignments['name'].values):
+            print(f"\tUpdating {assignmentName} for {len(self.m_students)} students...", end='')
 
-                # When we pull scores, we also pull scores for students who dropped, and virtual students
-                #  like the test student. So in this case, those are expected invalid students, so don't increment
-                #  the counter
-                if len(studentMultipass) == 0:
-                    # invalidScoreCounter += 1
-                    continue
+            url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/assignments/{assignment}/submissions"
+
+            pages = self.__iterPaginatedResponse__(url, header, flags=flags,
+                                                   checkpoint=self.__getCheckpointPath__(f"submissions_{assignment}"))
 
-                self.m_statusAssignmentsScores = \
-                    pd.concat([self.m_statusAssignmentsScores, pd.DataFrame({
-                                'multipass': str(studentMultipass.values[0]),
-                                'student_score': float(score['score']),
-                                'status_assignment_id': int(assignment)}, index=[0])],
-                              ignore_index=True)
+            validScores, invalidScoreCounter = self.__filterSubmissionPages__(pages, [assignment])
+            downloadedScores.append(validScores)
 
             if invalidScoreCounter != 0:
                 print("Warning")
@@ -415,6 +1102,112 @@ class Canvas:
                 continue
             print("Done")
 
+        return downloadedScores
+
+    def __iterBulkSubmissions__(self, _assignments: list[int], checkpoint: (str, None) = None, flags: str = "") \
+            -> Iterator[list[dict[any, any]]]:
+        """
+        :Description:
+
+        This function pulls the submissions for all students for every assignment in ``_assignments`` as one paginated
+        stream, rather than pulling each assignment separately.
+
+        :param _assignments: the ids of the assignments to pull the submissions for
+        :param checkpoint: See ``Canvas.__iterPaginatedResponse__``
+        :param flags: Any extra flags to pass to Canvas, such as ``include[]=submission_comments``. Completely optional.
+
+        :return: each page of submissions for all the assignments, each submission has its ``assignment_id`` set
+        :raises PaginationError: if the submissions couldn't all be downloaded
+        """
+        # /api/v1/courses/:course_id/students/submissions
+        url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/students/submissions"
+        header = {"Authorization": f"Bearer {self.API_KEY}"}
+        flags = "per_page=100&student_ids[]=all" + "".join(f"&assignment_ids[]={assignment}"
+                                                           for assignment in _assignments) \
+                + (f"&{flags}" if flags else "")
+
+        return self.__iterPaginatedResponse__(url, header, flags=flags, checkpoint=checkpoint)
+
+    @staticmethod
+    def __filterSubmissionPages__(_pages: Iterator[list[dict[any, any]]], _assignments: list[int]) \
+            -> (pd.DataFrame, int):
+        """
+        :Description:
+
+        This function keeps only the fields we use from each page of submissions as it arrives, then filters them all
+        at once. See ``Canvas.__filterSubmissions__``.
+
+        :param _pages: the pages of submissions as returned by Canvas
+        :param _assignments: the ids of the assignments that the submissions should belong to
+
+        :return: the valid submissions and the number of invalid submissions
+        :raises PaginationError: if the submissions couldn't all be downloaded
+        """
+        # only the fields we use are kept from each page, so the rest of the page can be dropped as soon as possible
+        projectedSubmissions: list[tuple] = []
+
+        for page in _pages:
+            projectedSubmissions.extend(
+                (submission.get('user_id'), submission.get('assignment_id'), submission.get('score'))
+                for submission in page)
+
+        validSubmissions: pd.DataFrame = Canvas.__filterSubmissions__(projectedSubmissions, _assignments)
+
+        return validSubmissions, len(projectedSubmissions) - len(validSubmissions)
+
+    @staticmethod
+    def __filterSubmissions__(_submissions: list[(dict[any, any], tuple)], _assignments: list[int]) -> pd.DataFrame:
+        """
+        :Description:
+
+        This function converts the raw submissions from Canvas into a dataframe with only the columns we use
+        (``user_id``, ``assignment_id`` and ``score``), dropping the submissions that are missing any of them, that don't
+        have a numeric score, or that don't belong to one of ``_assignments``.
+
+        :param _submissions: the submissions as returned by Canvas, or ``(user_id, assignment_id, score)`` tuples
+        :param _assignments: the ids of the assignments that the submissions should belong to
+
+        :return: the valid submissions
+        """
+        submissions: pd.DataFrame = \
+            pd.DataFrame.from_records(_submissions, columns=['user_id', 'assignment_id', 'score'])
+        submissions['score'] = pd.to_numeric(submissions['score'], errors='coerce')
+
+        validSubmissions = submissions.notna().all(axis=1) & submissions['assignment_id'].isin(_assignments)
+
+        return submissions.loc[validSubmissions]
+
+    def __createStatusAssignmentScores__(self, _submissions: list[pd.DataFrame]) -> pd.DataFrame:
+        """
+        :Description:
+
+        This function joins the filtered submissions for every status assignment to the roster in one go to get the
+        student's multipass for each score. See ``Canvas.__filterSubmissions__``.
+
+        When we pull scores, we also pull scores for students who dropped, and virtual students like the test student.
+        Those are expected to not be in the roster, so they are just dropped.
+
+        :param _submissions: the filtered submissions for each status assignment
+
+        :return: the status assignment scores with the columns ``multipass``, ``student_score``
+                 and ``status_assignment_id``
+        """
+        submissions: pd.DataFrame = pd.concat(_submissions, ignore_index=True) if _submissions else pd.DataFrame(
+            columns=['user_id', 'assignment_id', 'score'])
+
+        roster: pd.Series = self.m_students.drop_duplicates(subset='id').set_index('id')['sis_id']
+        submissions = submissions.astype({'user_id': roster.index.dtype})
+
+        # this is a hash join on the canvas id, so the scores keep the order that canvas returned them in
+        inRoster = submissions['user_id'].isin(roster.index)
+        scores: pd.DataFrame = submissions.loc[inRoster]
+
+        return pd.DataFrame({
+            'multipass': scores['user_id'].map(roster).astype(str).values,
+            'student_score': scores['score'].astype(float).values,
+            'status_assignment_id': scores['assignment_id'].astype(int).values,
+        })
+
     def getCourseList(self):
         """
         :Description:
@@ -432,7 +1225,11 @@ class Canvas:
         url = f"{self.ENDPOINT}/api/v1/users/{self.USER_ID}/courses"
         header = {"Authorization": f"Bearer {self.API_KEY}"}
 
-        result = self.__getPaginatedResponse__(url, header)
+        try:
+            result = self.__getPaginatedResponse__(url, header)
+        except PaginationError as e:
+            print(f"Unable to retrieve courses. {e}")
+            return []
 
         validEnrollments = ['ta', 'teacher']
         validCourses = []
@@ -456,36 +1253,316 @@ class Canvas:
 
         return validCourses
 
-    def postAssignment(self, _assignment: str, _batchedAssignment: list[str]) -> bool:
+    def __postBatches__(self, _url: str, _batches: Iterable[bytes],
+                        onBatchPosted: (Callable[[float, bool], None], None) = None,
+                        onBatchFinished: (Callable[[int, dict[any, any]], None], None) = None) -> list[dict[any, any]]:
         """
         :Description:
 
-        This function post assignments to Canvas in batches of at most 50. It waits for a response from the
-        api and validates to check if the posting was successful or not.
+        This function posts every batch to ``_url``, at most ``MAX_POST_WORKERS`` at a time, then waits for Canvas to
+        finish processing all of them. See ``Canvas.__waitForProgress__``.
+
+        The batches are only taken from ``_batches`` as a slot frees up, so a generator can decide how big the next
+        batch should be based on how the batches before it went. ``onBatchPosted`` is called with how long each post
+        took, in seconds, and whether Canvas accepted it, before the next batch is taken.
+        Once Canvas has finished processing the batches, ``onBatchFinished`` is called with the position of each batch
+        and its final progress object.
+
+        :param _url: the endpoint to post the batches to
+        :param _batches: the url encoded form data for each batch
+        :param onBatchPosted: called after each batch is posted. Completely optional.
+        :param onBatchFinished: called with the final state of each batch. Completely optional.
+
+        :return: the final progress object for each batch, in the same order as ``_batches``
+        """
+        # the batches are already encoded, so requests won't set the content type for us
+        header = {"Authorization": f"Bearer {self.API_KEY}", "Content-Type": "application/x-www-form-urlencoded"}
+
+        def postBatch(_batch: bytes) -> (dict[any, any], float):
+            startTime: float = time.time()
+            return self.__postRequest__(_url, header, _batch), time.time() - startTime
+
+        batches: Iterator[bytes] = iter(_batches)
+        progresses: list[dict[any, any]] = []
+
+        with ThreadPoolExecutor(max_workers=MAX_POST_WORKERS) as executor:
+            inFlight: deque = deque(executor.submit(postBatch, batch)
+                                    for batch in itertools.islice(batches, MAX_POST_WORKERS))
+            while inFlight:
+                progress, latency = inFlight.popleft().result()
+                progresses.append(progress)
+
+                if onBatchPosted is not None:
+                    onBatchPosted(latency, 'url' in progress)
+
+                nextBatch: (bytes, None) = next(batches, None)
+                if nextBatch is not None:
+                    inFlight.append(executor.submit(postBatch, nextBatch))
+
+        if not progresses:
+            return []
+
+        progresses = self.__waitForProgress__(progresses)
+
+        if onBatchFinished is not None:
+            for i, progress in enumerate(progresses):
+                onBatchFinished(i, progress)
+
+        return progresses
+
+    def __waitForProgress__(self, _progresses: list[dict[any, any]]) -> list[dict[any, any]]:
+        """
+        :Description:
+
+        This function polls the Canvas progress jobs for the posted batches until all of them have either completed or
+        failed, or until ``PROGRESS_TIMEOUT`` seconds have passed. All the pending jobs are polled together each round.
+
+        A batch that Canvas rejected outright (so we never got a progress job for it) is marked as ``failed``.
+        A job that didn't finish before the timeout is left in whatever state it was last in (``queued`` or ``running``)
+
+        :param _progresses: the progress objects returned by Canvas when the batches were posted
+
+        :return: the latest progress object for each batch, in the same order as ``_progresses``
+        """
+        header = {"Authorization": f"Bearer {self.API_KEY}"}
+
+        progresses: list[dict[any, any]] = \
+            [progress if 'url' in progress else {**progress, 'workflow_state': "failed"} for progress in _progresses]
+
+        pendingBatches: list[int] = [i for i, progress in enumerate(progresses)
+                                     if progress.get('workflow_state') not in PROGRESS_FINAL_STATES]
+        if not pendingBatches:
+            return progresses
+
+        deadline: float = time.time() + PROGRESS_TIMEOUT
+
+        with ThreadPoolExecutor(max_workers=min(MAX_POST_WORKERS, len(pendingBatches))) as executor:
+            while pendingBatches and time.time() < deadline:
+                time.sleep(PROGRESS_POLL_INTERVAL)
+
+                updatedProgresses = executor.map(lambda i: self.__getRequest__(progresses[i]['url'], header),
+                                                 pendingBatches)
+
+                for i, progress in zip(pendingBatches, updatedProgresses):
+                    # if the poll itself failed, keep the last state that we know about and try again next round
+                    if progress:
+                        progresses[i] = progress
+
+                pendingBatches = [i for i in pendingBatches
+                                  if progresses[i].get('workflow_state') not in PROGRESS_FINAL_STATES]
+
+        return progresses
+
+    def getCurrentGrades(self, _assignments: list[int]) -> (dict[str, dict[str, dict[str, any]]], None):
+        """
+        :Description:
+
+        This function pulls the scores and comments that are currently in Canvas for every student in
+        ``_assignments``, so that they can be compared against new scores before anything is posted.
+
+        The score is the score that was entered for the student, before any late policy Canvas may apply.
+        The comment is the most recent comment left on the submission, or an empty string if there aren't any.
+
+        :Example:
+
+        .. code-block:: json
+
+            {
+                assignment_id: {
+                    student_id: {
+                        score: 6.0,
+                        comment: "Nice Work!"
+                    }
+                }
+            }
+
+        The assignment ids and the student ids are strings.
+
+        :param _assignments: the ids of the assignments to pull the grades for
+
+        :return: the current grades for each assignment, or None if they couldn't be retrieved
+        """
+        if not self.__validate__():
+            return None
+
+        currentGrades: dict[str, dict[str, dict[str, any]]] = {str(assignment): {} for assignment in _assignments}
+
+        try:
+            for page in self.__iterBulkSubmissions__(_assignments, flags="include[]=submission_comments"):
+                for submission in page:
+                    comments: list[dict[any, any]] = submission.get('submission_comments') or []
+                    assignmentGrades: dict[str, dict[str, any]] = \
+                        currentGrades.setdefault(str(submission.get('assignment_id')), {})
+
+                    assignmentGrades[str(submission.get('user_id'))] = {
+                        'score': submission.get('entered_score', submission.get('score')),
+                        'comment': comments[-1].get('comment', "") if comments else ""
+                    }
+        except PaginationError as e:
+            print(f"Unable to retrieve the current grades. {e}")
+            return None
+
+        return currentGrades
+
+    def postAssignment(self, _assignment: str, _batchedAssignment: Iterable[bytes],
+                       onBatchPosted: (Callable[[float, bool], None], None) = None,
+                       onBatchFinished: (Callable[[int, dict[any, any]], None], None) = None) -> bool:
+        """
+        :Description:
+
+        This function post assignments to Canvas in batches. The batches are posted concurrently,
+        then the progress of every batch is tracked until Canvas finishes processing it.
+        The final state of each batch (``queued``, ``running``, ``completed`` or ``failed``) is reported.
 
         :param _assignment: the assigment *ID* to be posted. Must be the ID and *NOT* the name
-        :param _batchedAssignment: the list of assignments
+        :param _batchedAssignment: the list of assignments, or a generator of them. See ``Canvas.__postBatches__``
+        :param onBatchPosted: called after each batch is posted. See ``Canvas.__postBatches__``
+        :param onBatchFinished: called with the final state of each batch. See ``Canvas.__postBatches__``
 
-        :return: True on a success False on a failure
+        :return: True if every batch completed, False if any batch failed or didn't finish in time
         """
         # POST /v1/courses/{course_id}/assignments/{assignment_id}/submissions/update_grades
-        # payload = f"grade_data[25685][posted_grade]=6.0&grade_data[25685][text_comment]=Nice Work!&" \
-        # f"grade_data[30691][posted_grade]=0.0&grade_data[30691][text_comment]=No Submission&"
+        # payload = f"grade_data[25685][posted_grade]=6.0&grade_data[25685][text_comment]=Nice+Work%21&" \
+        # f"grade_data[30691][posted_grade]=0.0&grade_data[30691][text_comment]=No+Submission&"
 
         url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/assignments/{_assignment}/submissions/update_grades"
+
+        print(f"\t\tPosting batches...", end='')
+        progresses: list[dict[any, any]] = \
+            self.__postBatches__(url, _batchedAssignment, onBatchPosted, onBatchFinished)
+        print(f"Posted {len(progresses)} batches")
+
+        return self.__reportProgress__(progresses)
+
+    def postCourseGrades(self, _batchedGrades: Iterable[bytes],
+                         onBatchPosted: (Callable[[float, bool], None], None) = None,
+                         onBatchFinished: (Callable[[int, dict[any, any]], None], None) = None) -> bool:
+        """
+        :Description:
+
+        This function posts the scores for many assignments at once, using the course level ``update_grades`` endpoint.
+        Each batch can mix scores from any of the assignments in the course, so several assignments can share batches
+        rather than each assignment getting its own. The batches are posted and tracked the same way as
+        ``Canvas.postAssignment``.
+
+        :param _batchedGrades: the batches of grades, or a generator of them. Each grade is keyed by the assignment id
+            *then* the student id
+        :param onBatchPosted: called after each batch is posted. See ``Canvas.__postBatches__``
+        :param onBatchFinished: called with the final state of each batch. See ``Canvas.__postBatches__``
+
+        :return: True if every batch completed, False if any batch failed or didn't finish in time
+        """
+        # POST /v1/courses/{course_id}/submissions/update_grades
+        # payload = f"grade_data[283462][25685][posted_grade]=6.0&grade_data[283462][25685][text_comment]=Nice+Work%21&" \
+        # f"grade_data[283470][25685][posted_grade]=0.0&grade_data[283470][25685][text_comment]=No+Submission&"
+
+        url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/submissions/update_grades"
+
+        print(f"\t\tPosting batches...", end='')
+        progresses: list[dict[any, any]] = \
+            self.__postBatches__(url, _batchedGrades, onBatchPosted, onBatchFinished)
+        print(f"Posted {len(progresses)} batches")
+
+        return self.__reportProgress__(progresses)
+
+    def uploadGradebook(self, _gradebookPath: str) -> bool:
+        """
+        :Description:
+
+        This function uploads a gradebook csv to Canvas in a single request, rather than posting every score in batches.
+        See ``Grade.post.writeUpdatedGradebookToFile`` for the format Canvas requires.
+
+        This follows the Canvas file upload flow: Canvas is told about the file, the file is uploaded to the url
+        Canvas gives back, then the import job that Canvas creates for the file is tracked until it finishes.
+        See ``Canvas.__waitForProgress__``.
+
+        **THIS FUNCTION DOES NOT POST ANY SCORES**
+
+        Canvas only *stages* an uploaded gradebook. The import job just parses the file, then the changes have to be
+        reviewed and applied in Canvas before any score is written. See ``Canvas.getGradebookUploadURL``.
+
+        :param _gradebookPath: the path to the gradebook csv to upload
+
+        :return: True if Canvas finished staging the gradebook, False if not
+        """
+        # POST /api/v1/courses/{course_id}/gradebook_upload - gets where to upload the gradebook to
+        if not self.__validate__():
+            return False
+
+        if not os.path.isfile(_gradebookPath):
+            print(f"\t\tUnable to find gradebook {_gradebookPath}")
+            return False
+
+        url = f"{self.ENDPOINT}/api/v1/courses/{self.COURSE_ID}/gradebook_upload"
         header = {"Authorization": f"Bearer {self.API_KEY}"}
 
-        responses: list[dict[any, any]] = []
-        for i, batch in enumerate(_batchedAssignment):
-            print(f"\t\tPosting batch {i + 1} / {len(_batchedAssignment)}...", end='')
-            responses.append(self.__postRequest__(url, header, batch))
-            if len(responses[i]) == 0:
-                print(f"Failed\n\tPosting failed on batch {i + 1} / {len(_batchedAssignment)}")
-                return False
-            print("Pending")
-            # TODO validate the response
+        print("\t\tUploading gradebook...", end='')
+        upload: dict[any, any] = self.__postRequest__(url, header, {
+            'name': os.path.basename(_gradebookPath),
+            'size': os.path.getsize(_gradebookPath),
+            'content_type': "text/csv"
+        })
+        if 'upload_url' not in upload:
+            print("Failed")
+            return False
 
-        return True
+        # The upload url is pre-authorized, so the api key is *not* sent with the file
+        with open(_gradebookPath, "rb") as gradebook:
+            result = self.__sendRequest__("POST", upload['upload_url'], data=upload.get('upload_params', {}),
+                                          files={'file': (os.path.basename(_gradebookPath), gradebook, "text/csv")},
+                                          allow_redirects=False)
+
+        # Canvas may redirect us to confirm the upload, that request *does* need the api key
+        if 300 <= result.status_code < 400 and 'Location' in result.headers:
+            result = self.__sendRequest__("GET", result.headers['Location'], headers=header)
+
+        if result.status_code not in (200, 201):
+            print("Failed")
+            print(f"An error occurred while making request. HTTP code is {result.status_code}")
+            return False
+        print("Done")
+
+        response: dict[any, any] = result.json()
+        progress: dict[any, any] = response.get('progress', response)
+
+        print("\t\tWaiting for Canvas to stage the gradebook...", end='')
+        progresses: list[dict[any, any]] = self.__waitForProgress__([progress])
+        print("Done")
+
+        return self.__reportProgress__(progresses)
+
+    def getGradebookUploadURL(self) -> str:
+        """
+        :Description:
+
+        This function gets the page in Canvas where a staged gradebook upload is reviewed and applied.
+        See ``Canvas.uploadGradebook``.
+
+        :return: the url for the staged gradebook upload
+        """
+        return f"{self.ENDPOINT}/courses/{self.COURSE_ID}/gradebook_upload"
+
+    @staticmethod
+    def __reportProgress__(_progresses: list[dict[any, any]]) -> bool:
+        """
+        :Description:
+
+        This function prints the final state of each posted batch.
+
+        :param _progresses: the final progress objects for each batch. See ``Canvas.__waitForProgress__``
+
+        :return: True if every batch completed, False if not
+        """
+        allCompleted: bool = True
+        for i, progress in enumerate(_progresses):
+            state: str = progress.get('workflow_state', "failed")
+            print(f"\t\tBatch {i + 1} / {len(_progresses)}: {state}")
+            if state != "completed":
+                allCompleted = False
+                if progress.get('message'):
+                    print(f"\t\t\t{progress['message']}")
+
+        return allCompleted
 
     def getAssignmentIDsFromCommonName(self, _assignmentList: list[str]) -> dict[str, str]:
         """
@@ -528,7 +1605,9 @@ class Canvas:
             except ValueError:
                 raise AttributeError("Unable to to parse assignment ID")
 
-        return self.m_assignments.loc[self.m_assignments['id'] == _id]
+        position: (int, None) = self.m_assignmentsByID.get(_id)
+
+        return self.m_assignments.iloc[[position] if position is not None else []]
 
     def getAssignmentFromCommonName(self, _assignment: str) -> (pd.DataFrame, None):
         """
@@ -539,7 +1618,8 @@ class Canvas:
         :return:
         """
 
-        filteredAssignments: pd.DataFrame = self.m_assignments.loc[self.m_assignments['common_name'] == _assignment]
+        filteredAssignments: pd.DataFrame = \
+            self.m_assignments.iloc[self.m_assignmentsByCommonName.get(_assignment, [])]
         # Validate assignments and correctly map assignment.
         if len(filteredAssignments) > 1:
             print(f"Many assignments matching {_assignment} found. Please enter the id the correct one")
@@ -567,9 +1647,9 @@ class Canvas:
         :return:
         """
         if commonName is not None:
-            return len(self.m_assignments.loc[self.m_assignments['common_name'] == commonName]) > 0
+            return commonName in self.m_assignmentsByCommonName
         if canvasID is not None:
-            return len(self.m_assignments.loc[self.m_assignments['id'] == canvasID]) > 0
+            return int(canvasID) in self.m_assignmentsByID
 
         return False
 
@@ -580,19 +1660,25 @@ class Canvas:
         This function maps the common name of the assignment to the actual assignment - this will help clean up a lot of
         the logic and make the rest of the program a lot more consistent with the way that it handles them
 
+        Assignments that have already been selected are not selected again.
+
         :param _assignments: the list of assignment common names.
         """
 
         if type(_assignments) is not list or not _assignments:
             raise AttributeError("Unable to parse _assignments. Must be a list of strings.")
-        if self.m_assignmentsToGrade is None:
-            self.m_assignmentsToGrade = pd.DataFrame()
 
         for assignment in _assignments:
             mappedAssignment: (pd.DataFrame, None) = self.getAssignmentFromCommonName(assignment)
             if mappedAssignment is None:
                 continue
-            self.m_assignmentsToGrade = pd.concat([self.m_assignmentsToGrade, mappedAssignment], axis=0, join='outer')
+
+            for assignmentID in mappedAssignment['id'].values:
+                position: int = self.m_assignmentsByID[int(assignmentID)]
+                if position not in self.m_assignmentsToGradePositions:
+                    self.m_assignmentsToGradePositions.append(position)
+
+        self.m_assignmentsToGrade = self.m_assignments.iloc[self.m_assignmentsToGradePositions]
 
     def getStudents(self):
         return self.m_students
@@ -1,3 +1,6 @@
+import hashlib
+import itertools
+import weakref
 import pandas as pd
 import FileHelpers.fileHelper as fileHelper
 
@@ -5,6 +8,14 @@ DEFAULT_SPECIAL_CASES_SEARCH_PATH = "special_cases/special_cases.xlsx"
 SPECIAL_CASES_REQUIRED_COLUMNS = ["handled", "name", "assignment", "extension_type",
                                   "student_comment", "extension_days", "approved_by",
                                   "handled", "grader_notes"]
+# The columns that the special cases are indexed by. See ``indexSpecialCases``
+SPECIAL_CASES_INDEX_COLUMNS = ["assignment", "multipass"]
+
+# The special cases dataframe that each index was built for, by the token stored with the index. Copies and slices of
+# the special cases share its ``attrs``, so this is how we know that an index wasn't built for them.
+# See ``getSpecialCasesIndex``
+_indexedSpecialCases: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+_indexTokens: itertools.count = itertools.count()
 
 
 def loadExcel(_filename, promptIfError: bool = False, directoriesToCheck: list[str] = None):
@@ -46,6 +57,108 @@ def createEmptySpecialCasesSheet() -> pd.DataFrame:
     return specialCasesDF
 
 
+def getSpecialCasesFingerprint(_specialCasesDF: pd.DataFrame) -> str:
+    """
+    :Description:
+
+    This function fingerprints the rows of the special cases, and which student and assignment each row is for.
+    If rows are added, removed, reordered or relabeled, or the ``assignment`` or ``multipass`` of a row is changed, the
+    fingerprint changes.
+
+    :param _specialCasesDF: the special cases dataframe
+
+    :return: the fingerprint of the special cases
+    """
+    if _specialCasesDF.empty:
+        return ""
+
+    rows: pd.Series = pd.util.hash_pandas_object(_specialCasesDF[SPECIAL_CASES_INDEX_COLUMNS], index=True)
+
+    return hashlib.sha256(rows.to_numpy().tobytes()).hexdigest()
+
+
+def indexSpecialCases(_specialCasesDF: pd.DataFrame) -> dict[str, dict[str, list]]:
+    """
+    :Description:
+
+    This function indexes the special cases by assignment, then by student multipass, so the special cases for a student
+    can be found without searching the whole sheet.
+
+    The index is stored with the special cases (in ``attrs``), along with a fingerprint of the special cases, so it only
+    has to be built again if the special cases change. See ``getSpecialCasesIndex`` and ``refreshSpecialCasesIndex``.
+
+    :Example:
+
+    .. code-block:: json
+
+        {
+            "HW6": {
+                "10864521": [0, 12]
+            }
+        }
+
+    :param _specialCasesDF: the special cases dataframe
+
+    :return: the assignments mapped to each student's special cases, as index *labels* in ``_specialCasesDF``
+    """
+    specialCasesIndex: dict[str, dict[str, list]] = {}
+
+    if not _specialCasesDF.empty:
+        specialCases = _specialCasesDF.groupby(SPECIAL_CASES_INDEX_COLUMNS, sort=False).groups
+        for (assignment, multipass), labels in specialCases.items():
+            specialCasesIndex.setdefault(assignment, {})[multipass] = labels.tolist()
+
+    indexToken: int = next(_indexTokens)
+    _indexedSpecialCases[indexToken] = _specialCasesDF
+
+    _specialCasesDF.attrs['index'] = specialCasesIndex
+    _specialCasesDF.attrs['index_token'] = indexToken
+    _specialCasesDF.attrs['index_fingerprint'] = getSpecialCasesFingerprint(_specialCasesDF)
+
+    return specialCasesIndex
+
+
+def getSpecialCasesIndex(_specialCasesDF: pd.DataFrame) -> dict[str, dict[str, list]]:
+    """
+    :Description:
+
+    This function gets the index for the special cases built by ``indexSpecialCases``.
+    If the special cases haven't been indexed yet, or the index was built for another dataframe (like the special cases
+    this is a copy or a slice of), the index is rebuilt.
+
+    This is called for every lookup, so it does *not* check if the rows were changed in place. Anything that changes
+    the ``assignment`` or ``multipass`` of the special cases, or adds or removes rows in place, must call
+    ``indexSpecialCases`` again. ``refreshSpecialCasesIndex`` checks for this once per grading pass.
+
+    :param _specialCasesDF: the special cases dataframe
+
+    :return: the special cases index. See ``indexSpecialCases``
+    """
+    if 'index' not in _specialCasesDF.attrs \
+            or _indexedSpecialCases.get(_specialCasesDF.attrs.get('index_token')) is not _specialCasesDF:
+        return indexSpecialCases(_specialCasesDF)
+
+    return _specialCasesDF.attrs['index']
+
+
+def refreshSpecialCasesIndex(_specialCasesDF: pd.DataFrame) -> dict[str, dict[str, list]]:
+    """
+    :Description:
+
+    This function checks that the special cases haven't changed since they were indexed (see
+    ``getSpecialCasesFingerprint``), and rebuilds the index if they have. This has to read every special case, so it
+    should be called once at the start of grading, rather than for every lookup. See ``getSpecialCasesIndex``.
+
+    :param _specialCasesDF: the special cases dataframe
+
+    :return: the special cases index. See ``indexSpecialCases``
+    """
+    if _specialCasesDF.attrs.get('index_fingerprint') != getSpecialCasesFingerprint(_specialCasesDF):
+        return indexSpecialCases(_specialCasesDF)
+
+    return getSpecialCasesIndex(_specialCasesDF)
+
+
 def loadSpecialCases():
     """
     :Description:
@@ -106,6 +219,9 @@ def loadSpecialCases():
     # fill the NaNs in the grader notes col with empty strings
     specialCasesDF['grader_notes'] = specialCasesDF['grader_notes'].fillna('')
 
+    # index the special cases once, so that grading doesn't have to search the sheet for each student
+    indexSpecialCases(specialCasesDF)
+
     print("Done.")
     return specialCasesDF
 
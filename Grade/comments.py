@@ -0,0 +1,135 @@
+"""
+Description
+================
+
+This module renders the comments that are posted to Canvas with students' grades.
+
+Each distinct message (like "-20%: 1 day late" or "Extended by 2 days") is rendered once and cached, then every
+student's comment is put together from those messages a whole column at a time. This means that pluralizing the
+messages only happens once for each message, instead of once for each student.
+"""
+import functools
+import inflect
+import numpy as np
+import pandas as pd
+
+p = inflect.engine()
+
+NO_SUBMISSION_COMMENT = "No Submission.\nContact grader if you think this is a mistake."
+
+
+@functools.lru_cache(maxsize=None, typed=True)
+def renderLatePenaltyComment(_daysLate: int, _penalty: float) -> str:
+    """
+    :Description:
+
+    This function renders the comment for a late penalty, for example ``-20%: 1 day late``
+
+    :param _daysLate: the number of days that the submission was late
+    :param _penalty: the score mod for the late penalty
+
+    :return: the late penalty comment
+    """
+    return f"-{(1 - _penalty) * 100:02.0f}%: {_daysLate} {p.plural('day', _daysLate)} late"
+
+
+@functools.lru_cache(maxsize=None, typed=True)
+def renderExtensionComment(_extensionDays: int) -> str:
+    """
+    :Description:
+
+    This function renders the comment for an extension from a special case, for example ``Extended by 2 days``
+
+    :param _extensionDays: the number of days the submission was extended by
+
+    :return: the extension comment
+    """
+    return f"Extended by {_extensionDays} {p.plural('day', _extensionDays)}"
+
+
+@functools.lru_cache(maxsize=None, typed=True)
+def renderStatusAssignmentComment(_extensionType: str, _extensionDays: int) -> str:
+    """
+    :Description:
+
+    This function renders the comment for an extension that used a status assignment,
+    for example ``Extended with 2 Late Passes``
+
+    :param _extensionType: the extension type that triggered the status assignment
+    :param _extensionDays: the number of days the submission was extended by
+
+    :return: the status assignment comment
+    """
+    return f"Extended with {_extensionDays} {p.plural(_extensionType, _extensionDays)}"
+
+
+def renderLatePenaltyComments(_daysLate: pd.Series, _latePenalty: list[float]) -> pd.Series:
+    """
+    :Description:
+
+    This function renders the late penalty comment for each student.
+
+    :param _daysLate: the number of days that each student was late
+    :param _latePenalty: an array of floats that contains the score mods for the late penalty
+
+    :return: the late penalty comment for each student
+    """
+    comments: dict[int, str] = {days: renderLatePenaltyComment(days, _latePenalty[days]) for days in _daysLate.unique()}
+
+    return _daysLate.map(comments)
+
+
+def renderExtensionComments(_extensionDays: pd.Series) -> pd.Series:
+    """
+    :Description:
+
+    This function renders the extension comment for each student.
+
+    :param _extensionDays: the number of days each student was extended by
+
+    :return: the extension comment for each student
+    """
+    comments: dict[int, str] = {days: renderExtensionComment(days) for days in _extensionDays.unique()}
+
+    return _extensionDays.map(comments)
+
+
+def renderStatusAssignmentComments(_extensionTypes: pd.Series, _extensionDays: pd.Series) -> pd.Series:
+    """
+    :Description:
+
+    This function renders the status assignment comment for each student.
+
+    :param _extensionTypes: the extension type that each student used
+    :param _extensionDays: the number of days each student was extended by
+
+    :return: the status assignment comment for each student
+    """
+    extensions: pd.MultiIndex = pd.MultiIndex.from_arrays([_extensionTypes, _extensionDays])
+    comments: dict[tuple[str, int], str] = {
+        (extensionType, extensionDays): renderStatusAssignmentComment(extensionType, extensionDays)
+        for extensionType, extensionDays in extensions.unique()
+    }
+
+    return pd.Series(extensions.map(comments), index=_extensionTypes.index)
+
+
+def joinComments(*_comments: pd.Series) -> pd.Series:
+    """
+    :Description:
+
+    This function puts together each student's comment from its parts, with each part on a new line.
+    Empty parts are skipped.
+
+    :param _comments: the parts of the comment, in order. Each part has a (possibly empty) comment for every student.
+
+    :return: the complete comment for each student
+    """
+    joinedComments: np.ndarray = _comments[0].to_numpy(dtype=object)
+
+    for comments in _comments[1:]:
+        comments: np.ndarray = comments.reindex(_comments[0].index, fill_value="").to_numpy(dtype=object)
+        joinedComments = np.where(joinedComments == "", comments,
+                                  np.where(comments == "", joinedComments, joinedComments + "\n" + comments))
+
+    return pd.Series(joinedComments, index=_comments[0].index, name=_comments[0].name)
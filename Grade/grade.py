@@ -9,12 +9,21 @@ They work directly with the Gradescope assignment Dataframe and the special case
 This file **non-destructively** edits the grades. Meaning that nothing is written to file or Canvas - it
 has to be committed by the user using a different module.
 """
+import contextlib
 import datetime
-import math
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterable
+import numpy as np
 import pandas as pd
-import inflect
+from FileHelpers.excelLoaders import getSpecialCasesIndex, refreshSpecialCasesIndex
+from Grade import comments
 
-p = inflect.engine()
+MAX_GRADING_WORKERS = os.cpu_count() or 1
+# the numeric columns that are handed to the grading workers in shared memory, rather than being pickled
+SHARED_GRADE_COLUMNS = ['Total Score', 'hours_late']
 
 
 def scaleScores(_gradescopeDF: pd.DataFrame, _scaleFactor: float,
@@ -50,23 +59,21 @@ def scaleScores(_gradescopeDF: pd.DataFrame, _scaleFactor: float,
     if XCScaleFactor is None:
         XCScaleFactor = _scaleFactor
 
-    for i, row in _gradescopeDF.iterrows():
-        grade = row['Total Score']
-        extraPoints = 0
+    # The whole column is scaled at once. The operations are in the same order as scaling each score by itself,
+    #  so the results are exactly the same.
+    grades: np.ndarray = _gradescopeDF['Total Score'].to_numpy(dtype=float)
+    extraPoints: (np.ndarray, float) = 0
 
-        if assignmentPoints is not None:
-            extraPoints = grade - (assignmentPoints / _scaleFactor)
-            grade = grade - extraPoints
+    if assignmentPoints is not None:
+        extraPoints = grades - (assignmentPoints / _scaleFactor)
+        grades = grades - extraPoints
 
-        grade *= _scaleFactor
-        extraPoints *= XCScaleFactor
+    grades = grades * _scaleFactor + extraPoints * XCScaleFactor
 
-        grade += extraPoints
+    if maxScore is not None:
+        grades = np.clip(grades, None, maxScore)
 
-        if maxScore is not None:
-            if grade >= maxScore:
-                grade = maxScore
-        _gradescopeDF.at[i, 'Total Score'] = grade
+    _gradescopeDF['Total Score'] = grades
 
     return _gradescopeDF
 
@@ -102,6 +109,31 @@ def scoreMissingAssignments(_gradescopeDF: pd.DataFrame, score: float = 0, excep
     return _gradescopeDF
 
 
+def findSpecialCases(_specialCasesDF: pd.DataFrame, _assignmentCommonName: str, multipasses=None) -> pd.Index:
+    """
+    :Description:
+
+    This function finds the special cases for an assignment using the special cases index, rather than searching the
+    whole sheet. See ``FileHelpers.excelLoaders.indexSpecialCases``.
+
+    :param _specialCasesDF: the special cases dataframe
+    :param _assignmentCommonName: the assignment to find the special cases for
+    :param multipasses: the students to find the special cases for. If not set, all the special cases for the assignment
+            are found.
+
+    :return: the index labels of the special cases, in the same order as they are in the sheet. These can be used
+            with ``.loc`` to update the special cases in place.
+    """
+    specialCasesIndex: dict[str, list] = getSpecialCasesIndex(_specialCasesDF).get(_assignmentCommonName, {})
+
+    if multipasses is None:
+        multipasses = specialCasesIndex.keys()
+
+    labels: set = {label for multipass in multipasses for label in specialCasesIndex.get(multipass, [])}
+
+    return _specialCasesDF.index[_specialCasesDF.index.isin(labels)]
+
+
 def validateAndUpdateStatusAssignments(_gradescopeDF: pd.DataFrame,
                                        _specialCasesDF: pd.DataFrame,
                                        _statusAssignmentsDF: pd.DataFrame,
@@ -131,69 +163,91 @@ def validateAndUpdateStatusAssignments(_gradescopeDF: pd.DataFrame,
     if "trigger" not in _statusAssignmentsDF.columns.to_list() or _statusAssignmentsDF.empty:
         return _gradescopeDF, _specialCasesDF, _statusAssignmentScoresDF
 
-    for i, row in _gradescopeDF.iterrows():
-        # If either of these are the case, we don't need to update the status assignments
-        if row['Status'] == "Missing" or row['hours_late'] == 0:
-            continue
-
-        currentSpecialCase = (_specialCasesDF['multipass'] == row['multipass']) & \
-                             (_specialCasesDF['assignment'] == _assignmentCommonName)
-
-        # If there is no special case for the student
-        if len(_specialCasesDF.loc[currentSpecialCase]) == 0:
-            continue
-
-        # If the special case has already been handled - do nothing
-        elif _specialCasesDF.loc[currentSpecialCase, 'handled'].values[0] != "":
-            continue
-
-        indexToAccess = 0
-
-        if _specialCasesDF.loc[currentSpecialCase, 'extension_type'].values[indexToAccess] in _statusAssignmentsDF['trigger'].values:
-            # Create a bool mask for the current status assignment score for the student and the correct trigger
-            currentStatusAssignment = \
-                (_statusAssignmentScoresDF['multipass'] == row['multipass']) & \
-                (_statusAssignmentScoresDF['status_assignment_id'] ==
-                 (_statusAssignmentsDF.loc[_statusAssignmentsDF['trigger'] ==
-                                           _specialCasesDF.loc[currentSpecialCase, 'extension_type'].values[indexToAccess],
-                                           'id'].values[indexToAccess]))
-            
-            # Check to make sure that the student actually has a value for the status assignment
-            #  This should only happen if the student dropped, or recently added and does not yet have a score
-            #  for the assignment, either way, it will require manual intervention.
-            if len(_statusAssignmentScoresDF.loc[currentStatusAssignment, 'student_score']) == 0:
-
-                _specialCasesDF.loc[currentSpecialCase, 'handled'] = "FALSE"
-                _specialCasesDF.loc[currentSpecialCase, 'grader_notes'] = \
-                    "Unable to process triggered special case: No status assignment found for student"
-
-            # if the student requested more of an extension than they were entitled to
-            elif _statusAssignmentScoresDF.loc[currentStatusAssignment, 'student_score'].values[indexToAccess] < \
-                    _specialCasesDF.loc[currentSpecialCase, 'extension_days'].values[indexToAccess]:
-
-                _specialCasesDF.loc[currentSpecialCase, 'handled'] = "FALSE"
-                _specialCasesDF.loc[currentSpecialCase, 'grader_notes'] = \
-                    "Unable to process triggered special case: Limit exceeded"
-
-            # Request is valid. approve and add a comment explaining that it was handled correctly.
-            else:
-                _specialCasesDF.loc[currentSpecialCase, 'grader_notes'] = \
-                    f"Automatically Approved on {datetime.date.today().strftime('%m-%d-%y')}"
-
-                _statusAssignmentScoresDF.loc[currentStatusAssignment, 'student_score'] -= \
-                    _specialCasesDF.loc[currentSpecialCase, 'extension_days'].values[indexToAccess]
-
-                _specialCasesDF.loc[currentSpecialCase, 'approved_by'] = "AUTOMATIC APPROVAL"
-                extensionMessage: str = p.plural(_specialCasesDF.loc[currentSpecialCase, 'extension_type'].values[indexToAccess],
-                                                 _specialCasesDF.loc[currentSpecialCase, 'extension_days'].values[indexToAccess])
-
-                _gradescopeDF.at[i, 'lateness_comment'] = \
-                    f"Extended with {_specialCasesDF.loc[currentSpecialCase, 'extension_days'].values[indexToAccess]} " + \
-                    f"{extensionMessage}"
+    # If either of these are the case, we don't need to update the status assignments
+    lateSubmissions: pd.DataFrame = _gradescopeDF.loc[(_gradescopeDF['Status'] != "Missing")
+                                                      & (_gradescopeDF['hours_late'] != 0), ['multipass']] \
+        .rename_axis('gradescope_row').reset_index()
+
+    # Join each late student with their (first) special case, skipping the ones that have already been handled
+    specialCases: pd.DataFrame = _specialCasesDF.loc[findSpecialCases(_specialCasesDF, _assignmentCommonName),
+                                                     ['multipass', 'handled', 'extension_type', 'extension_days']] \
+        .drop_duplicates('multipass')
+    requests: pd.DataFrame = lateSubmissions.merge(specialCases, on='multipass')
+    requests = requests.loc[requests['handled'] == ""]
+
+    # Join the special cases that trigger a status assignment with the status assignment they use
+    triggers: pd.DataFrame = _statusAssignmentsDF.drop_duplicates('trigger')[['trigger', 'id']] \
+        .rename(columns={'trigger': 'extension_type', 'id': 'status_assignment_id'})
+    requests = requests.merge(triggers, on='extension_type')
+
+    # Join each request with the student's current score for that status assignment
+    balances: pd.DataFrame = _statusAssignmentScoresDF[['multipass', 'status_assignment_id', 'student_score']] \
+        .drop_duplicates(['multipass', 'status_assignment_id'])
+    requests = requests.merge(balances, on=['multipass', 'status_assignment_id'], how='left', indicator=True)
+
+    # Check to make sure that the student actually has a value for the status assignment
+    #  This should only happen if the student dropped, or recently added and does not yet have a score
+    #  for the assignment, either way, it will require manual intervention.
+    noStatusAssignment: pd.Series = requests['_merge'] == "left_only"
+    # if the student requested more of an extension than they were entitled to
+    limitExceeded: pd.Series = ~noStatusAssignment & (requests['student_score'] < requests['extension_days'])
+    # Request is valid. approve and add a comment explaining that it was handled correctly.
+    approved: pd.DataFrame = requests.loc[~noStatusAssignment & ~limitExceeded]
+
+    currentSpecialCases: pd.Index = \
+        findSpecialCases(_specialCasesDF, _assignmentCommonName, requests.loc[noStatusAssignment, 'multipass'])
+    _specialCasesDF.loc[currentSpecialCases, 'handled'] = "FALSE"
+    _specialCasesDF.loc[currentSpecialCases, 'grader_notes'] = \
+        "Unable to process triggered special case: No status assignment found for student"
+
+    currentSpecialCases = findSpecialCases(_specialCasesDF, _assignmentCommonName, requests.loc[limitExceeded, 'multipass'])
+    _specialCasesDF.loc[currentSpecialCases, 'handled'] = "FALSE"
+    _specialCasesDF.loc[currentSpecialCases, 'grader_notes'] = "Unable to process triggered special case: Limit exceeded"
+
+    currentSpecialCases = findSpecialCases(_specialCasesDF, _assignmentCommonName, approved['multipass'])
+    _specialCasesDF.loc[currentSpecialCases, 'grader_notes'] = \
+        f"Automatically Approved on {datetime.date.today().strftime('%m-%d-%y')}"
+    _specialCasesDF.loc[currentSpecialCases, 'approved_by'] = "AUTOMATIC APPROVAL"
+
+    # Take all the extensions out of the students' status assignment scores at once
+    deductions: pd.Series = approved.groupby(['multipass', 'status_assignment_id'])['extension_days'].sum()
+    statusAssignmentKeys: pd.MultiIndex = \
+        pd.MultiIndex.from_frame(_statusAssignmentScoresDF[['multipass', 'status_assignment_id']])
+    deductedStatusAssignments: np.ndarray = statusAssignmentKeys.isin(deductions.index)
+    _statusAssignmentScoresDF.loc[deductedStatusAssignments, 'student_score'] -= \
+        deductions.reindex(statusAssignmentKeys[deductedStatusAssignments]).to_numpy()
+
+    _gradescopeDF.loc[approved['gradescope_row'], 'lateness_comment'] = \
+        comments.renderStatusAssignmentComments(approved['extension_type'], approved['extension_days']).to_numpy()
 
     return _gradescopeDF, _specialCasesDF, _statusAssignmentScoresDF
 
 
+def findStudentSpecialCases(_specialCasesDF: pd.DataFrame, _assignmentCommonNames: Iterable[str],
+                            _multipasses: Iterable[str]) -> pd.Index:
+    """
+    :Description:
+
+    This function finds the special cases for students across any number of assignments using the special cases index.
+    See ``findSpecialCases``.
+
+    :param _specialCasesDF: the special cases dataframe
+    :param _assignmentCommonNames: the assignment for each student
+    :param _multipasses: the students to find the special cases for
+
+    :return: the index labels of the special cases, in the same order as they are in the sheet.
+    """
+    specialCasesIndex: dict[str, dict[str, list]] = getSpecialCasesIndex(_specialCasesDF)
+
+    labels: set = {
+        label
+        for assignment, multipass in zip(_assignmentCommonNames, _multipasses)
+        for label in specialCasesIndex.get(assignment, {}).get(multipass, [])
+    }
+
+    return _specialCasesDF.index[_specialCasesDF.index.isin(labels)]
+
+
 def calculateLatePenalty(_gradescopeDF: pd.DataFrame, _specialCasesDF: pd.DataFrame, _statusAssignmentsDF: pd.DataFrame,
                          _statusAssignmentScoresDF: pd.DataFrame, _assignmentCommonName: str,
                          latePenalty: list[float] = None):
@@ -202,8 +256,7 @@ def calculateLatePenalty(_gradescopeDF: pd.DataFrame, _specialCasesDF: pd.DataFr
 
     This function calculates the late penalty according to the special cases
     Returns modified gradescope dataframe and special cases dataframe. This can only grade one
-    assignment at a time due to limitations in how ``.loc`` works in pandas and updating the master dataframe
-    would require iterating over everywhere individually and merging them.
+    assignment at a time, to grade more than one at once, see ``gradeAssignments``.
     This function also updates the lateness comment with student's special cases. If they have a status assignment
     trigger in their special case then a comment saying that it was handled is also added, assuming that it was a valid
     request.
@@ -226,124 +279,431 @@ def calculateLatePenalty(_gradescopeDF: pd.DataFrame, _specialCasesDF: pd.DataFr
     if type(_assignmentCommonName) is not str:
         raise TypeError("Assignment MUST be passed a string")
 
-    if latePenalty is None:
-        latePenalty = [1, .8, .6, .4, 0]
+    refreshSpecialCasesIndex(_specialCasesDF)
 
-    print(f"Applying late penalties for {_assignmentCommonName}...")
     _gradescopeDF['lateness_comment'] = ""
 
     _gradescopeDF, _specialCasesDF, _statusAssignmentScoresDF = \
         validateAndUpdateStatusAssignments(_gradescopeDF, _specialCasesDF, _statusAssignmentsDF,
                                            _statusAssignmentScoresDF, _assignmentCommonName)
-    specialCaseStudents = 0
-    latePenaltyStudents = 0
-    for i, row in _gradescopeDF.iterrows():
-        if not _specialCasesDF.empty:
-            # This is just a bool mask - it allows us to filter out the rows that don't meet the criteria
-            currentSpecialCase = (_specialCasesDF['multipass'] == row['multipass']) & \
-                                (_specialCasesDF['assignment'] == _assignmentCommonName)
 
-        # Skip over students who didn't submit - they already got a zero
-        if row['Status'] == "Missing":
-            if not _specialCasesDF.empty and len(_specialCasesDF.loc[currentSpecialCase]) != 0:
-                # _specialCasesDF.loc[currentSpecialCase, 'handled'] = "FALSE"
-                # If the student didn't submit - I'm considering that as handled.
-                _specialCasesDF.loc[currentSpecialCase, 'handled'] = "TRUE"
-                _specialCasesDF.loc[currentSpecialCase, 'grader_notes'] = "No Submission"
-
-                _gradescopeDF.at[i, 'lateness_comment'] = "No Submission." \
-                                                          "\nContact grader if you think this is a mistake."
-            continue
-
-        if 'hours_late' in row.index:
-            hoursLate = row['hours_late']
+    _gradescopeDF, _specialCasesDF = \
+        applyLatePenalties(_gradescopeDF, _specialCasesDF, pd.Series(_assignmentCommonName, index=_gradescopeDF.index),
+                           latePenalty)
+
+    return _gradescopeDF, _specialCasesDF, _statusAssignmentScoresDF
+
+
+def applyLatePenalties(_gradesDF: pd.DataFrame, _specialCasesDF: pd.DataFrame, _assignmentCommonNames: pd.Series,
+                       latePenalty: list[float] = None) -> (pd.DataFrame, pd.DataFrame):
+    """
+    :Description:
+
+    This function applies the special cases and late penalties to the grades for any number of assignments at once.
+    Each student is matched to their special cases by the assignment they are being graded for.
+    Status assignments must already be validated. See ``validateAndUpdateStatusAssignments``.
+
+    :param _gradesDF: the grades being graded, with a ``lateness_comment`` column
+    :param _specialCasesDF: the special cases for the assignments being graded
+    :param _assignmentCommonNames: the assignment common name for each row in ``_gradesDF``
+    :param latePenalty: an array of floats that contains the score mods for the late penalty
+
+    :return: the updated grades dataframe and the updated special cases dataframe
+    """
+    if latePenalty is None:
+        latePenalty = [1, .8, .6, .4, 0]
+
+    missing: pd.Series = _gradesDF['Status'] == "Missing"
+    hoursLate: pd.Series = _gradesDF['hours_late'].copy() if 'hours_late' in _gradesDF.columns \
+        else pd.Series(0, index=_gradesDF.index)
+    # each student's comment is put together from these parts once everything has been applied
+    latenessComments: pd.Series = _gradesDF['lateness_comment']
+    extensionComments: pd.Series = pd.Series("", index=_gradesDF.index)
+    penaltyComments: pd.Series = pd.Series("", index=_gradesDF.index)
+    extended: pd.Series = pd.Series(False, index=_gradesDF.index)
+
+    if not _specialCasesDF.empty:
+        # Join the special cases to the students once. If a student has more than one special case for the assignment,
+        #  the first one is used to decide what happens, and all of them are updated.
+        firstSpecialCases: pd.DataFrame = \
+            _specialCasesDF.loc[findStudentSpecialCases(_specialCasesDF, _assignmentCommonNames, _gradesDF['multipass'])] \
+            .drop_duplicates(['assignment', 'multipass']).set_index(['assignment', 'multipass'])
+        students: pd.MultiIndex = pd.MultiIndex.from_arrays([_assignmentCommonNames, _gradesDF['multipass']])
+
+        def lookup(_column: str) -> pd.Series:
+            return pd.Series(firstSpecialCases[_column].reindex(students).to_numpy(), index=_gradesDF.index)
+
+        def specialCasesFor(_students: pd.Series) -> pd.Index:
+            return findStudentSpecialCases(_specialCasesDF, _assignmentCommonNames.loc[_students],
+                                           _gradesDF.loc[_students, 'multipass'])
+
+        hasSpecialCase: pd.Series = pd.Series(students.isin(firstSpecialCases.index), index=_gradesDF.index)
+        approved: pd.Series = lookup('approved_by').map(bool)
+        alreadyHandled: pd.Series = lookup('handled') != ""
+
+        # If the student didn't submit - I'm considering that as handled.
+        noSubmission: pd.Series = hasSpecialCase & missing
+        _specialCasesDF.loc[specialCasesFor(noSubmission), 'handled'] = "TRUE"
+        _specialCasesDF.loc[specialCasesFor(noSubmission), 'grader_notes'] = "No Submission"
+        latenessComments = latenessComments.mask(noSubmission, comments.NO_SUBMISSION_COMMENT)
+
+        hasSpecialCase &= ~missing
+
+        notLate: pd.Series = hasSpecialCase & (hoursLate == 0)
+        _specialCasesDF.loc[specialCasesFor(notLate), 'handled'] = "TRUE"
+        _specialCasesDF.loc[specialCasesFor(notLate), 'grader_notes'] = "Student submission was NOT late"
+
+        notApproved: pd.Series = hasSpecialCase & ~notLate & ~approved
+        # The note is added to any existing note, if the first special case for the student has one
+        hasNotes: pd.Series = lookup('grader_notes').map(bool)
+        appendNotes: pd.Index = specialCasesFor(notApproved & hasNotes)
+        _specialCasesDF.loc[specialCasesFor(notApproved), 'handled'] = "FALSE"
+        _specialCasesDF.loc[appendNotes, 'grader_notes'] = \
+            _specialCasesDF.loc[appendNotes, 'grader_notes'] + "; Special case is NOT Approved"
+        _specialCasesDF.loc[specialCasesFor(notApproved & ~hasNotes), 'grader_notes'] = "Special case is NOT Approved"
+
+        # We only want to apply a special case if it is approved and not already flagged as handled.
+        extended = hasSpecialCase & ~notLate & approved & ~alreadyHandled
+        extensionDays: pd.Series = pd.Series(firstSpecialCases['extension_days'].reindex(students[extended]).to_numpy(),
+                                             index=_gradesDF.index[extended])
+
+        # reduce the number of hours that a submission is late
+        hoursLate.loc[extended] = hoursLate.loc[extended] - extensionDays * 24
+        hoursLate.loc[extended & (hoursLate < 0)] = 0
+
+        # Add a comment explaining any extension
+        extensionComments.loc[extended] = comments.renderExtensionComments(extensionDays)
+        _specialCasesDF.loc[specialCasesFor(extended), 'handled'] = "TRUE"
+
+    # Skip over students who didn't submit - they already got a zero
+    submitted: pd.Series = ~missing
+
+    # Convert to days rounding up, then look up the penalty with the days as the index
+    daysLate: np.ndarray = np.ceil(hoursLate.loc[submitted].to_numpy(dtype=float) / 24).astype(int)
+    daysLate = np.clip(daysLate, None, len(latePenalty) - 1)
+
+    # actually applying the late penalty
+    scores: np.ndarray = _gradesDF.loc[submitted, 'Total Score'].to_numpy(dtype=float)
+    scores = np.round(scores * np.array(latePenalty, dtype=float)[daysLate], 3)
+    _gradesDF.loc[submitted, 'Total Score'] = np.where(scores < 0, 0, scores)
+
+    # add students who actually received a penalty and update comment stating where points went to
+    penalizedDays: pd.Series = pd.Series(daysLate, index=_gradesDF.index[submitted])
+    penalizedDays = penalizedDays.loc[penalizedDays != 0]
+    penaltyComments.loc[penalizedDays.index] = comments.renderLatePenaltyComments(penalizedDays, latePenalty)
+
+    _gradesDF['lateness_comment'] = comments.joinComments(latenessComments, extensionComments, penaltyComments)
+
+    # count the special cases and late penalties for each assignment, so they can be reported separately
+    specialCaseStudents: pd.Series = extended.groupby(_assignmentCommonNames, sort=False).sum()
+    latePenaltyStudents: pd.Series = \
+        pd.Series(_gradesDF.index.isin(penalizedDays.index), index=_gradesDF.index) \
+        .groupby(_assignmentCommonNames, sort=False).sum()
+
+    for assignmentCommonName in _assignmentCommonNames.unique():
+        print(f"Applying late penalties for {assignmentCommonName}...")
+
+        # the only possible case here is if a student has a special case requested but was not found in gradescope
+        assignmentSpecialCases: pd.Index = \
+            findSpecialCases(_specialCasesDF, assignmentCommonName) if not _specialCasesDF.empty else pd.Index([])
+        allSpecialCasesApplied: bool = \
+            _specialCasesDF.empty or specialCaseStudents[assignmentCommonName] == len(assignmentSpecialCases)
+
+        if not allSpecialCasesApplied:
+            print("\tNot all special cases where handled automatically...")
+            # '!= True' here because it may be null or false depending on who entered the special case
+            #  != because this is a bool mask - not a normal boolean expression
+            for student in _specialCasesDF.loc[assignmentSpecialCases] \
+                    .loc[lambda specialCases: specialCases['handled'] != "TRUE", 'name'].values.tolist():
+                print(f"\t\t...{student} was unable to be handled automatically")
+            print("\tCheck grader notes for more details")
+            print("\tIf student special case was not updated, they were not found in gradescope")
+        print(f"\t{specialCaseStudents[assignmentCommonName]} special cases were applied for {assignmentCommonName}")
+        print(f"\t{latePenaltyStudents[assignmentCommonName]} late penalties were applied for {assignmentCommonName}")
+
+        if not allSpecialCasesApplied:
+            print("...Warning")
         else:
-            hoursLate = 0
-
-        # this is safe - if no students are found in the special cases, then it will be empty
-        #  and the loop will just not run.
-        if not _specialCasesDF.empty and len(_specialCasesDF.loc[currentSpecialCase]) != 0 and hoursLate == 0:
-            _specialCasesDF.loc[currentSpecialCase, 'handled'] = "TRUE"
-            _specialCasesDF.loc[currentSpecialCase, 'grader_notes'] = "Student submission was NOT late"
-
-        elif not _specialCasesDF.empty and len(_specialCasesDF.loc[currentSpecialCase]) != 0:
-            if not _specialCasesDF.loc[currentSpecialCase, 'approved_by'].values[0]:
-                _specialCasesDF.loc[currentSpecialCase, 'handled'] = "FALSE"
-
-                if _specialCasesDF.loc[currentSpecialCase, 'grader_notes'].values[0]:
-                    _specialCasesDF.loc[currentSpecialCase, 'grader_notes'] += "; Special case is NOT Approved"
-                else:
-                    _specialCasesDF.loc[currentSpecialCase, 'grader_notes'] = "Special case is NOT Approved"
-
-            # If the special case has already been handled
-            elif _specialCasesDF.loc[currentSpecialCase, 'handled'].values[0] != "":
-                pass
-            # We only want to apply a special case if it is not already flagged as handled.
-            else:
-                # reduce the number of hours that a submission is late
-                hoursLate -= (_specialCasesDF.loc[currentSpecialCase, 'extension_days'].values[0]) * 24
-                if hoursLate < 0:
-                    hoursLate = 0
-
-                pluralizedDays: str = p.plural("day", _specialCasesDF.loc[currentSpecialCase, 'extension_days'].values[0])
-
-                # Add a comment explaining any extension
-                if _gradescopeDF.at[i, 'lateness_comment']:
-                    _gradescopeDF.at[i, 'lateness_comment'] += \
-                        f"\nExtended by {_specialCasesDF.loc[currentSpecialCase, 'extension_days'].values[0]} {pluralizedDays}"
-                else:
-                    _gradescopeDF.at[i, 'lateness_comment'] = \
-                        f"Extended by {_specialCasesDF.loc[currentSpecialCase, 'extension_days'].values[0]} {pluralizedDays}"
-                _specialCasesDF.loc[currentSpecialCase, 'handled'] = "TRUE"
-
-                specialCaseStudents += 1
-
-        # Convert to days rounding up
-        daysLate = math.ceil(hoursLate / 24)
-
-        if daysLate > len(latePenalty) - 1:
-            daysLate = len(latePenalty) - 1
-
-        # actually applying the late penalty
-        #  looking up in the list what it should be with the index as the index and daysLate directly correspond
-        _gradescopeDF.at[i, 'Total Score'] = round(_gradescopeDF.at[i, 'Total Score'] * latePenalty[daysLate], 3)
-
-        # add students who actually received a penalty to a list
-        #  and update comment stating where points went to
-        # %25 is the percent sign
-        if daysLate != 0:
-            latePenaltyStudents += 1
-            pluralizedDays: str = p.plural("day", daysLate)
-            if _gradescopeDF.at[i, 'lateness_comment']:
-                _gradescopeDF.at[i, 'lateness_comment'] += \
-                    f"\n-{(1 - latePenalty[daysLate]) * 100:02.0f}%25: {daysLate} {pluralizedDays} late"
-            else:
-                _gradescopeDF.at[i, 'lateness_comment'] = \
-                    f"-{(1 - latePenalty[daysLate]) * 100:02.0f}%25: {daysLate} {pluralizedDays} late"
-
-        _gradescopeDF.at[i, 'Total Score'] = max(_gradescopeDF.at[i, 'Total Score'], 0)
-
-
-    # the only possible case here is if a student has a special case requested but was not found in gradescope
-    if not _specialCasesDF.empty and specialCaseStudents != len(
-
-            _specialCasesDF.loc[_specialCasesDF['assignment'] == _assignmentCommonName, 'multipass']):
-        print("\tNot all special cases where handled automatically...")
-        # '!= True' here because it may be null or false depending on who entered the special case
-        #  != because this is a bool mask - not a normal boolean expression
-        for student in _specialCasesDF.loc[(_specialCasesDF['handled'] != "TRUE")
-                                           & (_specialCasesDF['assignment'] == _assignmentCommonName),
-                                           'name'].values.tolist():
-            print(f"\t\t...{student} was unable to be handled automatically")
-        print("\tCheck grader notes for more details")
-        print("\tIf student special case was not updated, they were not found in gradescope")
-    print(f"\t{specialCaseStudents} special cases were applied for {_assignmentCommonName}")
-    print(f"\t{latePenaltyStudents} late penalties were applied for {_assignmentCommonName}")
-
-    if not _specialCasesDF.empty and specialCaseStudents != len(
-            _specialCasesDF.loc[_specialCasesDF['assignment'] == _assignmentCommonName, 'multipass']):
-        print("...Warning")
+            print("...Done")
+
+    return _gradesDF, _specialCasesDF
+
+
+def stackGradesheets(_gradesheets: dict[int, pd.DataFrame]) -> pd.DataFrame:
+    """
+    :Description:
+
+    This function stacks the gradesheets for each assignment into one long form dataframe, so that every assignment can
+    be graded at once. Each row keeps the assignment it came from in the ``assignment_id`` column, and its original row
+    label in the ``gradesheet_row`` column.
+
+    Use ``unstackGradesheets`` to split the grades back into gradesheets.
+
+    :param _gradesheets: the gradesheets to grade mapped to the canvas id of their assignment
+
+    :return: the long form grades dataframe
+    """
+    if len(_gradesheets) == 0:
+        return pd.DataFrame(columns=['assignment_id', 'gradesheet_row'])
+
+    return pd.concat(_gradesheets, names=['assignment_id', 'gradesheet_row']).reset_index()
+
+
+def unstackGradesheets(_gradesDF: pd.DataFrame, _gradesheets: dict[int, pd.DataFrame]) -> dict[int, pd.DataFrame]:
+    """
+    :Description:
+
+    This function splits the long form grades dataframe back into a gradesheet for each assignment.
+    Each gradesheet gets back its original row labels, columns and column types, along with any new columns that were
+    added while grading (like ``lateness_comment``).
+
+    :param _gradesDF: the long form grades dataframe from ``stackGradesheets``
+    :param _gradesheets: the gradesheets that were stacked
+
+    :return: the graded gradesheets mapped to the canvas id of their assignment
+    """
+    newColumns: list[str] = [col for col in _gradesDF.columns.values.tolist()
+                             if col not in ['assignment_id', 'gradesheet_row']
+                             and not any(col in gradesheet.columns for gradesheet in _gradesheets.values())]
+
+    # an assignment with an empty gradesheet has no rows, so it has no group either
+    rowsByAssignment: dict[int, np.ndarray] = _gradesDF.groupby('assignment_id', sort=False).indices
+
+    gradedSheets: dict[int, pd.DataFrame] = {}
+    for assignmentID, originalSheet in _gradesheets.items():
+        grades: pd.DataFrame = _gradesDF.iloc[rowsByAssignment.get(assignmentID, np.array([], dtype=int))]
+        # the scores are always floats once they have been graded
+        originalTypes: pd.Series = originalSheet.dtypes.drop('Total Score', errors='ignore')
+
+        gradedSheet: pd.DataFrame = grades.set_index('gradesheet_row')[originalSheet.columns.tolist() + newColumns]
+        gradedSheet.index.name = originalSheet.index.name
+        gradedSheets[assignmentID] = gradedSheet.astype(originalTypes.to_dict())
+
+    return gradedSheets
+
+
+def scaleAndScoreMissing(_gradesDF: pd.DataFrame, _parameters: pd.DataFrame) -> pd.DataFrame:
+    """
+    :Description:
+
+    This function scales the scores and scores the missing work for any number of assignments at once.
+    It does the same operations as ``scaleScores`` and ``scoreMissingAssignments``, with the parameters for each row.
+
+    :param _gradesDF: the grades being graded
+    :param _parameters: the grading parameters for each row in ``_gradesDF``. See ``gradeAssignments``
+
+    :return: the modified grades dataframe
+    """
+    # Scaling - the same operations as ``scaleScores``, with a scale factor for each row
+    scaleFactor: np.ndarray = _parameters['scale_factor'].to_numpy(dtype=float)
+    assignmentPoints: np.ndarray = _parameters['assignment_points'].to_numpy(dtype=float)
+    maxScore: np.ndarray = _parameters['max_score'].to_numpy(dtype=float)
+    XCScaleFactor: np.ndarray = _parameters['xc_scale_factor'].to_numpy(dtype=float)
+    XCScaleFactor = np.where(np.isnan(XCScaleFactor), scaleFactor, XCScaleFactor)
+
+    grades: np.ndarray = _gradesDF['Total Score'].to_numpy(dtype=float)
+    extraPoints: np.ndarray = np.where(np.isnan(assignmentPoints), 0, grades - (assignmentPoints / scaleFactor))
+    grades = grades - extraPoints
+    grades = grades * scaleFactor + extraPoints * XCScaleFactor
+    _gradesDF['Total Score'] = np.where(grades > maxScore, maxScore, grades)
+
+    # Missing work
+    missing: pd.Series = _gradesDF['Status'] == "Missing"
+    _gradesDF.loc[missing, 'Total Score'] = _parameters['missing_score'].to_numpy(dtype=float)[missing.to_numpy()]
+    missingAssignments: pd.Series = \
+        missing.groupby(pd.Series(_parameters['common_name'].to_numpy(), index=_gradesDF.index), sort=False).sum()
+    for assignmentCommonName, missingCount in missingAssignments.items():
+        print(f"Graded {missingCount} missing assignments for {assignmentCommonName}")
+
+    return _gradesDF
+
+
+def gradeAssignments(_gradesheets: dict[int, pd.DataFrame], _assignmentParameters: pd.DataFrame,
+                     _specialCasesDF: pd.DataFrame, _statusAssignmentsDF: pd.DataFrame,
+                     _statusAssignmentScoresDF: pd.DataFrame, latePenalty: list[float] = None, serial: bool = False) \
+        -> (dict[int, pd.DataFrame], pd.DataFrame, pd.DataFrame):
+    """
+    :Description:
+
+    This function grades any number of assignments at once. The gradesheets are stacked into one long form dataframe
+    and each assignment's parameters are broadcast to its rows, so scaling, missing work and late penalties are each
+    applied to every assignment in one pass, instead of once for each assignment.
+
+    By default, once the status assignments have been validated, each assignment is graded in its own process.
+    See ``gradeAssignmentsInParallel``. If ``serial`` is true, every assignment is graded in this process instead.
+    This is the same default as the app, where ``--serial-grading`` sets ``serial``.
+
+    This gives the same grades as calling ``scaleScores``, ``scoreMissingAssignments`` and ``calculateLatePenalty`` for
+    each assignment in turn.
+
+    :Example:
+
+    The assignment parameters are indexed by the assignment's canvas id.
+
+    ========  ============  ============  =================  =========  ===============  =============
+    id        common_name   scale_factor  assignment_points  max_score  xc_scale_factor  missing_score
+    ========  ============  ============  =================  =========  ===============  =============
+    283462    HW1           1             5                  5.5        .25              0
+    283470    HW2           .5            NaN                NaN        NaN              NaN
+    ========  ============  ============  =================  =========  ===============  =============
+
+    Any of ``assignment_points``, ``max_score`` and ``xc_scale_factor`` can be NaN, which means the same as not setting
+    them in ``scaleScores``. A ``missing_score`` of NaN means that missing work isn't scored.
+
+    :param _gradesheets: the gradesheets to grade mapped to the canvas id of their assignment
+    :param _assignmentParameters: the grading parameters for each assignment, see the example
+    :param _specialCasesDF: the special cases for the assignments being graded
+    :param _statusAssignmentsDF: The current status assignments
+    :param _statusAssignmentScoresDF: The scores for the current each status assignment
+    :param latePenalty: an array of floats that contains the score mods for the late penalty
+    :param serial: if the assignments should be graded in this process instead of in parallel. Defaults to false.
+
+    :return: the graded gradesheets, the updated special cases dataframe and the status assignment scores dataframe
+    """
+    if not isinstance(_specialCasesDF, pd.DataFrame):
+        raise TypeError("Special cases MUST be passed as a Pandas DataFrame")
+
+    if len(_gradesheets) == 0:
+        return _gradesheets, _specialCasesDF, _statusAssignmentScoresDF
+
+    # the special cases could have been edited since they were loaded, this is the only time the whole sheet is checked
+    refreshSpecialCasesIndex(_specialCasesDF)
+
+    gradesDF: pd.DataFrame = stackGradesheets(_gradesheets)
+
+    # broadcast each assignment's parameters to all of its students
+    parameters: pd.DataFrame = _assignmentParameters.reindex(gradesDF['assignment_id'].to_numpy())
+    parameters.index = gradesDF.index
+    assignmentCommonNames: pd.Series = parameters['common_name']
+
+    # Status assignments - these have to be checked in order, since one student can use up their balance across more
+    #  than one assignment. Only late submissions can use a status assignment.
+    #  This is always done here, so the balances are updated the same way when grading in parallel.
+    gradesDF['lateness_comment'] = ""
+    if 'hours_late' in gradesDF.columns:
+        lateSubmissions: pd.DataFrame = gradesDF.loc[(gradesDF['Status'] != "Missing") & (gradesDF['hours_late'] != 0)]
+        for assignmentCommonName, lateDF in lateSubmissions.groupby(assignmentCommonNames, sort=False):
+            lateDF, _specialCasesDF, _statusAssignmentScoresDF = \
+                validateAndUpdateStatusAssignments(lateDF.copy(), _specialCasesDF, _statusAssignmentsDF,
+                                                   _statusAssignmentScoresDF, assignmentCommonName)
+            gradesDF.loc[lateDF.index, 'lateness_comment'] = lateDF['lateness_comment']
+
+    if serial or len(_gradesheets) == 1:
+        gradesDF = scaleAndScoreMissing(gradesDF, parameters)
+        # Special cases and late penalties
+        gradesDF, _specialCasesDF = applyLatePenalties(gradesDF, _specialCasesDF, assignmentCommonNames, latePenalty)
     else:
-        print("...Done")
+        gradesDF, _specialCasesDF = gradeAssignmentsInParallel(gradesDF, parameters, _specialCasesDF, latePenalty)
 
-    return _gradescopeDF, _specialCasesDF, _statusAssignmentScoresDF
+    return unstackGradesheets(gradesDF, _gradesheets), _specialCasesDF, _statusAssignmentScoresDF
+
+
+def gradeAssignmentsInParallel(_gradesDF: pd.DataFrame, _parameters: pd.DataFrame, _specialCasesDF: pd.DataFrame,
+                               latePenalty: list[float] = None) -> (pd.DataFrame, pd.DataFrame):
+    """
+    :Description:
+
+    This function scales, scores missing work and applies the late penalties for each assignment in its own process.
+    Status assignments must already be validated, since they can't be split up by assignment.
+    See ``gradeAssignments``.
+
+    The scores and hours late are put in shared memory for the workers to read and write, so only the text columns
+    and each assignment's special cases are copied to the workers. Each worker's output is printed in assignment order
+    once it is finished, so the results are the same no matter which worker finishes first.
+
+    :param _gradesDF: the long form grades dataframe from ``stackGradesheets``, with a ``lateness_comment`` column
+    :param _parameters: the grading parameters for each row in ``_gradesDF``
+    :param _specialCasesDF: the special cases for the assignments being graded
+    :param latePenalty: an array of floats that contains the score mods for the late penalty
+
+    :return: the updated grades dataframe and the updated special cases dataframe
+    """
+    # the scores are the first row, submissions are not late if there aren't any hours late
+    sharedGrades: np.ndarray = np.stack([
+        _gradesDF[col].to_numpy(dtype=float) if col in _gradesDF.columns else np.zeros(len(_gradesDF))
+        for col in SHARED_GRADE_COLUMNS
+    ])
+
+    sharedMemory: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True, size=sharedGrades.nbytes)
+    try:
+        gradesBuffer: np.ndarray = np.ndarray(sharedGrades.shape, dtype=float, buffer=sharedMemory.buf)
+        gradesBuffer[:] = sharedGrades
+
+        # each assignment was stacked as one block of rows
+        assignmentRows: dict[int, np.ndarray] = _gradesDF.groupby('assignment_id', sort=False).indices
+
+        with ProcessPoolExecutor(max_workers=min(MAX_GRADING_WORKERS, len(assignmentRows))) as executor:
+            workers = []
+            for assignmentID, rows in assignmentRows.items():
+                assignmentCommonName: str = _parameters['common_name'].iat[rows[0]]
+                assignmentSlice: slice = slice(rows[0], rows[-1] + 1)
+
+                assignmentSpecialCases: pd.DataFrame = pd.DataFrame()
+                if not _specialCasesDF.empty:
+                    assignmentSpecialCases = _specialCasesDF.loc[findSpecialCases(_specialCasesDF, assignmentCommonName)]
+                    # the special cases index is rebuilt in the worker for just this assignment
+                    assignmentSpecialCases.attrs = {}
+
+                workers.append(executor.submit(
+                    __gradeAssignmentWorker__, sharedMemory.name, sharedGrades.shape, assignmentSlice,
+                    _gradesDF.iloc[assignmentSlice][['multipass', 'Status', 'lateness_comment']],
+                    _parameters.iloc[rows[0]].to_dict(), assignmentSpecialCases, latePenalty))
+
+            for worker in workers:
+                latenessComments, specialCases, output = worker.result()
+                print(output, end='')
+
+                _gradesDF.loc[latenessComments.index, 'lateness_comment'] = latenessComments
+                if not specialCases.empty:
+                    _specialCasesDF.loc[specialCases.index, ['handled', 'grader_notes']] = specialCases
+
+        _gradesDF['Total Score'] = gradesBuffer[0].copy()
+        del gradesBuffer
+    finally:
+        sharedMemory.close()
+        sharedMemory.unlink()
+
+    return _gradesDF, _specialCasesDF
+
+
+def __gradeAssignmentWorker__(_sharedMemoryName: str, _shape: tuple[int, int], _rows: slice, _gradesDF: pd.DataFrame,
+                              _parameters: dict[str, any], _specialCasesDF: pd.DataFrame, latePenalty: list[float]) \
+        -> (pd.Series, pd.DataFrame, str):
+    """
+    :Description:
+
+    This function grades one assignment in a worker process for ``gradeAssignmentsInParallel``.
+    The scores for the assignment are read from and written back to shared memory.
+
+    :param _sharedMemoryName: the name of the shared memory with the scores and hours late
+    :param _shape: the shape of the scores and hours late in shared memory
+    :param _rows: the rows in shared memory for this assignment
+    :param _gradesDF: the text columns for this assignment
+    :param _parameters: the grading parameters for this assignment
+    :param _specialCasesDF: the special cases for this assignment
+    :param latePenalty: an array of floats that contains the score mods for the late penalty
+
+    :return: the lateness comments, the updated special cases, and anything that was printed while grading
+    """
+    sharedMemory: shared_memory.SharedMemory = shared_memory.SharedMemory(name=_sharedMemoryName)
+    output: io.StringIO = io.StringIO()
+    try:
+        gradesBuffer: np.ndarray = np.ndarray(_shape, dtype=float, buffer=sharedMemory.buf)
+        for i, col in enumerate(SHARED_GRADE_COLUMNS):
+            _gradesDF[col] = gradesBuffer[i, _rows]
+
+        with contextlib.redirect_stdout(output):
+            _gradesDF = scaleAndScoreMissing(_gradesDF, pd.DataFrame(_parameters, index=_gradesDF.index))
+            _gradesDF, _specialCasesDF = \
+                applyLatePenalties(_gradesDF, _specialCasesDF,
+                                   pd.Series(_parameters['common_name'], index=_gradesDF.index), latePenalty)
+
+        gradesBuffer[0, _rows] = _gradesDF['Total Score'].to_numpy(dtype=float)
+        del gradesBuffer
+    finally:
+        sharedMemory.close()
+
+    specialCases: pd.DataFrame = \
+        _specialCasesDF[['handled', 'grader_notes']] if not _specialCasesDF.empty else pd.DataFrame()
+
+    return _gradesDF['lateness_comment'], specialCases, output.getvalue()
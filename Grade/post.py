@@ -16,15 +16,42 @@ serve as a safety mechanism.
 from Canvas import Canvas
 import pandas as pd
 from datetime import date
+import hashlib
+import json
 import os
+import re
+import time
+from typing import Iterable, Iterator
+from urllib.parse import quote_plus
 from FileHelpers.csvWriter import csvWriter
 from FileHelpers.excelWriter import writeSpecialCases
 
+# The number of grades in the first batch posted to Canvas. See ``AdaptiveBatcher``
 BATCH_SIZE = 50
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 500
+# How many grades are added to the batch size each time Canvas responds quickly
+BATCH_SIZE_STEP = 25
+# The most form data, in bytes, sent to Canvas in one batch
+MAX_BATCH_BYTES = 64 * 1024
+# If Canvas responds to a batch faster than this, in seconds, the batches grow.
+# If it responds slower than the slow latency, the batches shrink
+FAST_BATCH_LATENCY = 2
+SLOW_BATCH_LATENCY = 10
+# Where every batch posted to Canvas is recorded, so the batches that didn't complete can be posted again.
+JOURNAL_PATH = "./canvas/cache/posting_journal.jsonl"
+# The states that mean a batch in the journal won't be posted again
+JOURNAL_FINAL_STATES = ("completed", "superseded", "expired")
+# How old, in seconds, an incomplete batch can be before it is too stale to post again
+JOURNAL_MAX_AGE = 24 * 60 * 60
+# Finds the assignment ids in a batch posted to the course. See ``encodeGrades``
+JOURNAL_COURSE_ASSIGNMENT = re.compile(r"(?:^|&)grade_data\[(\d+)\]\[[^\]]*\]\[posted_grade\]=")
+# The journal target for batches posted with the course level endpoint, rather than to a single assignment
+COURSE_TARGET = "course"
 
 
 def writeUpdatedGradebookToFile(_canvasScores: dict[str, dict[any, any]],
-                                _students: pd.DataFrame, _assignmentsToGrade: pd.DataFrame) -> bool:
+                                _students: pd.DataFrame, _assignmentsToGrade: pd.DataFrame) -> (str, None):
     """
     :Description:
 
@@ -50,7 +77,7 @@ def writeUpdatedGradebookToFile(_canvasScores: dict[str, dict[any, any]],
     :param _students: All the students in the pulled from the Canvas roster at the start of execution.
     :param _assignmentsToGrade: The assignments to grade. Must be the same length as ``_canvasScores``
 
-    :return: True if the gradebook was successfully generated and written. False if not.
+    :return: The path the gradebook was written to. None if it wasn't generated or written.
     """
 
     if not isinstance(_students, pd.DataFrame):
@@ -69,19 +96,19 @@ def writeUpdatedGradebookToFile(_canvasScores: dict[str, dict[any, any]],
             'Section': ""
         }
     )
+    # index the assignments by id once, rather than searching for each assignment
+    assignmentsByID: pd.DataFrame = _assignmentsToGrade.set_index('id')
+
     assignmentsInGradebook: str = ""
     for assignmentID, grades in _canvasScores.items():
-        assignment = _assignmentsToGrade.loc[_assignmentsToGrade['id'] == assignmentID]
+        assignment = assignmentsByID.loc[assignmentID]
 
-        assignmentsInGradebook += f"_{assignment['common_name'].values[0]}"
-        fullGradebookName = f"{assignment['name'].values[0]} ({assignmentID})"
-        formattedGradebook[fullGradebookName] = ""
+        assignmentsInGradebook += f"_{assignment['common_name']}"
+        fullGradebookName = f"{assignment['name']} ({assignmentID})"
 
-        for i, row in formattedGradebook.iterrows():
-            try:
-                formattedGradebook.at[i, fullGradebookName] = grades[row['ID']]['score']
-            except KeyError:
-                pass
+        # students without a score are left blank
+        scores: dict = {studentID: grade['score'] for studentID, grade in grades.items()}
+        formattedGradebook[fullGradebookName] = formattedGradebook['ID'].map(scores).fillna("")
 
     print(f"Updated gradebook is ready to be written to file. ")
     print("Please confirm: This operation will write the updated canvas gradebook to file"
@@ -90,7 +117,7 @@ def writeUpdatedGradebookToFile(_canvasScores: dict[str, dict[any, any]],
     usrConfirm = str(input("(y/n): "))
 
     if usrConfirm.lower() != 'y':
-        return False
+        return None
 
     print(f"Writing updated gradebook to file...")
     todayDate: str = date.today().strftime("%m-%d-%y")
@@ -100,14 +127,438 @@ def writeUpdatedGradebookToFile(_canvasScores: dict[str, dict[any, any]],
     if not csvWriter(fullPath, formattedGradebook):
         print(f"\t\tWriting {fullPath} failed.")
         print("...Failed")
-        return False
+        return None
 
     print("...Done")
-    return True
+    return fullPath
+
+
+def createScoreTable(_canvasScores: dict[str, dict[any, any]]) -> pd.DataFrame:
+    """
+    :Description:
+
+    This function flattens the Canvas scores into a table with one row per grade, with the columns: ``assignment``,
+    ``id``, ``score``, and ``comment``. The grades are in the same order as they are in ``_canvasScores``.
+
+    :param _canvasScores: The Canvas scores. See ``Grade.score``
+
+    :return: The scores as a table.
+    """
+    return pd.DataFrame(
+        [(str(assignment), str(grade['id']), str(grade['score']), str(grade['comment']))
+         for assignment, grades in _canvasScores.items() for grade in grades.values()],
+        columns=['assignment', 'id', 'score', 'comment']
+    )
+
+
+def encodeGrades(_scoreTable: pd.DataFrame, combineAssignments: bool = False) -> list[bytes]:
+    """
+    :Description:
+
+    This function url encodes the form data for every grade in ``_scoreTable`` at once. The scores and comments are
+    fully escaped, so comments can have any characters in them (new lines, ``&``, ``=``, ``%`` and so on) and will show
+    up in Canvas exactly as they were written. Each distinct comment is only encoded once.
+
+    For a single assignment each grade is keyed by the student id, like ``grade_data[25685][posted_grade]=6.0``.
+    When the assignments are combined, each grade is keyed by the assignment id then the student id,
+    like ``grade_data[283462][25685][posted_grade]=6.0``. See ``Canvas.postCourseGrades``.
+
+    :param _scoreTable: The scores to encode. See ``createScoreTable``
+    :param combineAssignments: If the grades are keyed by their assignment as well as the student.
+
+    :return: The encoded form data for each grade, in the same order as ``_scoreTable``.
+    """
+    if _scoreTable.empty:
+        return []
+
+    keys: pd.Series = "grade_data[" + _scoreTable['id'] + "]"
+    if combineAssignments:
+        keys = "grade_data[" + _scoreTable['assignment'] + "][" + _scoreTable['id'] + "]"
+
+    uniqueComments: pd.Series = pd.Series(_scoreTable['comment'].unique())
+    encodedComments: dict[str, str] = dict(zip(uniqueComments, uniqueComments.map(quote_plus)))
+
+    gradeData: pd.Series = keys + "[posted_grade]=" + _scoreTable['score'].map(quote_plus) + "&" \
+        + keys + "[text_comment]=" + _scoreTable['comment'].map(encodedComments)
+
+    return [grade.encode() for grade in gradeData]
+
+
+class AdaptiveBatcher:
+    """
+    :Description:
+
+    This class splits the grades being posted into batches, and adjusts how big the batches are as they are posted.
+
+    We don't know how many scores can be posted at once to canvas because naturally, it isn't documented anywhere.
+    So rather than guessing, batches start at ``BATCH_SIZE`` grades and grow by ``BATCH_SIZE_STEP`` while Canvas keeps
+    responding in under ``FAST_BATCH_LATENCY`` seconds. They are halved if Canvas takes longer than
+    ``SLOW_BATCH_LATENCY`` seconds or rejects a batch. A batch is also never larger than ``MAX_BATCH_BYTES``, as grades
+    with long comments are many times larger than grades with just a score.
+    """
+
+    def __init__(self, batchSize: int = BATCH_SIZE, maxBatchBytes: int = MAX_BATCH_BYTES):
+        self.m_batchSize: int = batchSize
+        self.m_maxBatchBytes: int = maxBatchBytes
+        # the number of grades and the number of bytes in each batch created
+        self.m_batches: list[tuple[int, int]] = []
+        # the batch currently being built. Reused for every batch
+        self.m_buffer: bytearray = bytearray()
+
+    def createBatches(self, _gradeData: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        :Description:
+
+        This function joins the encoded form data for each grade into batches. Each batch is only created when it is
+        asked for, so it uses the batch size from every batch that has been posted so far.
+        Every batch is built in the same buffer, rather than building up a new string for each grade.
+
+        A batch is closed when it has the current batch size of grades, or when adding the next grade would take it over
+        ``MAX_BATCH_BYTES``. A batch always has at least one grade.
+
+        :param _gradeData: The encoded form data for each grade, in the order they should be posted.
+            See ``encodeGrades``.
+
+        :return: The form data for each batch.
+        """
+        currentGrades: int = 0
+
+        for gradeData in _gradeData:
+            # TODO Validate grade
+            # + 1 for the & joining it to the rest of the batch
+            if currentGrades and len(self.m_buffer) + len(gradeData) + 1 > self.m_maxBatchBytes:
+                yield self.__closeBatch__(currentGrades)
+                currentGrades = 0
+
+            if currentGrades:
+                self.m_buffer += b"&"
+            self.m_buffer += gradeData
+            currentGrades += 1
+
+            if currentGrades >= self.m_batchSize:
+                yield self.__closeBatch__(currentGrades)
+                currentGrades = 0
+
+        # Handle the last partial batch
+        if currentGrades:
+            yield self.__closeBatch__(currentGrades)
+
+    def __closeBatch__(self, _grades: int) -> bytes:
+        """
+        :Description:
+
+        This function records the size of the batch in the buffer, then empties the buffer for the next batch.
+
+        :param _grades: The number of grades in the batch.
+
+        :return: The form data for the batch.
+        """
+        batch: bytes = bytes(self.m_buffer)
+        self.m_batches.append((_grades, len(batch)))
+        del self.m_buffer[:]
+
+        return batch
+
+    def update(self, _latency: float, _succeeded: bool):
+        """
+        :Description:
+
+        This function updates the batch size from how the last batch went. Meant to be passed as ``onBatchPosted``,
+        see ``Canvas.__postBatches__``.
+
+        :param _latency: How long, in seconds, Canvas took to respond to the batch.
+        :param _succeeded: If Canvas accepted the batch.
+        """
+        if not _succeeded or _latency > SLOW_BATCH_LATENCY:
+            self.m_batchSize = max(MIN_BATCH_SIZE, self.m_batchSize // 2)
+        elif _latency < FAST_BATCH_LATENCY:
+            self.m_batchSize = min(MAX_BATCH_SIZE, self.m_batchSize + BATCH_SIZE_STEP)
+
+    def printSummary(self):
+        """
+        :Description:
+
+        This function prints the sizes of the batches that were created.
+        """
+        if not self.m_batches:
+            return
+
+        batchGrades: list[int] = [grades for grades, _ in self.m_batches]
+        batchBytes: list[int] = [size for _, size in self.m_batches]
+
+        print(f"\t\t{sum(batchGrades)} grades were posted in {len(self.m_batches)} batches of "
+              f"{min(batchGrades)} - {max(batchGrades)} grades ({min(batchBytes)} - {max(batchBytes)} bytes)")
+        print(f"\t\tThe batch size ended at {self.m_batchSize} grades")
+
+
+class PostingJournal:
+    """
+    :Description:
+
+    This class records every batch posted to Canvas in an append only journal on disk. Each batch is written to the
+    journal *before* it is sent, along with the assignment it is for, the hash of its payload and when it was sent.
+    Once Canvas has finished processing it, its final state is written to the journal as well.
+
+    If posting fails or the program crashes partway through, the journal has every batch that never completed, so only
+    those batches need to be posted again. See ``resumePosting``.
+
+    When scores for an assignment are posted again, any batch for that assignment that never completed is superseded,
+    so the older scores in it are never posted over the newer ones. See ``PostingJournal.supersede``.
+    Once every batch in the journal has completed (or been superseded or expired), the journal is removed.
+    """
+
+    def __init__(self, journalPath: str = JOURNAL_PATH):
+        self.m_journalPath: str = journalPath
+        # the target and the hash of each batch sent in the current post, in the order they were sent
+        self.m_batches: list[tuple[str, str]] = []
+
+    @staticmethod
+    def __getAssignments__(_target: str, _payload: bytes) -> set[str]:
+        """
+        :Description:
+
+        This function finds the assignments that a batch has grades for. Batches posted to the course have the
+        assignment id in each key, see ``encodeGrades``.
+
+        :param _target: The assignment id the batch was posted to, or ``COURSE_TARGET``.
+        :param _payload: The form data for the batch.
+
+        :return: The ids of the assignments in the batch.
+        """
+        if _target != COURSE_TARGET:
+            return {_target}
+
+        return set(JOURNAL_COURSE_ASSIGNMENT.findall(_payload.decode()))
+
+    def __append__(self, _entry: dict[str, any]):
+        """
+        :Description:
+
+        This function appends an entry to the journal, and makes sure it is written to disk before returning.
+        If the last entry was cut off (like if the program crashed while writing it), the new entry is started on a
+        new line, so that only the cut off entry is skipped when the journal is read.
+
+        :param _entry: The entry to append.
+        """
+        if os.path.dirname(self.m_journalPath):
+            os.makedirs(os.path.dirname(self.m_journalPath), exist_ok=True)
+
+        with open(self.m_journalPath, "ab+") as journal:
+            journal.seek(0, os.SEEK_END)
+            if journal.tell() != 0:
+                journal.seek(-1, os.SEEK_END)
+                if journal.read(1) != b"\n":
+                    journal.write(b"\n")
+
+            journal.write((json.dumps(_entry) + "\n").encode())
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def recordBatches(self, _target: str, _batches: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        :Description:
+
+        This function records each batch in the journal as it is about to be sent. It should wrap the batches given to
+        ``Canvas.postAssignment`` or ``Canvas.postCourseGrades``, with ``PostingJournal.recordProgress`` passed as
+        ``onBatchFinished``.
+
+        :param _target: The assignment id the batches are posted to, or ``COURSE_TARGET``.
+        :param _batches: The form data for each batch.
+
+        :return: The form data for each batch, unchanged.
+        """
+        self.m_batches = []
+
+        for batch in _batches:
+            batchHash: str = hashlib.sha256(batch).hexdigest()
+            self.__append__({'state': "sending", 'target': str(_target), 'hash': batchHash, 'sent_at': time.time(),
+                             'payload': batch.decode()})
+            self.m_batches.append((str(_target), batchHash))
+
+            yield batch
+
+    def recordProgress(self, _batch: int, _progress: dict[any, any]):
+        """
+        :Description:
+
+        This function records the final state of a batch in the journal. See ``Canvas.__postBatches__``.
+
+        :param _batch: The position of the batch in the current post.
+        :param _progress: The final progress object for the batch.
+        """
+        target, batchHash = self.m_batches[_batch]
+        self.__append__({'state': _progress.get('workflow_state', "failed"), 'target': target, 'hash': batchHash,
+                         'message': _progress.get('message', "")})
+
+    def supersede(self, _assignments: Iterable[str]) -> int:
+        """
+        :Description:
+
+        This function marks every incomplete batch with grades for any of ``_assignments`` as superseded, so it will
+        not be posted again. This should be called whenever new scores for the assignments are about to be posted.
+
+        :param _assignments: The ids of the assignments being posted.
+
+        :return: The number of incomplete batches that were superseded.
+        """
+        assignments: set[str] = {str(assignment) for assignment in _assignments}
+
+        supersededBatches: int = sum(
+            1 for target, batches in self.getIncompleteBatches().items() for _, payload in batches
+            if self.__getAssignments__(target, payload) & assignments)
+
+        if supersededBatches != 0:
+            self.__append__({'state': "superseded", 'assignments': sorted(assignments), 'sent_at': time.time()})
+
+        return supersededBatches
+
+    def expire(self, _target: str, _batches: Iterable[bytes]):
+        """
+        :Description:
+
+        This function marks incomplete batches as expired, so they will not be posted again.
+
+        :param _target: The assignment id the batches were posted to, or ``COURSE_TARGET``.
+        :param _batches: The form data for each batch.
+        """
+        for batch in _batches:
+            self.__append__({'state': "expired", 'target': str(_target), 'hash': hashlib.sha256(batch).hexdigest()})
+
+    def getIncompleteBatches(self) -> dict[str, list[tuple[float, bytes]]]:
+        """
+        :Description:
+
+        This function reads the journal and finds every batch whose latest state isn't ``completed``, ``superseded``
+        or ``expired``. This includes batches that were sent but never got a final state, like if the program crashed.
+
+        :return: When each incomplete batch was first sent and its form data, mapped by the target it was posted to,
+            in the order they were first sent.
+        """
+        if not os.path.isfile(self.m_journalPath):
+            return {}
+
+        payloads: dict[tuple[str, str], tuple[float, bytes]] = {}
+        states: dict[tuple[str, str], str] = {}
+
+        with open(self.m_journalPath, "r") as journal:
+            for line in journal:
+                try:
+                    entry: dict[str, any] = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last entry may be cut off if the program crashed while writing it
+                    continue
+
+                if entry['state'] == "superseded":
+                    # only batches sent before the new scores were posted are superseded
+                    for key, (_, payload) in payloads.items():
+                        if self.__getAssignments__(key[0], payload) & set(entry['assignments']):
+                            states[key] = "superseded"
+                    continue
+
+                key: tuple[str, str] = (entry['target'], entry['hash'])
+                if 'payload' in entry:
+                    # journals written before batches were timestamped are treated as being as old as possible
+                    payloads.setdefault(key, (entry.get('sent_at', 0), entry['payload'].encode()))
+                states[key] = entry['state']
+
+        incompleteBatches: dict[str, list[tuple[float, bytes]]] = {}
+        for key, batch in payloads.items():
+            if states[key] not in JOURNAL_FINAL_STATES:
+                incompleteBatches.setdefault(key[0], []).append(batch)
+
+        return incompleteBatches
+
+    def clearIfComplete(self) -> bool:
+        """
+        :Description:
+
+        This function removes the journal if every batch in it has completed.
+
+        :return: True if the journal was removed or didn't exist. False if it still has incomplete batches.
+        """
+        if self.getIncompleteBatches():
+            return False
+
+        if os.path.isfile(self.m_journalPath):
+            os.remove(self.m_journalPath)
+
+        return True
+
+
+def isGradeChanged(_grade: dict[str, any], _currentGrade: (dict[str, any], None)) -> bool:
+    """
+    :Description:
+
+    This function checks if posting ``_grade`` would change what is currently in Canvas. A grade is changed if the
+    score is different, or if it has a comment that isn't already the most recent comment on the submission.
+
+    :param _grade: The grade to be posted. See ``Grade.score``
+    :param _currentGrade: The grade currently in Canvas, see ``Canvas.getCurrentGrades``, or None if the student doesn't
+        have a submission in Canvas.
+
+    :return: True if the grade needs to be posted. False if not.
+    """
+    if _currentGrade is None:
+        return True
+
+    if _grade['score'] == "":
+        if _currentGrade['score'] is not None:
+            return True
+    else:
+        try:
+            if _currentGrade['score'] is None or float(_grade['score']) != float(_currentGrade['score']):
+                return True
+        except ValueError:
+            return True
+
+    if _grade['comment'] and _grade['comment'] != _currentGrade['comment']:
+        return True
+
+    return False
+
+
+def removeUnchangedGrades(_canvas: Canvas, _canvasScores: dict[str, dict[any, any]]) \
+        -> (dict[str, dict[any, any]], int):
+    """
+    :Description:
+
+    This function pulls the current grades for every assignment in ``_canvasScores`` from Canvas in one request and
+    removes every grade that wouldn't change anything. See ``isGradeChanged``.
+
+    If the current grades can't be pulled, nothing is removed.
+
+    :param _canvas: The Canvas object.
+    :param _canvasScores: The scores to post to Canvas.
+
+    :return: The scores that need to be posted and the number of grades that were skipped.
+    """
+    print("\tChecking the current grades in Canvas...", end='')
+    currentGrades: (dict[str, dict[str, dict[str, any]]], None) = \
+        _canvas.getCurrentGrades([int(assignment) for assignment in _canvasScores.keys()])
+
+    if currentGrades is None:
+        print("Failed")
+        print("\t\tAll grades will be posted.")
+        return _canvasScores, 0
+
+    changedScores: dict[str, dict[any, any]] = {}
+    skippedGrades: int = 0
+    for assignment, grades in _canvasScores.items():
+        currentAssignmentGrades: dict[str, dict[str, any]] = currentGrades.get(str(assignment), {})
+
+        changedScores[assignment] = {student: grade for student, grade in grades.items()
+                                     if isGradeChanged(grade, currentAssignmentGrades.get(str(grade['id'])))}
+        skippedGrades += len(grades) - len(changedScores[assignment])
+
+    print("Done")
+    print(f"\t\tSkipping {skippedGrades} unchanged grades")
+
+    return changedScores, skippedGrades
 
 
 def postToCanvas(_canvas: Canvas, _canvasScores: dict[str, dict[any, any]],
-                 studentsToPost: (pd.DataFrame, list, None) = None) -> bool:
+                 studentsToPost: (pd.DataFrame, list, None) = None, combineAssignments: bool = False,
+                 onlyChanged: bool = False, uploadGradebook: bool = False) -> bool:
     """
     :Description:
 
@@ -115,8 +566,19 @@ def postToCanvas(_canvas: Canvas, _canvasScores: dict[str, dict[any, any]],
     This function makes use of the Submission Canvas API, which allows us to post grades, comments, and actual
     student work - which may be nice if I decide to expand this project to mirror submissions on gradescope.
 
-    Currently, this function generates the form data with student scores and comments in batches of 50 scores then sends
-    that data to Canvas.
+    Currently, this function generates the form data with student scores and comments in batches, sized by how quickly
+    Canvas is responding (see ``AdaptiveBatcher``), then sends that data to Canvas.
+
+    By default, each assignment is posted in its own batches. Optionally, the scores for every assignment can be
+    packed into the same batches and posted with the course level endpoint, so posting HW, a status assignment, and a
+    lab together takes about a third as many requests.
+
+    Optionally, only the grades that would change what is in Canvas are posted (see ``removeUnchangedGrades``),
+    so regrading a handful of students only posts those students. This pulls the current grades from Canvas first.
+
+    Alternatively, the gradebook written to file can be uploaded to Canvas as is, in a single request, rather than
+    posting the scores in batches. This only *stages* the scores in Canvas: nothing is posted until the upload is
+    reviewed and applied in Canvas. See ``Canvas.uploadGradebook``.
 
     **THIS FUNCTION DOES NOT PUBLISH GRADES FOR STUDENTS**
 
@@ -130,8 +592,15 @@ def postToCanvas(_canvas: Canvas, _canvasScores: dict[str, dict[any, any]],
     :param _canvas: The Canvas object.
     :param _canvasScores: The scores to post to Canvas.
     :param studentsToPost: The students to post. If it is None it will post all students.
-
-    :return true if we received all 200 responses from canvas. See ``Canvas.postAssignment``. False if not
+    :param combineAssignments: If the scores for every assignment should be posted together.
+        See ``Canvas.postCourseGrades``. If False, see ``Canvas.postAssignment``.
+    :param onlyChanged: If only the grades that are different from the grades in Canvas should be posted.
+        Ignored if the gradebook is uploaded.
+    :param uploadGradebook: If the gradebook file should be uploaded to be reviewed in Canvas instead of posting the
+        scores in batches.
+
+    :return true if Canvas finished processing every batch (or staging the gradebook).
+        See ``Canvas.postAssignment``. False if not
     """
 
     if studentsToPost is not None and type(studentsToPost) is not list:
@@ -144,7 +613,8 @@ def postToCanvas(_canvas: Canvas, _canvasScores: dict[str, dict[any, any]],
 
     # TODO Move this elsewhere
     # Really don't like how the status is not being checked after this
-    writeUpdatedGradebookToFile(_canvasScores, studentsToPost, _canvas.getAssignmentsToGrade())
+    gradebookPath: (str, None) = \
+        writeUpdatedGradebookToFile(_canvasScores, studentsToPost, _canvas.getAssignmentsToGrade())
 
     print(f"{len(_canvasScores)} assignments are ready to be posted to Canvas.")
 
@@ -155,40 +625,136 @@ def postToCanvas(_canvas: Canvas, _canvasScores: dict[str, dict[any, any]],
     if usrConfirm.lower() != 'y':
         return False
 
-    print(f"Posting scores for {len(studentsToPost)} students across {len(_canvasScores)} assignments...")
+    if uploadGradebook:
+        print(f"Staging scores for {len(studentsToPost)} students across {len(_canvasScores)} assignments...")
+        if gradebookPath is None:
+            print("\tThe gradebook must be written to file before it can be uploaded.")
+            print("...Failed")
+            return False
 
-    for assignment, grades in _canvasScores.items():
-        batchedAssignments: list[str] = []
-        currentBatch: str = ""
-        currentBatchSize: int = 0
-
-        for student, grade in grades.items():
-            # We don't know how many scores can be posted at once to canvas because
-            #  naturally, it isn't documented anywhere. So I am playing it safe and limiting the size that we will
-            #  be sending to canvas at a time.
-            if currentBatchSize >= BATCH_SIZE:
-                batchedAssignments.append(currentBatch)
-                currentBatchSize = 0
-                currentBatch = ""
-            # TODO Validate grade
-            if currentBatchSize == 0:
-                currentBatch += f"grade_data[{grade['id']}][posted_grade]={grade['score']}&" \
-                                f"grade_data[{grade['id']}][text_comment]={grade['comment']}"
-            else:
-                currentBatch += f"&grade_data[{grade['id']}][posted_grade]={grade['score']}&" \
-                                f"grade_data[{grade['id']}][text_comment]={grade['comment']}"
-
-            currentBatchSize += 1
-        # Handle if we have a non-multiple of 50 currently batched - this check worked bc current batch size
-        #  will be zero if it was reset.
-        if currentBatchSize != 0:
-            batchedAssignments.append(currentBatch)
-
-        print(f"\tPosting scores for id {assignment} in {len(batchedAssignments)} batches...")
-        if not _canvas.postAssignment(assignment, batchedAssignments):
+        print(f"\tUploading {gradebookPath}...")
+        if not _canvas.uploadGradebook(gradebookPath):
             print("...Failed")
             return False
 
+        print("\tThe scores have been staged, but have NOT been posted.")
+        print(f"\tReview and apply the changes in Canvas to post them: {_canvas.getGradebookUploadURL()}")
+        print("...Staged")
+        return True
+
+    print(f"Posting scores for {len(studentsToPost)} students across {len(_canvasScores)} assignments...")
+
+    journal: PostingJournal = PostingJournal()
+    supersededBatches: int = journal.supersede(_canvasScores.keys())
+    if supersededBatches != 0:
+        print(f"\t{supersededBatches} incomplete batches from an earlier post are replaced by these scores "
+              f"and will not be resumed")
+
+    if onlyChanged:
+        _canvasScores, _ = removeUnchangedGrades(_canvas, _canvasScores)
+
+    batcher: AdaptiveBatcher = AdaptiveBatcher()
+    scoreTable: pd.DataFrame = createScoreTable(_canvasScores)
+
+    posted: bool = True
+    if combineAssignments:
+        batchedGrades: Iterator[bytes] = batcher.createBatches(encodeGrades(scoreTable, combineAssignments=True))
+
+        print(f"\tPosting scores for {len(_canvasScores)} assignments...")
+        posted = _canvas.postCourseGrades(journal.recordBatches(COURSE_TARGET, batchedGrades),
+                                          onBatchPosted=batcher.update, onBatchFinished=journal.recordProgress)
+
+    else:
+        # every assignment is posted, even if one fails, as the failed batches can be posted again from the journal
+        for assignment in _canvasScores.keys():
+            batchedAssignments: Iterator[bytes] = \
+                batcher.createBatches(encodeGrades(scoreTable.loc[scoreTable['assignment'] == str(assignment)]))
+
+            print(f"\tPosting scores for id {assignment}...")
+            if not _canvas.postAssignment(assignment, journal.recordBatches(assignment, batchedAssignments),
+                                          onBatchPosted=batcher.update, onBatchFinished=journal.recordProgress):
+                posted = False
+
+    batcher.printSummary()
+
+    if not posted:
+        print(f"\tNot every batch completed. Use 'Resume Posting' to post them again.")
+        print("...Failed")
+        return False
+
+    journal.clearIfComplete()
+    print("...Done")
+    return True
+
+
+def resumePosting(_canvas: Canvas) -> bool:
+    """
+    :Description:
+
+    This function posts every batch in the journal that never completed again, exactly as it was first sent.
+    See ``PostingJournal``. Batches that already completed are *not* posted again, nor are batches that were replaced
+    by a later post.
+
+    Batches older than ``JOURNAL_MAX_AGE`` are too stale to be trusted, so they are expired rather than posted.
+    Those scores should be regraded and posted again instead.
+
+    :param _canvas: The Canvas object.
+
+    :return: True if every incomplete batch has now completed. False if not.
+    """
+    journal: PostingJournal = PostingJournal()
+    incompleteBatches: dict[str, list[tuple[float, bytes]]] = journal.getIncompleteBatches()
+
+    now: float = time.time()
+    batchesToPost: dict[str, list[bytes]] = {}
+    for target, batches in incompleteBatches.items():
+        name: str = "multiple assignments" if target == COURSE_TARGET else f"id {target}"
+        expiredBatches: list[bytes] = [payload for sentAt, payload in batches if now - sentAt > JOURNAL_MAX_AGE]
+        currentBatches: list[tuple[float, bytes]] = \
+            [(sentAt, payload) for sentAt, payload in batches if now - sentAt <= JOURNAL_MAX_AGE]
+
+        if expiredBatches:
+            print(f"Warning: {len(expiredBatches)} batches for {name} are more than "
+                  f"{JOURNAL_MAX_AGE / (60 * 60):.0f} hours old and will NOT be posted again.")
+            print("\tRegrade and post these scores instead.")
+            journal.expire(target, expiredBatches)
+
+        if currentBatches:
+            oldestBatch: float = (now - min(sentAt for sentAt, _ in currentBatches)) / 60
+            print(f"{len(currentBatches)} batches for {name} did not complete. "
+                  f"The oldest was sent {oldestBatch:.0f} minutes ago.")
+            batchesToPost[target] = [payload for _, payload in currentBatches]
+
+    if not batchesToPost:
+        print("There are no incomplete batches to post.")
+        journal.clearIfComplete()
+        return True
+
+    print("Please confirm: This operation will post these batches to Canvas again and CAN NOT be reversed")
+
+    usrConfirm = str(input("(y/n): "))
+    if usrConfirm.lower() != 'y':
+        return False
+
+    print("Resuming posting...")
+    posted: bool = True
+    for target, batches in batchesToPost.items():
+        if target == COURSE_TARGET:
+            print(f"\tPosting {len(batches)} batches for multiple assignments...")
+            targetPosted: bool = _canvas.postCourseGrades(journal.recordBatches(target, batches),
+                                                          onBatchFinished=journal.recordProgress)
+        else:
+            print(f"\tPosting {len(batches)} batches for id {target}...")
+            targetPosted: bool = _canvas.postAssignment(target, journal.recordBatches(target, batches),
+                                                        onBatchFinished=journal.recordProgress)
+
+        posted = posted and targetPosted
+
+    if not posted:
+        print("...Failed")
+        return False
+
+    journal.clearIfComplete()
     print("...Done")
     return True
 
@@ -224,14 +790,14 @@ def writeUpdatedGradesheets(_gradescopeAssignments: dict[int, pd.DataFrame], _as
 
     # TODO verify that './gradescope/graded/' exists and create it if it doesn't
 
+    # index the assignments by id once, rather than searching for each assignment
+    assignmentsByID: pd.DataFrame = _assignmentsToGrade.set_index('id')
+
     print(f"Writing {len(_gradescopeAssignments)} assignments to file...")
     for assignmentID, grades in _gradescopeAssignments.items():
-        print(f"\tWriting '{_assignmentsToGrade.loc[_assignmentsToGrade['id'] == assignmentID, 'name'].values[0]}'"
-              f" to file...",  end='')
+        print(f"\tWriting '{assignmentsByID.at[assignmentID, 'name']}' to file...",  end='')
 
-        fullPath = f"./gradescope/graded/" \
-                   f"{_assignmentsToGrade.loc[_assignmentsToGrade['id'] == assignmentID, 'common_name'].values[0]}" \
-                   f"_graded.csv"
+        fullPath = f"./gradescope/graded/{assignmentsByID.at[assignmentID, 'common_name']}_graded.csv"
 
         if not csvWriter(fullPath, grades):
             print("Failed")
@@ -38,7 +38,7 @@ async def bartikGrading(canvas, azure, bartik, **kwargs) -> bool:
 
     print("\n===\tPosting Scores\t===\n")
     if post.writeUpdatedGradesheets(bartikAssignmentsToGrade, assignmentsToGrade) \
-            and post.postToCanvas(canvas, studentScores):
+            and post.postToCanvas(canvas, studentScores, **kwargs['postingOptions']):
         return True
 
     return False
@@ -12,7 +12,7 @@ async def passFail(**kwargs) -> bool:
     assignmentsToGrade: pd.DataFrame = kwargs['canvas'].getAssignmentsToGrade()
 
     for assignmentID, assignmentDF in passFailAssignmentsToGrade.items():
-        currentAssignment: pd.DataFrame = assignmentsToGrade.loc[assignmentsToGrade['id'] == assignmentID]
+        currentAssignment: pd.DataFrame = kwargs['canvas'].getAssignmentFromID(assignmentID)
 
         print(f"Now grading {currentAssignment['name'].values[0]}...")
 
@@ -44,7 +44,7 @@ async def passFail(**kwargs) -> bool:
 
     print("\n===\tPosting Scores\t===\n")
     if post.writeUpdatedGradesheets(passFailAssignmentsToGrade, assignmentsToGrade) \
-            and post.postToCanvas(kwargs['canvas'], studentScores):
+            and post.postToCanvas(kwargs['canvas'], studentScores, **kwargs['postingOptions']):
         return True
 
     return False
@@ -0,0 +1,6 @@
+from Grade import post
+
+
+async def resumePosting(**kwargs) -> bool:
+    print("\n===\tResuming Posting\t===\n")
+    return post.resumePosting(kwargs['canvas'])
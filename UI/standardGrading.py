@@ -6,7 +6,9 @@ import pandas as pd
 
 async def standardGrading(**kwargs):
     statusAssignments: pd.DataFrame = kwargs['canvas'].getStatusAssignments()
-    kwargs['canvas'].updateStatusAssignmentScores()
+    if not kwargs['canvas'].updateStatusAssignmentScores():
+        print("Unable to grade: Status assignment scores could not be downloaded from Canvas")
+        return False
     statusAssignmentScores: pd.DataFrame = kwargs['canvas'].getStatusAssignmentScores()
     uiHelpers.setupAssignments(kwargs['canvas'])
 
@@ -29,23 +31,25 @@ async def standardGrading(**kwargs):
 
     print("\n===\tGenerating Grades\t===\n")
 
-    for assignmentID, gradesDF in gradesheetsToGrade.items():
+    assignmentParameters: pd.DataFrame = pd.DataFrame(
+        columns=['common_name', 'scale_factor', 'assignment_points', 'max_score', 'xc_scale_factor', 'missing_score'])
+
+    for assignmentID in gradesheetsToGrade.keys():
         # we know that if we got here that the id will exist and only map to one assignment
-        currentAssignment: pd.DataFrame = assignmentsToGrade.loc[assignmentsToGrade['id'] == assignmentID]
-        print(f"Now grading {currentAssignment['name'].values[0]}...")
+        currentAssignment: pd.DataFrame = kwargs['canvas'].getAssignmentFromID(assignmentID)
+        print(f"Setting up grading for {currentAssignment['name'].values[0]}...")
 
         scaleFactor, standardPoints, maxPoints, xcScaleFactor = uiHelpers.setupScaling(
             currentAssignment['points'].values[0])
-        gradesheetsToGrade[assignmentID] = \
-            grade.scaleScores(gradesDF, scaleFactor, standardPoints, maxPoints, xcScaleFactor)
-
         missingScore, exceptions = uiHelpers.setupMissingAssignments()
-        gradesheetsToGrade[assignmentID] = \
-            grade.scoreMissingAssignments(gradesDF, score=missingScore, exceptions=exceptions)
 
-        gradesheetsToGrade[assignmentID], specialCasesDF, statusAssignmentScores = \
-            grade.calculateLatePenalty(gradesDF, specialCasesDF, statusAssignments, statusAssignmentScores,
-                                       currentAssignment['common_name'].values[0], kwargs['latePenalty'])
+        assignmentParameters.loc[assignmentID] = [currentAssignment['common_name'].values[0], scaleFactor,
+                                                  standardPoints, maxPoints, xcScaleFactor, missingScore]
+
+    # all the assignments are graded at once, in parallel unless grading was set to be serial
+    gradesheetsToGrade, specialCasesDF, statusAssignmentScores = \
+        grade.gradeAssignments(gradesheetsToGrade, assignmentParameters, specialCasesDF, statusAssignments,
+                               statusAssignmentScores, kwargs['latePenalty'], serial=kwargs['serialGrading'])
 
     if len(statusAssignments) != 0:
         print("Updating Status Assignments...", end="")
@@ -87,7 +91,7 @@ async def standardGrading(**kwargs):
     print("\n===\tPosting Scores\t===\n")
     if post.writeUpdatedGradesheets(gradesheetsToGrade, assignmentsToGrade) \
             and post.updateSpecialCases(specialCasesDF) \
-            and post.postToCanvas(kwargs['canvas'], studentScores):
+            and post.postToCanvas(kwargs['canvas'], studentScores, **kwargs['postingOptions']):
         return True
 
     return False
@@ -5,6 +5,7 @@ from UI.standardGrading import standardGrading
 from UI.exitGrading import exitGrading
 from UI.createNewConfig import newConfig
 from UI.passFail import passFail
+from UI.resumePosting import resumePosting
 
 
 def mainMenu() -> Callable:
@@ -13,8 +14,9 @@ def mainMenu() -> Callable:
     print("2) Bartik Grading")
     print("3) Post Pass Fail Assignment")
     print("4) Create New Config")
-    print("5) Exit Grading")
-    choice = getUserInput(allowedLowerRange=1, allowedUpperRange=5)
+    print("5) Resume Posting")
+    print("6) Exit Grading")
+    choice = getUserInput(allowedLowerRange=1, allowedUpperRange=6)
     if choice == 1:
         return standardGrading
     if choice == 2:
@@ -24,6 +26,8 @@ def mainMenu() -> Callable:
     if choice == 4:
         return newConfig
     if choice == 5:
+        return resumePosting
+    if choice == 6:
         return exitGrading
 
     return lambda _: print("Invalid Choice")
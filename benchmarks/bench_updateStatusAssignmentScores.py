@@ -0,0 +1,110 @@
+"""
+Benchmarks ``Canvas.updateStatusAssignmentScores`` against the row by row implementation that it replaced.
+
+Canvas is not contacted - the submissions are generated up front and handed back by a stubbed
+``__getPaginatedResponse__``, so only the processing of the scores is timed.
+
+Run from the root of the repo with ``python benchmarks/bench_updateStatusAssignmentScores.py``
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Canvas import Canvas  # noqa: E402
+
+STUDENT_COUNTS: list[int] = [1_000, 10_000]
+STATUS_ASSIGNMENTS: list[dict] = [
+    {'common_name': "LPL", 'name': "Late Passes", 'id': 100001, 'trigger': "Late Pass"},
+    {'common_name': "EXT", 'name': "Extension Tokens", 'id': 100002, 'trigger': "Extension"},
+]
+
+
+def createCanvas(_numberOfStudents: int) -> Canvas:
+    canvas = Canvas(_API_KEY="key", _USER_ID="self", _COURSE_ID="12345", _ENDPOINT="https://canvas.example.edu")
+    canvas.m_statusAssignments = pd.DataFrame(STATUS_ASSIGNMENTS)
+    canvas.m_students = pd.DataFrame({
+        'name': [f"Student {i}" for i in range(_numberOfStudents)],
+        'id': list(range(_numberOfStudents)),
+        'sis_id': [f"{10000000 + i}" for i in range(_numberOfStudents)],
+    })
+
+    # include a few students that have dropped and so aren't in the roster
+    submissions: dict[int, list[dict]] = {
+        assignment['id']: [{'user_id': i, 'assignment_id': assignment['id'], 'score': 3.0}
+                           for i in range(_numberOfStudents + 5)]
+        for assignment in STATUS_ASSIGNMENTS
+    }
+
+    def getPaginatedResponse(_url: str, _headers: dict, flags: str = "", checkpoint: str = None) -> list[dict]:
+        # the bulk endpoint returns every assignment in one stream
+        if "/students/submissions" in _url:
+            return [submission for assignment in submissions.values() for submission in assignment]
+        return submissions[int(_url.split("/assignments/")[1].split("/")[0])]
+
+    def iterPaginatedResponse(_url: str, _headers: dict, flags: str = "", checkpoint: str = None):
+        # Canvas sends at most 100 objects per page
+        response = getPaginatedResponse(_url, _headers, flags, checkpoint)
+        for i in range(0, len(response), 100):
+            yield response[i:i + 100]
+
+    canvas.__getPaginatedResponse__ = getPaginatedResponse
+    canvas.__iterPaginatedResponse__ = iterPaginatedResponse
+
+    return canvas
+
+
+def legacyUpdateStatusAssignmentScores(_canvas: Canvas):
+    """
+    The original implementation - a roster scan and a concat for every submission.
+    """
+    header = {"Authorization": f"Bearer {_canvas.API_KEY}"}
+    _canvas.m_statusAssignmentsScores = pd.DataFrame()
+    _canvas.m_statusAssignmentsScores['multipass'] = ""
+    _canvas.m_statusAssignmentsScores['student_score'] = 0.0
+    _canvas.m_statusAssignmentsScores['status_assignment_id'] = 0
+
+    for assignment in _canvas.m_statusAssignments['id'].values:
+        url = f"{_canvas.ENDPOINT}/api/v1/courses/{_canvas.COURSE_ID}/assignments/{assignment}/submissions"
+        for score in _canvas.__getPaginatedResponse__(url, header, flags="per_page=100"):
+            studentMultipass = _canvas.m_students.loc[_canvas.m_students['id'] == score['user_id'], 'sis_id']
+            if len(studentMultipass) == 0:
+                continue
+
+            _canvas.m_statusAssignmentsScores = \
+                pd.concat([_canvas.m_statusAssignmentsScores, pd.DataFrame({
+                    'multipass': str(studentMultipass.values[0]),
+                    'student_score': float(score['score']),
+                    'status_assignment_id': int(assignment)}, index=[0])],
+                          ignore_index=True)
+
+
+def timeCall(_function) -> float:
+    # the functions print progress - we only care about the time
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        start = time.perf_counter()
+        _function()
+        return time.perf_counter() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+if __name__ == "__main__":
+    print(f"{'students':>10} {'legacy (s)':>12} {'columnar (s)':>14} {'speedup':>9}")
+    for studentCount in STUDENT_COUNTS:
+        legacyCanvas = createCanvas(studentCount)
+        legacyTime = timeCall(lambda: legacyUpdateStatusAssignmentScores(legacyCanvas))
+
+        canvas = createCanvas(studentCount)
+        columnarTime = timeCall(canvas.updateStatusAssignmentScores)
+
+        pd.testing.assert_frame_equal(legacyCanvas.getStatusAssignmentScores().astype({'status_assignment_id': int}),
+                                      canvas.getStatusAssignmentScores())
+
+        print(f"{studentCount:>10} {legacyTime:>12.3f} {columnarTime:>14.4f} {legacyTime / columnarTime:>8.0f}x")
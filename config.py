@@ -74,7 +74,11 @@ def createNewConfig():
 
     canvas.COURSE_ID = str(selectedCourse['id'])
     print("Retrieving assignment groups...", end="\n\t")
-    assignmentGroups = list(canvas.getAssignmentGroupsFromCanvas().items())
+    catalog = canvas.getAssignmentCatalogFromCanvas()
+    if catalog is None:
+        print("...Failed")
+        exit()
+    assignmentGroups = [(name, group['id']) for name, group in catalog.items()]
     print("...Done")
 
     print("Enter the assignment groups that you would like to include")
@@ -93,8 +97,9 @@ def createNewConfig():
         usrIn = int(usrIn)
         groupsToUse.append(assignmentGroups[usrIn - 1][1])
 
-    print(f"Downloading assignments from {len(groupsToUse)} assignment groups...", end="\n\t")
-    assignments = canvas.getAssignmentsFromCanvas(groupsToUse)
+    print(f"Loading assignments from {len(groupsToUse)} assignment groups...", end="\n\t")
+    assignments = canvas.getAssignmentsFromCanvas(groupsToUse, catalog=catalog)
+    canvas.close()
     print("...Done")
 
     print("Enter Common Name for status assignments (they must be already downloaded).")
@@ -1,3 +1,5 @@
+import argparse
+import multiprocessing
 import os
 import sys
 from typing import Optional
@@ -8,7 +10,10 @@ import config
 from UI.ui import mainMenu
 import asyncio
 
-async def main():
+async def main(refreshRoster: bool = False, serialGrading: bool = False, postingOptions: dict[str, bool] = None):
+    if postingOptions is None:
+        postingOptions = {}
+
     # TODO May want to rework this config loading!
     loadedConfig = config.loadConfig()
     # TODO Should this be moved to after the action is taken?
@@ -17,7 +22,7 @@ async def main():
     canvas = Canvas()
     canvas.loadSettings(loadedConfig)
     canvas.getAssignmentsFromConfig(loadedConfig)
-    canvas.getStudentsFromCanvas()
+    canvas.getStudentsFromCanvas(refresh=refreshRoster)
 
     azure: Optional[AzureAD] = None
     bartik: Optional[Bartik] = None
@@ -35,16 +40,46 @@ async def main():
             print("Failed to connect to bartik")
             bartik = None
 
-    operation = mainMenu()
-    if not await operation(canvas=canvas, azure=azure, bartik=bartik, latePenalty=loadedConfig['late_penalties']):
-        print("Grading failed.")
+    try:
+        operation = mainMenu()
+        if not await operation(canvas=canvas, azure=azure, bartik=bartik, latePenalty=loadedConfig['late_penalties'],
+                               serialGrading=serialGrading, postingOptions=postingOptions):
+            print("Grading failed.")
+    finally:
+        # release the connections to Canvas regardless of how grading went
+        canvas.close()
 
 
 if __name__ == "__main__":
+    # grading runs in worker processes, which need this to start when the program is compiled
+    multiprocessing.freeze_support()
+
     # when the program is compiled, it will execute in a tmp folder, which is unhelpful when reading data in
     #  so to work around that, we are checking to see if we are running in that mode, then updating the current working
     #  directory to be where the app is downloaded.
 
     if getattr(sys, 'frozen', False):
         os.chdir(os.path.dirname(sys.executable))
-    asyncio.run(main())
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--refresh-roster", action="store_true",
+                        help="download the Canvas roster even if a valid cached copy exists")
+    parser.add_argument("--serial-grading", action="store_true",
+                        help="grade each assignment in this process instead of in parallel")
+    parser.add_argument("--stage-gradebook", action="store_true",
+                        help="upload the gradebook to be reviewed and applied in Canvas, instead of posting the scores")
+    parser.add_argument("--combine-assignments", action="store_true",
+                        help="post the scores for every assignment together with the course level endpoint")
+    parser.add_argument("--only-changed", action="store_true",
+                        help="only post the grades that are different from what is currently in Canvas")
+    args = parser.parse_args()
+
+    # these are passed straight to Grade.post.postToCanvas
+    postingOptions: dict[str, bool] = {
+        'combineAssignments': args.combine_assignments,
+        'onlyChanged': args.only_changed,
+        'uploadGradebook': args.stage_gradebook,
+    }
+
+    asyncio.run(main(refreshRoster=args.refresh_roster, serialGrading=args.serial_grading,
+                     postingOptions=postingOptions))
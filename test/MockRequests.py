@@ -1,12 +1,15 @@
 from Factories import Factories
 import re
+import threading
+from typing import Callable
 
 
 class MockResponse:
-    def __init__(self, _jsonData, _statusCode):
+    def __init__(self, _jsonData, _statusCode, links: dict[str, dict[str, str]] = None,
+                 headers: dict[str, str] = None, text: str = ""):
         self.json_data = _jsonData
         self.status_code = _statusCode
-        self.links = {
+        self.links = links if links is not None else {
             'current': {
                 'url': "last"
             },
@@ -15,11 +18,60 @@ class MockResponse:
             }
 
         }
+        self.headers = headers if headers is not None else {}
+        self.text = text
 
     def json(self):
         return self.json_data
 
 
+class MockSession:
+    """
+    Stands in for the ``requests.Session`` that Canvas sends its requests through. Each url is mapped to the responses
+    to return for it, in order. Once only one response is left for a url, it is returned for every request after that.
+    A url can instead be mapped to a function, which is called with the method and the keyword arguments of each
+    request to that url and returns the response.
+    Every request is recorded, along with the most requests that were ever in flight at the same time.
+    """
+    def __init__(self, _responses: dict[str, (list[MockResponse], Callable)], delay=None):
+        self.m_responses = _responses
+        self.m_delay = delay
+        self.m_requests: list[str] = []
+        self.m_inFlight = 0
+        self.m_maxInFlight = 0
+        self.m_lock = threading.Lock()
+
+    def request(self, _method, _url, **kwargs) -> MockResponse:
+        with self.m_lock:
+            self.m_requests.append(_url)
+            self.m_inFlight += 1
+            self.m_maxInFlight = max(self.m_maxInFlight, self.m_inFlight)
+
+        try:
+            if self.m_delay is not None:
+                # not time.sleep, so that tests can patch out Canvas's waits without patching this one
+                threading.Event().wait(self.m_delay(_url))
+
+            if callable(self.m_responses.get(_url)):
+                return self.m_responses[_url](_method, kwargs)
+
+            with self.m_lock:
+                responses: list[MockResponse] = self.m_responses.get(_url, [])
+                if not responses:
+                    return MockResponse({'Error': "Failed to resolve mocked request."}, 404)
+
+                return responses.pop(0) if len(responses) > 1 else responses[0]
+        finally:
+            with self.m_lock:
+                self.m_inFlight -= 1
+
+    def get(self, _url, **kwargs) -> MockResponse:
+        return self.request("GET", _url, **kwargs)
+
+    def close(self):
+        pass
+
+
 def mock_requestsGet(*args, **kwargs) -> MockResponse:
     # /api/v1/courses/:course_id/assignment_groups
     if re.match(r"https://(\w+\.?)+\.\w{3}/api/v[0-9]/courses/[0-9]{5}/assignment_groups", args[0]) is not None:
@@ -0,0 +1,787 @@
+from Canvas import Canvas
+import Canvas as CanvasModule
+from MockRequests import MockResponse, MockSession
+import json
+import os
+import pandas as pd
+from pandas import testing
+import random
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+
+class TestCommonNames(unittest.TestCase):
+    def setUp(self):
+        Canvas.s_commonNames.clear()
+
+    def testCommonNames(self):
+        self.assertEqual(["HW1", "L14", "PA1B", "UKN1", "HW1", "UKN2", "UKN1"],
+                         Canvas.__getCommonNames__(["HW 1", "Lab 14", "Python Assessment 1B", "syllabus quiz",
+                                                    "HW 1", "late pass", "syllabus quiz"]))
+
+    def testNonAsciiNames(self):
+        # these are the same characters that str.isupper and str.isdigit accept
+        self.assertEqual(["É2", "Ä3Ö", "Σ٣", "HW²"],
+                         Canvas.__getCommonNames__(["É 2", "Äb 3Ö", "Σ ٣", "HW ²"]))
+
+
+class TestAssignmentLookups(unittest.TestCase):
+    def setUp(self):
+        self.canvas = Canvas("api_key", "self", "12345", "https://canvas.test")
+        self.canvas.getAssignmentsFromConfig({'assignments': [
+            {'common_name': "HW1", 'name': "HW 1", 'id': 283462, 'points': 6.0},
+            {'common_name': "L14", 'name': "Lab 14", 'id': 283470, 'points': 4.0},
+            {'common_name': "HW2", 'name': "HW 2", 'id': 283480, 'points': 6.0},
+        ]})
+
+    def getSelectedIDs(self) -> list[int]:
+        return list(self.canvas.getAssignmentsToGrade()['id'].values)
+
+    def testLookups(self):
+        self.assertEqual([283470], list(self.canvas.getAssignmentFromCommonName("L14")['id'].values))
+        self.assertEqual(["HW 2"], list(self.canvas.getAssignmentFromID("283480")['name'].values))
+        self.assertTrue(self.canvas.getAssignmentFromID(999999).empty)
+        self.assertIsNone(self.canvas.getAssignmentFromCommonName("HW9"))
+        self.assertTrue(self.canvas.validateAssignment(commonName="HW1"))
+        self.assertTrue(self.canvas.validateAssignment(canvasID=283470))
+        self.assertFalse(self.canvas.validateAssignment(canvasID=999999))
+
+    def testLookupsAfterReindexing(self):
+        self.canvas.selectAssignmentsToGrade(["HW2"])
+
+        # the same names in a different order, with HW2 replaced by PA1
+        self.canvas.getAssignmentsFromConfig({'assignments': [
+            {'common_name': "PA1", 'name': "Python Assessment 1", 'id': 283490, 'points': 10.0},
+            {'common_name': "HW1", 'name': "HW 1", 'id': 283462, 'points': 6.0},
+        ]})
+
+        self.assertIsNone(self.canvas.getAssignmentFromCommonName("HW2"))
+        self.assertFalse(self.canvas.validateAssignment(canvasID=283480))
+        self.assertEqual([283462], list(self.canvas.getAssignmentFromCommonName("HW1")['id'].values))
+        self.assertEqual(["PA1"], list(self.canvas.getAssignmentFromID(283490)['common_name'].values))
+
+        # assignments selected before the assignments were replaced aren't kept
+        self.canvas.selectAssignmentsToGrade(["HW1"])
+        self.assertEqual([283462], self.getSelectedIDs())
+
+    def testSelectsEachAssignmentOnce(self):
+        self.canvas.selectAssignmentsToGrade(["HW2", "HW1", "HW2", "HW9"])
+        self.canvas.selectAssignmentsToGrade(["HW1"])
+
+        self.assertEqual([283480, 283462], self.getSelectedIDs())
+
+    def testSelectsDuplicateNameOnce(self):
+        # a second HW1 in another group, so the grader has to pick which one is meant
+        self.canvas.getAssignmentsFromConfig({'assignments': [
+            {'common_name': "HW1", 'name': "HW 1", 'id': 283462, 'points': 6.0},
+            {'common_name': "HW1", 'name': "HW 1 (Honors)", 'id': 283463, 'points': 8.0},
+            {'common_name': "L14", 'name': "Lab 14", 'id': 283470, 'points': 4.0},
+        ]})
+
+        with mock.patch('builtins.input', return_value="283463"):
+            self.canvas.selectAssignmentsToGrade(["HW1", "L14"])
+            self.canvas.selectAssignmentsToGrade(["HW1"])
+
+        self.assertEqual([283463, 283470], self.getSelectedIDs())
+
+
+class TestAssignmentCatalog(unittest.TestCase):
+    ENDPOINT = "https://canvas.test"
+    CATALOG_URL = f"{ENDPOINT}/api/v1/courses/12345/assignment_groups?include[]=assignments" \
+                  "&exclude_response_fields[]=description&exclude_response_fields[]=rubric&per_page=100"
+
+    @classmethod
+    def getGroupURL(cls, _group: int) -> str:
+        return f"{cls.ENDPOINT}/api/v1/courses/12345/assignment_groups/{_group}/assignments?"
+
+    @staticmethod
+    def createAssignment(_name: str, _id: int, _points: float) -> dict[str, any]:
+        # the fields that aren't kept should be dropped either way
+        return {'name': _name, 'id': _id, 'points_possible': _points, 'due_at': "2022-02-01T06:59:59Z",
+                'submission_types': ["online_upload"]}
+
+    def setUp(self):
+        self.canvas = Canvas("api_key", "self", "12345", self.ENDPOINT)
+
+        groups = [
+            {'name': "Homework", 'id': 10, 'assignments': [self.createAssignment("HW 1", 283462, 6.0),
+                                                           self.createAssignment("HW 2", 283480, 6.0)]},
+            {'name': "Labs", 'id': 20, 'assignments': [self.createAssignment("Lab 14", 283470, 4.0)]},
+            {'name': "Quizzes", 'id': 30, 'assignments': [self.createAssignment("syllabus quiz", 283400, 1.0)]},
+            {'name': "Extra Credit", 'id': 40, 'assignments': []},
+        ]
+
+        # the catalog is split over two pages, while each group is pulled on its own
+        self.responses = {
+            self.CATALOG_URL: [MockResponse(groups[:2], 200, links={
+                'next': {'url': self.CATALOG_URL + "&page=2"}, 'last': {'url': self.CATALOG_URL + "&page=2"}})],
+            self.CATALOG_URL + "&page=2": [MockResponse(groups[2:], 200, links={})],
+        }
+        for group in groups:
+            self.responses[self.getGroupURL(group['id'])] = [MockResponse(group['assignments'], 200, links={})]
+
+    def getAssignments(self, _assignmentGroups: list[int], useCatalog: bool) -> (pd.DataFrame, list[str]):
+        session = MockSession(self.responses)
+        self.canvas.m_session = session
+
+        catalog = self.canvas.getAssignmentCatalogFromCanvas() if useCatalog else None
+        assignments = self.canvas.getAssignmentsFromCanvas(_assignmentGroups, catalog=catalog)
+
+        return pd.DataFrame(assignments), session.m_requests
+
+    def testCatalogMatchesGroupPull(self):
+        groups = [20, 10, 40]
+        catalogAssignments, catalogRequests = self.getAssignments(groups, useCatalog=True)
+        groupAssignments, groupRequests = self.getAssignments(groups, useCatalog=False)
+
+        testing.assert_frame_equal(groupAssignments, catalogAssignments)
+        self.assertEqual([283470, 283462, 283480], list(catalogAssignments['id'].values))
+        self.assertEqual(["L14", "HW1", "HW2"], list(catalogAssignments['common_name'].values))
+
+        self.assertEqual([self.CATALOG_URL, self.CATALOG_URL + "&page=2"], catalogRequests)
+        self.assertEqual([self.getGroupURL(group) for group in groups], groupRequests)
+
+    def testCatalogOnlyKeepsUsedFields(self):
+        self.canvas.m_session = MockSession(self.responses)
+
+        catalog = self.canvas.getAssignmentCatalogFromCanvas()
+
+        self.assertEqual({'Homework': 10, 'Labs': 20, 'Quizzes': 30, 'Extra Credit': 40},
+                         {name: group['id'] for name, group in catalog.items()})
+        self.assertEqual([{'name': "Lab 14", 'id': 283470, 'points_possible': 4.0}], catalog['Labs']['assignments'])
+
+    def testFailedCatalogPull(self):
+        self.responses[self.CATALOG_URL + "&page=2"] = [MockResponse({}, 404)]
+        self.canvas.m_session = MockSession(self.responses)
+
+        self.assertIsNone(self.canvas.getAssignmentCatalogFromCanvas())
+
+
+class TestPagination(unittest.TestCase):
+    URL = "https://canvas.test/api/v1/courses/12345/users"
+    FLAGS = "per_page=2"
+    PAGES = 20
+
+    @classmethod
+    def getPageURL(cls, _page: int) -> str:
+        return f"{cls.URL}?{cls.FLAGS}" + (f"&page={_page}" if _page != 1 else "")
+
+    @classmethod
+    def createPages(cls, withLast: bool = True) -> dict[str, list[MockResponse]]:
+        pages: dict[str, list[MockResponse]] = {}
+        for page in range(1, cls.PAGES + 1):
+            links = {'current': {'url': cls.getPageURL(page)}}
+            if page != cls.PAGES:
+                links['next'] = {'url': cls.getPageURL(page + 1)}
+            if withLast:
+                links['last'] = {'url': cls.getPageURL(cls.PAGES)}
+
+            pages[cls.getPageURL(page)] = [MockResponse([{'id': page * 2}, {'id': page * 2 + 1}], 200, links=links)]
+
+        return pages
+
+    def setUp(self):
+        self.canvas = Canvas("api_key", "self", "12345", "https://canvas.test")
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.directory.name, "checkpoint.jsonl")
+
+        # don't actually wait between retries
+        self.sleep = mock.patch.object(CanvasModule.time, 'sleep')
+        self.sleep.start()
+
+    def tearDown(self):
+        self.sleep.stop()
+        self.directory.cleanup()
+
+    def getAllIDs(self, checkpoint: str = None) -> list[int]:
+        return [student['id'] for page in
+                self.canvas.__iterPaginatedResponse__(self.URL, {}, flags=self.FLAGS, checkpoint=checkpoint)
+                for student in page]
+
+    def testPagesAreDownloadedConcurrentlyAndYieldedInOrder(self):
+        # later pages finish first, so the pages only come out in order if they are put back in order
+        session = MockSession(self.createPages(), delay=lambda url: random.uniform(0, .02))
+        self.canvas.m_session = session
+
+        self.assertEqual(list(range(2, self.PAGES * 2 + 2)), self.getAllIDs())
+        self.assertEqual(self.PAGES, len(session.m_requests))
+        self.assertGreater(session.m_maxInFlight, 1)
+        self.assertLessEqual(session.m_maxInFlight, CanvasModule.MAX_PAGE_WORKERS)
+
+    def testFollowsNextLinksWithoutLast(self):
+        session = MockSession(self.createPages(withLast=False))
+        self.canvas.m_session = session
+
+        self.assertEqual(list(range(2, self.PAGES * 2 + 2)), self.getAllIDs())
+        self.assertEqual([self.getPageURL(page) for page in range(1, self.PAGES + 1)], session.m_requests)
+
+    def testServerErrorsAreRetried(self):
+        pages = self.createPages()
+        pages[self.getPageURL(5)][0:0] = [MockResponse({}, 500), MockResponse({}, 502)]
+        session = MockSession(pages)
+        self.canvas.m_session = session
+
+        self.assertEqual(list(range(2, self.PAGES * 2 + 2)), self.getAllIDs())
+        self.assertEqual(3, session.m_requests.count(self.getPageURL(5)))
+
+    def testGivesUpAfterMaxRetries(self):
+        pages = self.createPages()
+        pages[self.getPageURL(5)] = [MockResponse({}, 503)]
+        session = MockSession(pages)
+        self.canvas.m_session = session
+
+        with self.assertRaises(CanvasModule.PaginationError) as context:
+            self.canvas.__getPaginatedResponse__(self.URL, {}, flags=self.FLAGS)
+
+        self.assertEqual(self.getPageURL(5), context.exception.url)
+        self.assertEqual(list(range(2, 10)), [student['id'] for student in context.exception.results])
+        self.assertEqual(CanvasModule.MAX_PAGE_RETRIES + 1, session.m_requests.count(self.getPageURL(5)))
+
+    def testClientErrorsAreNotRetried(self):
+        pages = self.createPages()
+        pages[self.getPageURL(5)] = [MockResponse({}, 404)]
+        session = MockSession(pages)
+        self.canvas.m_session = session
+
+        with self.assertRaises(CanvasModule.PaginationError):
+            self.getAllIDs()
+
+        self.assertEqual(1, session.m_requests.count(self.getPageURL(5)))
+
+    def testResumesFromCheckpoint(self):
+        pages = self.createPages()
+        pages[self.getPageURL(12)] = [MockResponse({}, 500)]
+        self.canvas.m_session = MockSession(pages)
+
+        with self.assertRaises(CanvasModule.PaginationError):
+            self.getAllIDs(self.checkpoint)
+
+        with open(self.checkpoint, "r") as checkpointFile:
+            checkpointed: set[str] = {json.loads(line)['url'] for line in checkpointFile}
+        self.assertIn(self.getPageURL(1), checkpointed)
+        self.assertNotIn(self.getPageURL(12), checkpointed)
+
+        session = MockSession(self.createPages())
+        self.canvas.m_session = session
+
+        self.assertEqual(list(range(2, self.PAGES * 2 + 2)), self.getAllIDs(self.checkpoint))
+        self.assertEqual({self.getPageURL(page) for page in range(1, self.PAGES + 1)} - checkpointed,
+                         set(session.m_requests))
+        self.assertEqual(len(session.m_requests), len(set(session.m_requests)))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+class TestThrottling(unittest.TestCase):
+    URL = "https://canvas.test/api/v1/courses/12345/users"
+
+    def setUp(self):
+        self.canvas = Canvas("api_key", "self", "12345", "https://canvas.test", poolSize=8)
+
+        # no jitter, so the backoff is exactly THROTTLE_BACKOFF * 2 ^ attempt
+        self.uniform = mock.patch.object(CanvasModule.random, 'uniform', return_value=0)
+        self.uniform.start()
+
+    def tearDown(self):
+        self.uniform.stop()
+
+    def testThrottleHalvesConcurrencyAndPauses(self):
+        scheduler = CanvasModule.RequestScheduler(maxConcurrency=8)
+
+        before = time.time()
+        scheduler.throttle(2)
+        self.assertEqual(4, scheduler.m_concurrency)
+        self.assertGreaterEqual(scheduler.m_pausedUntil, before + CanvasModule.THROTTLE_BACKOFF * 4)
+
+        # a shorter backoff doesn't cut the current pause short
+        pausedUntil = scheduler.m_pausedUntil
+        for _ in range(4):
+            scheduler.throttle(0)
+        self.assertEqual(1, scheduler.m_concurrency)
+        self.assertEqual(pausedUntil, scheduler.m_pausedUntil)
+
+    @mock.patch.object(CanvasModule, 'THROTTLE_BACKOFF', .1)
+    def testAcquireWaitsForPause(self):
+        scheduler = CanvasModule.RequestScheduler(maxConcurrency=8)
+        scheduler.throttle(0)
+
+        before = time.time()
+        scheduler.acquire()
+        self.assertGreaterEqual(time.time() - before, .09)
+
+    def testConcurrencyFollowsRateLimit(self):
+        scheduler = CanvasModule.RequestScheduler(maxConcurrency=8)
+
+        for remaining, concurrency in [(100, 7), (100, 6), (300, 6), (500, 7), (500, 8), (500, 8)]:
+            scheduler.acquire()
+            scheduler.release(MockResponse({}, 200, headers={'X-Rate-Limit-Remaining': str(remaining)}))
+            self.assertEqual(concurrency, scheduler.m_concurrency)
+
+    @mock.patch.object(CanvasModule, 'THROTTLE_BACKOFF', 0)
+    def testThrottledRequestsAreRetried(self):
+        session = MockSession({self.URL: [MockResponse({}, 403, text="403 Forbidden (Rate Limit Exceeded)"),
+                                          MockResponse({}, 429),
+                                          MockResponse([{'id': 1}], 200)]})
+        self.canvas.m_session = session
+
+        response = self.canvas.__sendRequest__("GET", self.URL)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(session.m_requests))
+        self.assertEqual(2, self.canvas.m_scheduler.m_concurrency)
+
+    @mock.patch.object(CanvasModule, 'THROTTLE_BACKOFF', 0)
+    def testGivesUpAfterMaxThrottleRetries(self):
+        session = MockSession({self.URL: [MockResponse({}, 429)]})
+        self.canvas.m_session = session
+
+        response = self.canvas.__sendRequest__("GET", self.URL)
+
+        self.assertEqual(429, response.status_code)
+        self.assertEqual(CanvasModule.MAX_THROTTLE_RETRIES + 1, len(session.m_requests))
+
+    def testForbiddenIsNotThrottled(self):
+        session = MockSession({self.URL: [MockResponse({}, 403, text="403 Forbidden"), MockResponse({}, 200)]})
+        self.canvas.m_session = session
+
+        self.assertEqual(403, self.canvas.__sendRequest__("GET", self.URL).status_code)
+        self.assertEqual(1, len(session.m_requests))
+
+
+class TestPostBatches(unittest.TestCase):
+    ENDPOINT = "https://canvas.test"
+    POST_URL = f"{ENDPOINT}/api/v1/courses/12345/assignments/283462/submissions/update_grades"
+    BATCHES = 10
+
+    @classmethod
+    def getProgressURL(cls, _batch: int) -> str:
+        return f"{cls.ENDPOINT}/api/v1/progress/{_batch}"
+
+    @classmethod
+    def createProgress(cls, _batch: int, _state: str, message: str = None) -> MockResponse:
+        return MockResponse({'id': _batch, 'url': cls.getProgressURL(_batch), 'workflow_state': _state,
+                             'message': message}, 200)
+
+    def setUp(self):
+        self.canvas = Canvas("api_key", "self", "12345", self.ENDPOINT)
+        self.batches = [f"grade_data[{batch}][posted_grade]=1.0".encode() for batch in range(self.BATCHES)]
+        self.postedBatches: list[bytes] = []
+
+        # every batch is queued when it is posted, then completes the first time it is polled
+        self.responses = {self.POST_URL: self.postBatch}
+        for batch in range(self.BATCHES):
+            self.responses[self.getProgressURL(batch)] = [self.createProgress(batch, "completed")]
+
+        # don't actually wait between polls
+        self.sleep = mock.patch.object(CanvasModule.time, 'sleep')
+        self.sleep.start()
+
+    def tearDown(self):
+        self.sleep.stop()
+
+    def postBatch(self, _method: str, _kwargs: dict[str, any]) -> MockResponse:
+        self.postedBatches.append(_kwargs['data'])
+        batch = self.batches.index(_kwargs['data'])
+        return self.createProgress(batch, "queued")
+
+    def postAssignment(self) -> (bool, list[tuple[float, bool]], list[tuple[int, dict]]):
+        posted: list[tuple[float, bool]] = []
+        finished: list[tuple[int, dict]] = []
+
+        allCompleted = self.canvas.postAssignment("283462", iter(self.batches),
+                                                  onBatchPosted=lambda latency, accepted: posted.append(accepted),
+                                                  onBatchFinished=lambda i, progress: finished.append((i, progress)))
+        return allCompleted, posted, finished
+
+    def testAllBatchesCompleted(self):
+        # batches finish out of order, and some polls fail
+        self.responses[self.getProgressURL(3)][0:0] = [self.createProgress(3, "running"), MockResponse({}, 500)]
+        self.responses[self.getProgressURL(7)][0:0] = [self.createProgress(7, "queued")]
+        session = MockSession(self.responses, delay=lambda url: random.uniform(0, .02) if url == self.POST_URL else 0)
+        self.canvas.m_session = session
+
+        allCompleted, posted, finished = self.postAssignment()
+
+        self.assertTrue(allCompleted)
+        self.assertCountEqual(self.batches, self.postedBatches)
+        self.assertEqual([True] * self.BATCHES, posted)
+        self.assertEqual([(batch, batch, "completed") for batch in range(self.BATCHES)],
+                         [(i, progress['id'], progress['workflow_state']) for i, progress in finished])
+        self.assertGreater(session.m_maxInFlight, 1)
+        self.assertLessEqual(session.m_maxInFlight, CanvasModule.MAX_POST_WORKERS)
+        self.assertEqual(3, session.m_requests.count(self.getProgressURL(3)))
+
+    def testFailedBatchesFailPost(self):
+        def postBatch(_method: str, _kwargs: dict[str, any]) -> MockResponse:
+            # Canvas rejects batch 5 outright, so it never gets a progress job
+            if _kwargs['data'] == self.batches[5]:
+                return MockResponse({}, 400)
+            return self.postBatch(_method, _kwargs)
+
+        self.responses[self.POST_URL] = postBatch
+        self.responses[self.getProgressURL(3)] = [self.createProgress(3, "failed", message="Internal Error")]
+        self.canvas.m_session = MockSession(self.responses)
+
+        allCompleted, posted, finished = self.postAssignment()
+
+        self.assertFalse(allCompleted)
+        self.assertEqual([batch != 5 for batch in range(self.BATCHES)], posted)
+        states = [progress['workflow_state'] for _, progress in finished]
+        self.assertEqual(["failed", "failed"], [states[3], states[5]])
+        self.assertEqual(["completed"] * (self.BATCHES - 2), [state for state in states if state != "failed"])
+
+    @mock.patch.object(CanvasModule, 'PROGRESS_TIMEOUT', .05)
+    def testUnfinishedBatchesFailPost(self):
+        self.responses[self.getProgressURL(3)] = [self.createProgress(3, "running")]
+        self.canvas.m_session = MockSession(self.responses)
+
+        allCompleted, _, finished = self.postAssignment()
+
+        self.assertFalse(allCompleted)
+        self.assertEqual("running", finished[3][1]['workflow_state'])
+        self.assertEqual(["completed"] * (self.BATCHES - 1),
+                         [progress['workflow_state'] for i, progress in finished if i != 3])
+
+    def testReportProgress(self):
+        self.assertTrue(Canvas.__reportProgress__([{'workflow_state': "completed"}] * 2))
+        self.assertFalse(Canvas.__reportProgress__([{'workflow_state': "completed"}, {'workflow_state': "queued"}]))
+        self.assertFalse(Canvas.__reportProgress__([{'workflow_state': "completed"}, {}]))
+        self.assertTrue(Canvas.__reportProgress__([]))
+
+
+class TestUploadGradebook(unittest.TestCase):
+    ENDPOINT = "https://canvas.test"
+    PREFLIGHT_URL = f"{ENDPOINT}/api/v1/courses/12345/gradebook_upload"
+    UPLOAD_URL = "https://uploads.canvas.test/files"
+    CONFIRM_URL = f"{ENDPOINT}/api/v1/files/555/create_success"
+    PROGRESS_URL = f"{ENDPOINT}/api/v1/progress/7"
+    GRADEBOOK = b"Student,ID,SIS User ID,SIS Login ID,Section,HW1 (283462)\nStudent A,25685,,,,6.0\n"
+
+    @classmethod
+    def createProgress(cls, _state: str, message: str = None) -> dict[str, any]:
+        return {'id': 7, 'url': cls.PROGRESS_URL, 'workflow_state': _state, 'message': message}
+
+    def setUp(self):
+        self.canvas = Canvas("api_key", "self", "12345", self.ENDPOINT)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.gradebookPath = os.path.join(self.directory.name, "gradebook.csv")
+        with open(self.gradebookPath, "wb") as gradebook:
+            gradebook.write(self.GRADEBOOK)
+
+        # the keyword arguments of every request, by method
+        self.sentRequests: dict[str, list[dict[str, any]]] = {}
+
+        # Canvas hands back a pre-authorized upload url, redirects to confirm the upload, then stages the gradebook
+        self.responses = {
+            self.PREFLIGHT_URL: self.record(MockResponse(
+                {'upload_url': self.UPLOAD_URL, 'upload_params': {'key': "gradebook/555"}}, 200)),
+            self.UPLOAD_URL: self.record(MockResponse({}, 302, headers={'Location': self.CONFIRM_URL})),
+            self.CONFIRM_URL: self.record(MockResponse({'id': 555, 'progress': self.createProgress("queued")}, 200)),
+            self.PROGRESS_URL: [MockResponse(self.createProgress("running"), 200),
+                                MockResponse(self.createProgress("completed"), 200)],
+        }
+
+        # don't actually wait between polls
+        self.sleep = mock.patch.object(CanvasModule.time, 'sleep')
+        self.sleep.start()
+
+    def tearDown(self):
+        self.sleep.stop()
+        self.directory.cleanup()
+
+    def record(self, _response: MockResponse):
+        def respond(_method: str, _kwargs: dict[str, any]) -> MockResponse:
+            # the file is closed once the upload is sent, so it has to be read now
+            if 'files' in _kwargs:
+                name, file, contentType = _kwargs['files']['file']
+                _kwargs = {**_kwargs, 'files': {'file': (name, file.read(), contentType)}}
+            self.sentRequests.setdefault(_method, []).append(_kwargs)
+            return _response
+
+        return respond
+
+    def uploadGradebook(self) -> (bool, list[str]):
+        session = MockSession(self.responses)
+        self.canvas.m_session = session
+
+        return self.canvas.uploadGradebook(self.gradebookPath), session.m_requests
+
+    def testUploadWithRedirect(self):
+        uploaded, sentRequests = self.uploadGradebook()
+
+        self.assertTrue(uploaded)
+        self.assertEqual([self.PREFLIGHT_URL, self.UPLOAD_URL, self.CONFIRM_URL, self.PROGRESS_URL, self.PROGRESS_URL],
+                         sentRequests)
+
+        preflight, upload = self.sentRequests['POST']
+        self.assertEqual({'name': "gradebook.csv", 'size': len(self.GRADEBOOK), 'content_type': "text/csv"},
+                         preflight['data'])
+        self.assertEqual("Bearer api_key", preflight['headers']['Authorization'])
+
+        # the upload url is pre-authorized, so the api key must not be sent to it
+        self.assertEqual({'key': "gradebook/555"}, upload['data'])
+        self.assertEqual({'file': ("gradebook.csv", self.GRADEBOOK, "text/csv")}, upload['files'])
+        self.assertNotIn('headers', upload)
+        self.assertFalse(upload['allow_redirects'])
+
+        confirm, = self.sentRequests['GET']
+        self.assertEqual("Bearer api_key", confirm['headers']['Authorization'])
+
+    def testUploadWithoutRedirect(self):
+        self.responses[self.UPLOAD_URL] = [MockResponse(self.createProgress("queued"), 201)]
+
+        uploaded, sentRequests = self.uploadGradebook()
+
+        self.assertTrue(uploaded)
+        self.assertEqual([self.PREFLIGHT_URL, self.UPLOAD_URL, self.PROGRESS_URL, self.PROGRESS_URL], sentRequests)
+
+    def testFailedImportFailsUpload(self):
+        self.responses[self.PROGRESS_URL] = [MockResponse(self.createProgress("failed", message="Invalid csv"), 200)]
+
+        uploaded, _ = self.uploadGradebook()
+
+        self.assertFalse(uploaded)
+
+    def testRejectedPreflightIsNotUploaded(self):
+        self.responses[self.PREFLIGHT_URL] = [MockResponse({'errors': [{'message': "unauthorized"}]}, 401)]
+
+        uploaded, sentRequests = self.uploadGradebook()
+
+        self.assertFalse(uploaded)
+        self.assertEqual([self.PREFLIGHT_URL], sentRequests)
+
+    def testRejectedUploadIsNotTracked(self):
+        self.responses[self.CONFIRM_URL] = [MockResponse({}, 500)]
+
+        uploaded, sentRequests = self.uploadGradebook()
+
+        self.assertFalse(uploaded)
+        self.assertNotIn(self.PROGRESS_URL, sentRequests)
+
+    def testMissingGradebookIsNotUploaded(self):
+        os.remove(self.gradebookPath)
+
+        uploaded, sentRequests = self.uploadGradebook()
+
+        self.assertFalse(uploaded)
+        self.assertEqual([], sentRequests)
+
+    def testGetGradebookUploadURL(self):
+        self.assertEqual("https://canvas.test/courses/12345/gradebook_upload", self.canvas.getGradebookUploadURL())
+
+
+class TestCreateStatusAssignmentScores(unittest.TestCase):
+    def setUp(self):
+        self.canvas = Canvas("api_key", "self", "12345", "https://canvas.test")
+        # a student can be listed twice if they have more than one enrollment
+        self.canvas.m_students = pd.DataFrame({'name': ["Student A", "Student B", "Student B"], 'id': [1, 2, 2],
+                                               'sis_id': ["10000001", "10000002", "10000002"]})
+
+    def testFilterSubmissions(self):
+        submissions, invalidSubmissions = Canvas.__filterSubmissionPages__(iter([
+            [{'user_id': 1, 'assignment_id': 900, 'score': 3.0}, {'user_id': 2, 'assignment_id': 900, 'score': None}],
+            [{'user_id': 2, 'assignment_id': 900, 'score': "1"}, {'user_id': 1, 'assignment_id': 900, 'score': "EX"},
+             {'user_id': 1, 'assignment_id': 999, 'score': 1.0}, {'assignment_id': 900, 'score': 1.0}],
+        ]), [900])
+
+        self.assertEqual(4, invalidSubmissions)
+        self.assertEqual([(1, 900, 3.0), (2, 900, 1.0)],
+                         list(submissions.itertuples(index=False, name=None)))
+
+    def testJoinsRoster(self):
+        submissions = Canvas.__filterSubmissions__([(2, 900, 1.0), (3, 900, 2.0), (1, 900, 3.0), (1, 901, 0.0)],
+                                                   [900, 901])
+
+        scores = self.canvas.__createStatusAssignmentScores__([submissions])
+
+        # student 3 isn't in the roster, and student 2 is only scored once
+        testing.assert_frame_equal(pd.DataFrame({
+            'multipass': ["10000002", "10000001", "10000001"],
+            'student_score': [1.0, 3.0, 0.0],
+            'status_assignment_id': [900, 900, 901],
+        }), scores)
+
+    def testNoSubmissions(self):
+        scores = self.canvas.__createStatusAssignmentScores__([Canvas.__filterSubmissions__([], [900])])
+
+        self.assertTrue(scores.empty)
+        self.assertEqual(CanvasModule.STATUS_ASSIGNMENT_SCORES_COLUMNS, scores.columns.tolist())
+
+
+class TestStatusAssignmentScores(unittest.TestCase):
+    ENDPOINT = "https://canvas.test"
+    BULK_URL = f"{ENDPOINT}/api/v1/courses/12345/students/submissions?per_page=100&student_ids[]=all" \
+               "&assignment_ids[]=900&assignment_ids[]=901"
+
+    @classmethod
+    def getAssignmentURL(cls, _assignment: int) -> str:
+        return f"{cls.ENDPOINT}/api/v1/courses/12345/assignments/{_assignment}/submissions?per_page=100"
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cacheDirectory = mock.patch.object(CanvasModule, 'DEFAULT_CACHE_DIRECTORY', self.directory.name + "/")
+        self.cacheDirectory.start()
+
+        self.canvas = Canvas("api_key", "self", "12345", self.ENDPOINT)
+        self.canvas.m_students = pd.DataFrame({'name': ["Student A", "Student B", "Student C"], 'id': [1, 2, 3],
+                                               'sis_id': ["10000001", "10000002", "10000003"]})
+        self.canvas.m_statusAssignments = pd.DataFrame({'id': [900, 901], 'name': ["Late Passes", "Extensions"]})
+
+        # student 4 dropped the course, and student 3 hasn't been given a score for 901
+        submissions = {
+            900: [{'user_id': 1, 'assignment_id': 900, 'score': 3.0}, {'user_id': 2, 'assignment_id': 900, 'score': 1},
+                  {'user_id': 3, 'assignment_id': 900, 'score': 0.0}, {'user_id': 4, 'assignment_id': 900, 'score': 2}],
+            901: [{'user_id': 1, 'assignment_id': 901, 'score': 2.0}, {'user_id': 2, 'assignment_id': 901, 'score': 0},
+                  {'user_id': 3, 'assignment_id': 901, 'score': None}],
+        }
+        self.expectedScores = pd.DataFrame({
+            'multipass': ["10000001", "10000002", "10000003", "10000001", "10000002"],
+            'student_score': [3.0, 1.0, 0.0, 2.0, 0.0],
+            'status_assignment_id': [900, 900, 900, 901, 901],
+        })
+
+        # the bulk stream is grouped by student, and split across pages that are followed with next links
+        bulkSubmissions = sorted(submissions[900] + submissions[901], key=lambda submission: submission['user_id'])
+        self.responses = {
+            self.BULK_URL: [MockResponse(bulkSubmissions[:4], 200,
+                                         links={'next': {'url': self.BULK_URL + "&page=bookmark"}})],
+            self.BULK_URL + "&page=bookmark": [MockResponse(bulkSubmissions[4:], 200, links={})],
+            self.getAssignmentURL(900): [MockResponse(submissions[900], 200, links={})],
+            self.getAssignmentURL(901): [MockResponse(submissions[901], 200, links={})],
+        }
+
+    def tearDown(self):
+        self.cacheDirectory.stop()
+        self.directory.cleanup()
+
+    def getScores(self) -> pd.DataFrame:
+        return self.canvas.getStatusAssignmentScores() \
+            .sort_values(['status_assignment_id', 'multipass'], ignore_index=True)
+
+    def testBulkMatchesEachAssignment(self):
+        self.canvas.m_session = MockSession(self.responses)
+        self.assertTrue(self.canvas.updateStatusAssignmentScores(bulkFetch=False))
+        scores = self.getScores()
+
+        session = MockSession(self.responses)
+        self.canvas.m_session = session
+        self.assertTrue(self.canvas.updateStatusAssignmentScores(bulkFetch=True))
+
+        self.assertEqual([self.BULK_URL, self.BULK_URL + "&page=bookmark"], session.m_requests)
+        testing.assert_frame_equal(self.expectedScores, scores)
+        testing.assert_frame_equal(self.expectedScores, self.getScores())
+
+    def testFailedDownload(self):
+        self.responses[self.BULK_URL + "&page=bookmark"] = [MockResponse({}, 404)]
+        self.canvas.m_session = MockSession(self.responses)
+
+        self.assertFalse(self.canvas.updateStatusAssignmentScores())
+        self.assertTrue(self.canvas.getStatusAssignmentScores().empty)
+        self.assertEqual(CanvasModule.STATUS_ASSIGNMENT_SCORES_COLUMNS,
+                         self.canvas.getStatusAssignmentScores().columns.tolist())
+
+    def testNoStatusAssignments(self):
+        self.canvas.m_statusAssignments = pd.DataFrame()
+        session = MockSession({})
+        self.canvas.m_session = session
+
+        self.assertTrue(self.canvas.updateStatusAssignmentScores())
+        self.assertEqual([], session.m_requests)
+
+
+class TestRosterCache(unittest.TestCase):
+    ENDPOINT = "https://canvas.test"
+    COURSE_URL = f"{ENDPOINT}/api/v1/courses/12345?include[]=total_students"
+    ROSTER_URL = f"{ENDPOINT}/api/v1/courses/12345/users?per_page=100&&enrollment_type[]=student"
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cacheDirectory = mock.patch.object(CanvasModule, 'DEFAULT_CACHE_DIRECTORY', self.directory.name + "/")
+        self.cacheDirectory.start()
+
+        self.canvas = Canvas("api_key", "self", "12345", self.ENDPOINT)
+        self.students = [
+            {'name': "Student A", 'id': 1, 'sis_user_id': "10000001", 'email': "a@mines.edu"},
+            {'name': "Student B", 'id': 2, 'sis_user_id': "10000002", 'email': "b@mines.edu"},
+        ]
+
+        # cache the roster
+        self.canvas.m_session = self.createSession()
+        self.canvas.getStudentsFromCanvas()
+        self.assertTrue(os.path.isfile(self.canvas.__getRosterCachePath__()))
+
+    def tearDown(self):
+        self.cacheDirectory.stop()
+        self.directory.cleanup()
+
+    def createSession(self) -> MockSession:
+        return MockSession({
+            self.COURSE_URL: [MockResponse({'id': 12345, 'total_students': len(self.students)}, 200)],
+            self.ROSTER_URL: [MockResponse(self.students, 200, links={})],
+        })
+
+    def updateCache(self, **kwargs):
+        with open(self.canvas.__getRosterCachePath__(), "r") as cacheFile:
+            cachedRoster = json.load(cacheFile)
+        with open(self.canvas.__getRosterCachePath__(), "w") as cacheFile:
+            json.dump({**cachedRoster, **kwargs}, cacheFile)
+
+    def getStudents(self, refresh: bool = False) -> (list[str], list[str]):
+        # the multipasses of the students that were loaded, and the requests that were sent to load them
+        session = self.createSession()
+        self.canvas.m_session = session
+        self.canvas.m_students = pd.DataFrame()
+
+        self.canvas.getStudentsFromCanvas(refresh=refresh)
+
+        return self.canvas.getStudents()['sis_id'].tolist(), session.m_requests
+
+    def testCachedRosterIsUsed(self):
+        students, sentRequests = self.getStudents()
+
+        self.assertEqual(["10000001", "10000002"], students)
+        self.assertEqual([self.COURSE_URL], sentRequests)
+
+    def testExpiredCacheIsDownloaded(self):
+        self.updateCache(fetched_at=time.time() - CanvasModule.ROSTER_CACHE_MAX_AGE - 1)
+
+        students, sentRequests = self.getStudents()
+
+        self.assertEqual(["10000001", "10000002"], students)
+        self.assertIn(self.ROSTER_URL, sentRequests)
+
+    def testStudentCountMismatchIsDownloaded(self):
+        self.students.append({'name': "Student C", 'id': 3, 'sis_user_id': "10000003", 'email': "c@mines.edu"})
+
+        students, sentRequests = self.getStudents()
+
+        self.assertEqual(["10000001", "10000002", "10000003"], students)
+        self.assertEqual(self.COURSE_URL, sentRequests[0])
+        self.assertIn(self.ROSTER_URL, sentRequests)
+
+    def testOtherCourseIsDownloaded(self):
+        self.updateCache(course_id="54321")
+        self.students[1] = {'name': "Student D", 'id': 4, 'sis_user_id': "10000004", 'email': "d@mines.edu"}
+
+        students, sentRequests = self.getStudents()
+
+        self.assertEqual(["10000001", "10000004"], students)
+        self.assertNotEqual(self.COURSE_URL, sentRequests[0])
+        self.assertIn(self.ROSTER_URL, sentRequests)
+
+    def testRefreshIsDownloaded(self):
+        # a student dropped and another added, so the student count is the same
+        self.students[1] = {'name': "Student D", 'id': 4, 'sis_user_id': "10000004", 'email': "d@mines.edu"}
+
+        self.assertEqual(["10000001", "10000002"], self.getStudents()[0])
+
+        students, sentRequests = self.getStudents(refresh=True)
+
+        self.assertEqual(["10000001", "10000004"], students)
+        self.assertEqual(self.ROSTER_URL, sentRequests[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
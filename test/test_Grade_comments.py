@@ -0,0 +1,38 @@
+from Grade import comments
+import pandas as pd
+import unittest
+
+
+class TestComments(unittest.TestCase):
+    def testRenderLatePenaltyComments(self):
+        rendered = comments.renderLatePenaltyComments(pd.Series([1, 2, 1, 4]), [1, .8, .6, .4, 0])
+
+        self.assertEqual(["-20%: 1 day late", "-40%: 2 days late", "-20%: 1 day late", "-100%: 4 days late"],
+                         rendered.tolist())
+
+    def testRenderStatusAssignmentComments(self):
+        rendered = comments.renderStatusAssignmentComments(pd.Series(["Late Pass", "Late Pass", "Extension"]),
+                                                           pd.Series([1, 2, 2]))
+
+        self.assertEqual(["Extended with 1 Late Pass", "Extended with 2 Late Passes", "Extended with 2 Extensions"],
+                         rendered.tolist())
+
+    def testMessagesAreCached(self):
+        comments.renderExtensionComment.cache_clear()
+
+        comments.renderExtensionComments(pd.Series([2, 1, 2, 2, 1]))
+
+        self.assertEqual(2, comments.renderExtensionComment.cache_info().misses)
+
+    def testJoinComments(self):
+        joined = comments.joinComments(pd.Series(["", "Extended with 1 Late Pass", "", "No Submission."]),
+                                       pd.Series(["Extended by 1 day", "", "", ""]),
+                                       pd.Series(["-20%: 1 day late", "-20%: 1 day late", "", ""]))
+
+        self.assertEqual(["Extended by 1 day\n-20%: 1 day late", "Extended with 1 Late Pass\n-20%: 1 day late", "",
+                          "No Submission."],
+                         joined.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
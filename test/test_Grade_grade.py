@@ -1,2 +1,279 @@
 from Factories import Factories
+from FileHelpers import excelLoaders
+from Grade import grade
+import numpy as np
+import pandas as pd
+from pandas import testing
+import unittest
+from unittest import mock
 
+
+class TestScaleScores(unittest.TestCase):
+    @staticmethod
+    def scaleScore(_score: float, _scaleFactor: float, assignmentPoints: float = None, maxScore: float = None,
+                   XCScaleFactor: float = None) -> float:
+        # scales a single score the same way that grade.scaleScores always has
+        if XCScaleFactor is None:
+            XCScaleFactor = _scaleFactor
+
+        extraPoints = 0
+        if assignmentPoints is not None:
+            extraPoints = _score - (assignmentPoints / _scaleFactor)
+            _score = _score - extraPoints
+
+        _score *= _scaleFactor
+        extraPoints *= XCScaleFactor
+        _score += extraPoints
+
+        if maxScore is not None and _score >= maxScore:
+            _score = maxScore
+
+        return _score
+
+    def setUp(self):
+        self.scores = [0, 1.5, 3.25, 5, 5.5, 6.75, 10, np.nan]
+        self.gradescopeDF = pd.DataFrame({'multipass': [f"s{i}" for i in range(len(self.scores))],
+                                          'Total Score': self.scores})
+
+    def testScaleOnly(self):
+        result = grade.scaleScores(self.gradescopeDF, 0.5)
+
+        testing.assert_series_equal(pd.Series([score * 0.5 for score in self.scores], name='Total Score'),
+                                    result['Total Score'])
+
+    def testExtraCreditAndMaxScore(self):
+        arguments = {'assignmentPoints': 5, 'maxScore': 5.5, 'XCScaleFactor': 0.25}
+        result = grade.scaleScores(self.gradescopeDF, 1 / 3, **arguments)
+
+        expected = pd.Series([self.scaleScore(score, 1 / 3, **arguments) for score in self.scores], name='Total Score')
+        testing.assert_series_equal(expected, result['Total Score'])
+        self.assertTrue((result['Total Score'].dropna() <= 5.5).all())
+
+    def testBitIdentical(self):
+        rng = np.random.default_rng(101)
+        scores = rng.uniform(-2, 15, 2000)
+        gradescopeDF = pd.DataFrame({'Total Score': scores})
+        arguments = {'assignmentPoints': 7.3, 'maxScore': 6, 'XCScaleFactor': 0.3}
+
+        result = grade.scaleScores(gradescopeDF, 2.7, **arguments)['Total Score'].to_numpy()
+        expected = np.array([self.scaleScore(score, 2.7, **arguments) for score in scores])
+
+        self.assertTrue(np.array_equal(expected.view(np.int64), result.view(np.int64)))
+
+
+class TestCalculateLatePenalty(unittest.TestCase):
+    def setUp(self):
+        self.gradescopeDF = pd.DataFrame({
+            'multipass': ["on_time", "late", "very_late", "missing", "extended", "not_approved"],
+            'Total Score': [10.0, 10.0, 10.0, 0.0, 10.0, 10.0],
+            'Status': ["Graded", "Graded", "Graded", "Missing", "Graded", "Graded"],
+            'hours_late': [0, 5, 200, 0, 30, 30],
+        })
+        self.specialCasesDF = pd.DataFrame({
+            'multipass': ["missing", "extended", "not_approved", "on_time"],
+            'name': ["Missing", "Extended", "Not Approved", "On Time"],
+            'assignment': ["HW1", "HW1", "HW1", "HW2"],
+            'extension_type': ["Extension", "Extension", "Extension", "Extension"],
+            'extension_days': [1, 1, 2, 1],
+            'approved_by': ["TA", "TA", "", "TA"],
+            'handled': ["", "", "", ""],
+            'grader_notes': ["", "", "Emailed", ""],
+        })
+        self.statusAssignmentsDF = pd.DataFrame({'id': [], 'trigger': []})
+        self.statusAssignmentScoresDF = pd.DataFrame({'multipass': [], 'status_assignment_id': [],
+                                                      'student_score': []})
+
+    def testPenaltiesAndSpecialCases(self):
+        gradescopeDF, specialCasesDF, _ = grade.calculateLatePenalty(
+            self.gradescopeDF, self.specialCasesDF, self.statusAssignmentsDF, self.statusAssignmentScoresDF, "HW1",
+            [1, .8, .6, .4, 0])
+
+        self.assertEqual([10.0, 8.0, 0.0, 0.0, 8.0, 6.0], gradescopeDF['Total Score'].tolist())
+        self.assertEqual(["",
+                          "-20%: 1 day late",
+                          "-100%: 4 days late",
+                          "No Submission.\nContact grader if you think this is a mistake.",
+                          "Extended by 1 day\n-20%: 1 day late",
+                          "-40%: 2 days late"],
+                         gradescopeDF['lateness_comment'].tolist())
+
+        self.assertEqual(["TRUE", "TRUE", "FALSE", ""], specialCasesDF['handled'].tolist())
+        self.assertEqual(["No Submission", "", "Emailed; Special case is NOT Approved", ""],
+                         specialCasesDF['grader_notes'].tolist())
+
+
+class TestFindSpecialCases(unittest.TestCase):
+    def setUp(self):
+        self.specialCasesDF = pd.DataFrame({
+            'multipass': ["a", "b", "a", "c"],
+            'assignment': ["HW1", "HW1", "HW2", "HW1"],
+        })
+
+    def testFindsLabels(self):
+        self.assertEqual([0, 3], grade.findSpecialCases(self.specialCasesDF, "HW1", ["a", "c"]).tolist())
+        self.assertEqual([0, 1, 3], grade.findSpecialCases(self.specialCasesDF, "HW1").tolist())
+
+    def testIndexFollowsChangedSpecialCases(self):
+        grade.findSpecialCases(self.specialCasesDF, "HW1")
+
+        reorderedDF = self.specialCasesDF.sort_values('multipass', ascending=False)
+        self.assertEqual([0], grade.findSpecialCases(reorderedDF, "HW1", ["a"]).tolist())
+
+        editedDF = self.specialCasesDF.copy()
+        editedDF.loc[0, 'multipass'] = "d"
+        self.assertEqual([], grade.findSpecialCases(editedDF, "HW1", ["a"]).tolist())
+        self.assertEqual([0], grade.findSpecialCases(editedDF, "HW1", ["d"]).tolist())
+
+    def testLookupsDontCheckTheWholeSheet(self):
+        excelLoaders.indexSpecialCases(self.specialCasesDF)
+
+        with mock.patch.object(excelLoaders, 'getSpecialCasesFingerprint') as fingerprint:
+            for _ in range(10):
+                grade.findSpecialCases(self.specialCasesDF, "HW1", ["a"])
+                grade.findStudentSpecialCases(self.specialCasesDF, ["HW1", "HW2"], ["a", "a"])
+
+        fingerprint.assert_not_called()
+
+    def testRefreshFollowsSpecialCasesChangedInPlace(self):
+        excelLoaders.indexSpecialCases(self.specialCasesDF)
+        self.specialCasesDF.loc[0, 'multipass'] = "d"
+
+        excelLoaders.refreshSpecialCasesIndex(self.specialCasesDF)
+
+        self.assertEqual([], grade.findSpecialCases(self.specialCasesDF, "HW1", ["a"]).tolist())
+        self.assertEqual([0], grade.findSpecialCases(self.specialCasesDF, "HW1", ["d"]).tolist())
+
+
+class TestValidateAndUpdateStatusAssignments(unittest.TestCase):
+    def setUp(self):
+        self.gradescopeDF = pd.DataFrame({
+            'multipass': ["approved", "over_limit", "no_balance", "on_time"],
+            'Status': ["Graded", "Graded", "Graded", "Graded"],
+            'hours_late': [30, 60, 30, 0],
+            'lateness_comment': ["", "", "", ""],
+        })
+        self.specialCasesDF = pd.DataFrame({
+            'multipass': ["approved", "over_limit", "no_balance", "on_time"],
+            'assignment': ["HW1", "HW1", "HW1", "HW1"],
+            'extension_type': ["Late Pass", "Late Pass", "Late Pass", "Late Pass"],
+            'extension_days': [1, 3, 1, 1],
+            'approved_by': ["", "", "", ""],
+            'handled': ["", "", "", ""],
+            'grader_notes': ["", "", "", ""],
+        })
+        self.statusAssignmentsDF = pd.DataFrame({'id': [900], 'trigger': ["Late Pass"]})
+        self.statusAssignmentScoresDF = pd.DataFrame({'multipass': ["approved", "over_limit", "on_time"],
+                                                      'status_assignment_id': [900, 900, 900],
+                                                      'student_score': [2, 2, 2]})
+
+    def testBalancesAreReconciled(self):
+        gradescopeDF, specialCasesDF, statusAssignmentScoresDF = grade.validateAndUpdateStatusAssignments(
+            self.gradescopeDF, self.specialCasesDF, self.statusAssignmentsDF, self.statusAssignmentScoresDF, "HW1")
+
+        self.assertEqual([1, 2, 2], statusAssignmentScoresDF['student_score'].tolist())
+        self.assertEqual(["Extended with 1 Late Pass", "", "", ""], gradescopeDF['lateness_comment'].tolist())
+        self.assertEqual(["AUTOMATIC APPROVAL", "", "", ""], specialCasesDF['approved_by'].tolist())
+        self.assertEqual(["", "FALSE", "FALSE", ""], specialCasesDF['handled'].tolist())
+        self.assertEqual("Unable to process triggered special case: Limit exceeded",
+                         specialCasesDF.at[1, 'grader_notes'])
+        self.assertEqual("Unable to process triggered special case: No status assignment found for student",
+                         specialCasesDF.at[2, 'grader_notes'])
+
+
+class TestGradeAssignments(unittest.TestCase):
+    def setUp(self):
+        self.gradesheets = {
+            283462: pd.DataFrame({'multipass': ["a", "b", "c"], 'Total Score': [4.0, 6.0, 0.0],
+                                  'Status': ["Graded", "Graded", "Missing"], 'hours_late': [0, 30, 0]}),
+            283470: pd.DataFrame({'multipass': ["a", "b"], 'Total Score': [10.0, 8.0],
+                                  'Status': ["Graded", "Graded"], 'hours_late': [50, 0]}),
+        }
+        self.assignmentParameters = pd.DataFrame({
+            'common_name': ["HW1", "HW2"], 'scale_factor': [1, .5], 'assignment_points': [5, np.nan],
+            'max_score': [5.5, np.nan], 'xc_scale_factor': [.25, np.nan], 'missing_score': [0, np.nan],
+        }, index=[283462, 283470])
+        self.specialCasesDF = pd.DataFrame({
+            'multipass': ["b", "a"], 'name': ["B", "A"], 'assignment': ["HW1", "HW2"],
+            'extension_type': ["Extension", "Late Pass"], 'extension_days': [1, 1],
+            'approved_by': ["TA", ""], 'handled': ["", ""], 'grader_notes': ["", ""],
+        })
+        self.statusAssignmentsDF = pd.DataFrame({'id': [900], 'trigger': ["Late Pass"]})
+        self.statusAssignmentScoresDF = pd.DataFrame({'multipass': ["a", "b"], 'status_assignment_id': [900, 900],
+                                                      'student_score': [2, 2]})
+
+    def testMatchesGradingEachAssignment(self):
+        expectedSheets = {}
+        specialCasesDF = self.specialCasesDF.copy()
+        statusAssignmentScoresDF = self.statusAssignmentScoresDF.copy()
+        for assignmentID, gradesheet in self.gradesheets.items():
+            parameters = self.assignmentParameters.loc[assignmentID].replace({np.nan: None})
+            gradesheet = grade.scaleScores(gradesheet.copy(), parameters['scale_factor'],
+                                           parameters['assignment_points'], parameters['max_score'],
+                                           parameters['xc_scale_factor'])
+            gradesheet = grade.scoreMissingAssignments(gradesheet, score=parameters['missing_score'])
+            expectedSheets[assignmentID], specialCasesDF, statusAssignmentScoresDF = grade.calculateLatePenalty(
+                gradesheet, specialCasesDF, self.statusAssignmentsDF, statusAssignmentScoresDF,
+                parameters['common_name'])
+
+        gradedSheets, gradedSpecialCasesDF, gradedStatusAssignmentScoresDF = grade.gradeAssignments(
+            {assignmentID: gradesheet.copy() for assignmentID, gradesheet in self.gradesheets.items()},
+            self.assignmentParameters, self.specialCasesDF.copy(), self.statusAssignmentsDF,
+            self.statusAssignmentScoresDF.copy())
+
+        for assignmentID, gradesheet in expectedSheets.items():
+            testing.assert_frame_equal(gradesheet, gradedSheets[assignmentID])
+        testing.assert_frame_equal(specialCasesDF, gradedSpecialCasesDF)
+        testing.assert_frame_equal(statusAssignmentScoresDF, gradedStatusAssignmentScoresDF)
+        self.assertEqual([1, 2], gradedStatusAssignmentScoresDF['student_score'].tolist())
+
+    def testParallelMatchesSerial(self):
+        serialResults = grade.gradeAssignments(
+            {assignmentID: gradesheet.copy() for assignmentID, gradesheet in self.gradesheets.items()},
+            self.assignmentParameters, self.specialCasesDF.copy(), self.statusAssignmentsDF,
+            self.statusAssignmentScoresDF.copy(), serial=True)
+        parallelResults = grade.gradeAssignments(
+            {assignmentID: gradesheet.copy() for assignmentID, gradesheet in self.gradesheets.items()},
+            self.assignmentParameters, self.specialCasesDF.copy(), self.statusAssignmentsDF,
+            self.statusAssignmentScoresDF.copy(), serial=False)
+
+        for assignmentID, gradesheet in serialResults[0].items():
+            testing.assert_frame_equal(gradesheet, parallelResults[0][assignmentID])
+        testing.assert_frame_equal(serialResults[1], parallelResults[1])
+        testing.assert_frame_equal(serialResults[2], parallelResults[2])
+
+    def testSpecialCasesAreCheckedOnce(self):
+        excelLoaders.indexSpecialCases(self.specialCasesDF)
+
+        with mock.patch.object(excelLoaders, 'getSpecialCasesFingerprint',
+                               wraps=excelLoaders.getSpecialCasesFingerprint) as fingerprint:
+            grade.gradeAssignments(
+                {assignmentID: gradesheet.copy() for assignmentID, gradesheet in self.gradesheets.items()},
+                self.assignmentParameters, self.specialCasesDF, self.statusAssignmentsDF,
+                self.statusAssignmentScoresDF.copy(), serial=True)
+
+        self.assertEqual(1, fingerprint.call_count)
+
+    def testEmptyGradesheet(self):
+        self.gradesheets[283470] = self.gradesheets[283470].iloc[0:0]
+
+        gradedSheets, _, _ = grade.gradeAssignments(
+            {assignmentID: gradesheet.copy() for assignmentID, gradesheet in self.gradesheets.items()},
+            self.assignmentParameters, self.specialCasesDF.copy(), self.statusAssignmentsDF,
+            self.statusAssignmentScoresDF.copy())
+
+        self.assertEqual([283462, 283470], list(gradedSheets.keys()))
+        self.assertEqual(0, len(gradedSheets[283470]))
+        self.assertEqual(gradedSheets[283462].dtypes.to_dict(), gradedSheets[283470].dtypes.to_dict())
+
+    def testUnstackKeepsEmptyGradesheets(self):
+        gradesheets = {283462: self.gradesheets[283462], 283470: self.gradesheets[283470].iloc[0:0]}
+
+        unstacked = grade.unstackGradesheets(grade.stackGradesheets(gradesheets), gradesheets)
+
+        self.assertEqual([283462, 283470], list(unstacked.keys()))
+        testing.assert_frame_equal(gradesheets[283462], unstacked[283462])
+        testing.assert_frame_equal(gradesheets[283470], unstacked[283470], check_index_type=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,321 @@
+from Canvas import Canvas
+import Canvas as CanvasModule
+from Grade import post
+from MockRequests import MockResponse, MockSession
+from urllib.parse import parse_qs
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+
+class TestPost(unittest.TestCase):
+    def setUp(self):
+        self.canvasScores = {
+            283462: {
+                25685: {'name': "Student A", 'id': "25685", 'score': "6.0", 'comment': "Nice Work!"},
+                30691: {'name': "Student B", 'id': "30691", 'score': "4.5",
+                        'comment': "-25%: 1 day late\nExtended by 1 day & approved = yes"},
+            },
+            283470: {
+                25685: {'name': "Student A", 'id': "25685", 'score': "", 'comment': ""},
+            },
+        }
+
+    def testEncodeGradesRoundTrip(self):
+        scoreTable = post.createScoreTable(self.canvasScores)
+        batch = b"&".join(post.encodeGrades(scoreTable.loc[scoreTable['assignment'] == "283462"]))
+
+        decoded = parse_qs(batch.decode(), keep_blank_values=True)
+
+        self.assertEqual(["6.0"], decoded['grade_data[25685][posted_grade]'])
+        self.assertEqual(["Nice Work!"], decoded['grade_data[25685][text_comment]'])
+        self.assertEqual(["-25%: 1 day late\nExtended by 1 day & approved = yes"],
+                         decoded['grade_data[30691][text_comment]'])
+
+    def testEncodeGradesCombined(self):
+        gradeData = post.encodeGrades(post.createScoreTable(self.canvasScores), combineAssignments=True)
+
+        self.assertEqual(3, len(gradeData))
+        decoded = parse_qs(b"&".join(gradeData).decode(), keep_blank_values=True)
+
+        self.assertEqual(["4.5"], decoded['grade_data[283462][30691][posted_grade]'])
+        self.assertEqual([""], decoded['grade_data[283470][25685][posted_grade]'])
+
+    def testEncodeGradesEmpty(self):
+        self.assertEqual([], post.encodeGrades(post.createScoreTable({})))
+
+    def testBatchesRespectSizeAndBytes(self):
+        batcher = post.AdaptiveBatcher(batchSize=2, maxBatchBytes=12)
+
+        batches = list(batcher.createBatches([b"aaaa", b"bbbb", b"cccccccccccccccc", b"d", b"e", b"f"]))
+
+        self.assertEqual([b"aaaa&bbbb", b"cccccccccccccccc", b"d&e", b"f"], batches)
+        self.assertEqual([(2, 9), (1, 16), (2, 3), (1, 1)], batcher.m_batches)
+
+    def testBatcherAdapts(self):
+        batcher = post.AdaptiveBatcher()
+
+        batcher.update(post.FAST_BATCH_LATENCY / 2, True)
+        self.assertEqual(post.BATCH_SIZE + post.BATCH_SIZE_STEP, batcher.m_batchSize)
+
+        batcher.update(post.SLOW_BATCH_LATENCY * 2, True)
+        self.assertEqual((post.BATCH_SIZE + post.BATCH_SIZE_STEP) // 2, batcher.m_batchSize)
+
+        batcher.update(post.FAST_BATCH_LATENCY / 2, False)
+        self.assertEqual(max(post.MIN_BATCH_SIZE, (post.BATCH_SIZE + post.BATCH_SIZE_STEP) // 4), batcher.m_batchSize)
+
+class StubCanvas:
+    def __init__(self, _currentGrades):
+        self.m_currentGrades = _currentGrades
+        self.m_requested = None
+
+    def getCurrentGrades(self, _assignments):
+        self.m_requested = _assignments
+        return self.m_currentGrades
+
+
+class TestIsGradeChanged(unittest.TestCase):
+    @staticmethod
+    def createGrade(_score, _comment=""):
+        return {'name': "Student A", 'id': "25685", 'score': _score, 'comment': _comment}
+
+    def testBlankScore(self):
+        self.assertFalse(post.isGradeChanged(self.createGrade(""), {'score': None, 'comment': ""}))
+        self.assertTrue(post.isGradeChanged(self.createGrade(""), {'score': 6.0, 'comment': ""}))
+        self.assertTrue(post.isGradeChanged(self.createGrade("6.0"), {'score': None, 'comment': ""}))
+
+    def testFloatStringScore(self):
+        self.assertFalse(post.isGradeChanged(self.createGrade("6.0"), {'score': 6, 'comment': ""}))
+        self.assertFalse(post.isGradeChanged(self.createGrade("6"), {'score': 6.0, 'comment': ""}))
+        self.assertTrue(post.isGradeChanged(self.createGrade("6.5"), {'score': 6.0, 'comment': ""}))
+        self.assertTrue(post.isGradeChanged(self.createGrade("EX"), {'score': 6.0, 'comment': ""}))
+
+    def testNewComment(self):
+        self.assertTrue(post.isGradeChanged(self.createGrade("6.0", "-20%: 1 day late"),
+                                            {'score': 6.0, 'comment': ""}))
+        self.assertFalse(post.isGradeChanged(self.createGrade("6.0", "-20%: 1 day late"),
+                                             {'score': 6.0, 'comment': "-20%: 1 day late"}))
+        # an empty comment doesn't remove the comment already in Canvas, so it isn't a change
+        self.assertFalse(post.isGradeChanged(self.createGrade("6.0"), {'score': 6.0, 'comment': "-20%: 1 day late"}))
+
+    def testNoSubmission(self):
+        self.assertTrue(post.isGradeChanged(self.createGrade(""), None))
+
+    def testRemoveUnchangedGrades(self):
+        canvasScores = {
+            283462: {25685: self.createGrade("6.0"), 25686: {**self.createGrade("4.0"), 'id': "25686"}},
+            283470: {25685: self.createGrade("", "No Submission.")},
+        }
+        canvas = StubCanvas({
+            "283462": {"25685": {'score': 6.0, 'comment': ""}, "25686": {'score': 5.0, 'comment': ""}},
+            "283470": {"25685": {'score': None, 'comment': ""}},
+        })
+
+        changedScores, skippedGrades = post.removeUnchangedGrades(canvas, canvasScores)
+
+        self.assertEqual([283462, 283470], canvas.m_requested)
+        self.assertEqual(1, skippedGrades)
+        self.assertEqual({283462: {25686: canvasScores[283462][25686]}, 283470: canvasScores[283470]}, changedScores)
+
+    def testRemoveUnchangedGradesFailedPull(self):
+        canvasScores = {283462: {25685: self.createGrade("6.0")}}
+
+        self.assertEqual((canvasScores, 0), post.removeUnchangedGrades(StubCanvas(None), canvasScores))
+
+
+class TestPostingJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = post.PostingJournal(os.path.join(self.directory.name, "posting_journal.jsonl"))
+
+        scoreTable = post.createScoreTable({
+            283462: {25685: {'name': "Student A", 'id': "25685", 'score': "6.0", 'comment': ""}},
+            283470: {25685: {'name': "Student A", 'id': "25685", 'score': "4.0", 'comment': ""}},
+        })
+        self.courseBatch = b"&".join(post.encodeGrades(scoreTable, combineAssignments=True))
+        self.assignmentBatch = b"&".join(post.encodeGrades(scoreTable.loc[scoreTable['assignment'] == "283470"]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testNewPostSupersedesIncompleteBatches(self):
+        list(self.journal.recordBatches(post.COURSE_TARGET, [self.courseBatch]))
+        list(self.journal.recordBatches("283470", [self.assignmentBatch]))
+
+        self.assertEqual(0, self.journal.supersede(["283999"]))
+        self.assertEqual(1, self.journal.supersede(["283462"]))
+
+        incompleteBatches = self.journal.getIncompleteBatches()
+        self.assertEqual(["283470"], list(incompleteBatches.keys()))
+        self.assertEqual([self.assignmentBatch], [payload for _, payload in incompleteBatches["283470"]])
+
+    def testBatchesSentAfterSupersedingAreIncomplete(self):
+        list(self.journal.recordBatches("283470", [self.assignmentBatch]))
+        self.journal.supersede(["283470"])
+        list(self.journal.recordBatches("283470", [self.assignmentBatch + b"&"]))
+
+        self.assertEqual([self.assignmentBatch + b"&"],
+                         [payload for _, payload in self.journal.getIncompleteBatches()["283470"]])
+
+    def testExpiredBatchesAreNotIncomplete(self):
+        # a journal entry from before batches were timestamped
+        with open(self.journal.m_journalPath, "w") as journal:
+            journal.write(json.dumps({'state': "sending", 'target': "283470",
+                                      'hash': hashlib.sha256(self.assignmentBatch).hexdigest(),
+                                      'payload': self.assignmentBatch.decode()}) + "\n")
+
+        sentAt, payload = self.journal.getIncompleteBatches()["283470"][0]
+        self.assertEqual(0, sentAt)
+
+        self.journal.expire("283470", [payload])
+        self.assertEqual({}, self.journal.getIncompleteBatches())
+        self.assertTrue(self.journal.clearIfComplete())
+        self.assertFalse(os.path.exists(self.journal.m_journalPath))
+
+    def testTruncatedLastEntryIsSkipped(self):
+        list(self.journal.recordBatches("283470", [self.assignmentBatch]))
+        # the program crashed while writing the final state of the batch
+        with open(self.journal.m_journalPath, "a") as journal:
+            journal.write('{"state": "completed", "target": "283470", "ha')
+
+        self.assertEqual([self.assignmentBatch],
+                         [payload for _, payload in self.journal.getIncompleteBatches()["283470"]])
+
+    def testEntriesAfterTruncatedEntryAreRead(self):
+        # the program crashed while writing the first entry
+        with open(self.journal.m_journalPath, "w") as journal:
+            journal.write('{"state": "sending", "tar')
+
+        list(self.journal.recordBatches("283470", [self.assignmentBatch]))
+        self.assertEqual([self.assignmentBatch],
+                         [payload for _, payload in self.journal.getIncompleteBatches()["283470"]])
+
+        # and again while writing the final state of a batch
+        list(self.journal.recordBatches(post.COURSE_TARGET, [self.courseBatch, self.assignmentBatch]))
+        with open(self.journal.m_journalPath, "a") as journal:
+            journal.write('{"state": "completed", "target": "course", "ha')
+        self.journal.recordProgress(1, {'workflow_state': "completed"})
+
+        self.assertEqual([self.courseBatch],
+                         [payload for _, payload in self.journal.getIncompleteBatches()[post.COURSE_TARGET]])
+
+    def testCompletedBatchesAreNotIncomplete(self):
+        list(self.journal.recordBatches(post.COURSE_TARGET, [self.courseBatch, self.assignmentBatch]))
+        self.journal.recordProgress(0, {'workflow_state': "completed"})
+        self.journal.recordProgress(1, {'workflow_state': "failed", 'message': "Internal Error"})
+
+        self.assertEqual([self.assignmentBatch],
+                         [payload for _, payload in self.journal.getIncompleteBatches()[post.COURSE_TARGET]])
+        self.assertFalse(self.journal.clearIfComplete())
+
+        list(self.journal.recordBatches(post.COURSE_TARGET, [self.assignmentBatch]))
+        self.journal.recordProgress(0, {'workflow_state': "completed"})
+
+        self.assertEqual({}, self.journal.getIncompleteBatches())
+        self.assertTrue(self.journal.clearIfComplete())
+
+
+class TestPostToCanvas(unittest.TestCase):
+    ENDPOINT = "https://canvas.test"
+    COURSE_URL = f"{ENDPOINT}/api/v1/courses/12345/submissions/update_grades"
+
+    @classmethod
+    def getAssignmentURL(cls, _assignment: int) -> str:
+        return f"{cls.ENDPOINT}/api/v1/courses/12345/assignments/{_assignment}/submissions/update_grades"
+
+    @classmethod
+    def getProgressURL(cls, _batch: int) -> str:
+        return f"{cls.ENDPOINT}/api/v1/progress/{_batch}"
+
+    def setUp(self):
+        self.canvasScores = {
+            283462: {
+                25685: {'name': "Student A", 'id': "25685", 'score': "6.0", 'comment': "Nice Work!"},
+                30691: {'name': "Student B", 'id': "30691", 'score': "4.5", 'comment': ""},
+            },
+            283470: {
+                25685: {'name': "Student A", 'id': "25685", 'score': "0.0", 'comment': "No Submission"},
+            },
+        }
+        # the url and form data of every batch, in the order they were posted
+        self.postedBatches: list[tuple[str, bytes]] = []
+
+        responses = {self.COURSE_URL: functools.partial(self.postBatch, self.COURSE_URL)}
+        for assignment in self.canvasScores.keys():
+            url = self.getAssignmentURL(assignment)
+            responses[url] = functools.partial(self.postBatch, url)
+        for batch in range(10):
+            responses[self.getProgressURL(batch)] = [
+                MockResponse({'id': batch, 'url': self.getProgressURL(batch), 'workflow_state': "completed"}, 200)]
+
+        self.canvas = Canvas("api_key", "self", "12345", self.ENDPOINT)
+        self.session = MockSession(responses)
+        self.canvas.m_session = self.session
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.journalPath = os.path.join(self.directory.name, "posting_journal.jsonl")
+
+        self.patches = [
+            mock.patch.object(CanvasModule.time, 'sleep'),
+            mock.patch('builtins.input', return_value="y"),
+            mock.patch.object(post, 'writeUpdatedGradebookToFile', return_value=None),
+            mock.patch.object(post, 'PostingJournal', functools.partial(post.PostingJournal, self.journalPath)),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.directory.cleanup()
+
+    def postBatch(self, _url: str, _method: str, _kwargs: dict[str, any]) -> MockResponse:
+        batch = len(self.postedBatches)
+        self.postedBatches.append((_url, _kwargs['data']))
+        return MockResponse({'id': batch, 'url': self.getProgressURL(batch), 'workflow_state': "queued"}, 200)
+
+    def getPostedGrades(self) -> dict[str, list[str]]:
+        return parse_qs(b"&".join(batch for _, batch in self.postedBatches).decode(), keep_blank_values=True)
+
+    def testPostCourseGrades(self):
+        scoreTable = post.createScoreTable(self.canvasScores)
+        batches = list(post.encodeGrades(scoreTable, combineAssignments=True))
+
+        self.assertTrue(self.canvas.postCourseGrades(iter(batches)))
+
+        self.assertEqual([(self.COURSE_URL, batch) for batch in batches], self.postedBatches)
+        self.assertEqual(["6.0"], self.getPostedGrades()['grade_data[283462][25685][posted_grade]'])
+
+    def testCombinedAssignmentsArePostedToCourse(self):
+        self.assertTrue(post.postToCanvas(self.canvas, self.canvasScores, studentsToPost=["Student A", "Student B"],
+                                          combineAssignments=True))
+
+        self.assertTrue(self.postedBatches)
+        self.assertEqual({self.COURSE_URL}, {url for url, _ in self.postedBatches})
+        self.assertEqual({
+            'grade_data[283462][25685][posted_grade]': ["6.0"],
+            'grade_data[283462][25685][text_comment]': ["Nice Work!"],
+            'grade_data[283462][30691][posted_grade]': ["4.5"],
+            'grade_data[283462][30691][text_comment]': [""],
+            'grade_data[283470][25685][posted_grade]': ["0.0"],
+            'grade_data[283470][25685][text_comment]': ["No Submission"],
+        }, self.getPostedGrades())
+        # every batch completed, so there is nothing to resume
+        self.assertFalse(os.path.exists(self.journalPath))
+
+    def testAssignmentsArePostedSeparately(self):
+        self.assertTrue(post.postToCanvas(self.canvas, self.canvasScores, studentsToPost=["Student A", "Student B"]))
+
+        self.assertEqual({self.getAssignmentURL(283462), self.getAssignmentURL(283470)},
+                         {url for url, _ in self.postedBatches})
+        self.assertNotIn(self.COURSE_URL, self.session.m_requests)
+        # each assignment is posted in turn, so Student A's scores are in the same order as the assignments
+        self.assertEqual(["6.0", "0.0"], self.getPostedGrades()['grade_data[25685][posted_grade]'])
+
+
+if __name__ == '__main__':
+    unittest.main()